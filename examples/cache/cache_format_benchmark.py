@@ -0,0 +1,119 @@
+"""
+Compares the cache formats of the CachedLoader on synthetic data.
+
+Format 1 stores a 32-bit hash per row in an unclustered table. Format 2 stores a
+64-bit fingerprint in a table that is clustered by the key columns. For each
+format, the script primes a cache with ROWS rows and then times
+ - a full load, in which CHANGED rows have changed, and
+ - an incremental load of the same changes.
+It also counts the rows whose hash collides with the hash of another row, which
+are the rows that a changed hash could go unnoticed against.
+
+Run it on a cluster of a runtime that supports liquid clustering, e.g.
+    python cache_format_benchmark.py 100000000 100000
+"""
+import sys
+import time
+
+import pyspark.sql.functions as f
+from pyspark.sql import DataFrame
+
+from spetlr.cache import CachedLoader, CachedLoaderParameters
+from spetlr.spark import Spark
+
+DATABASE = "spetlr_cache_benchmark"
+
+
+class BenchmarkCacher(CachedLoader):
+    def write_operation(self, df: DataFrame) -> DataFrame:
+        return df
+
+    def delete_operation(self, df: DataFrame) -> DataFrame:
+        return df
+
+
+def rows(count: int, changed: int = 0) -> DataFrame:
+    return (
+        Spark.get()
+        .range(count)
+        .select(
+            f.col("id"),
+            f.sha2(f.col("id").cast("string"), 256).alias("payload"),
+            f.when(f.col("id") < changed, f.lit(1)).otherwise(f.lit(0)).alias("rev"),
+        )
+    )
+
+
+def create_cache(cache_format: int) -> CachedLoaderParameters:
+    name = f"{DATABASE}.cache_v{cache_format}"
+    Spark.get().sql(f"DROP TABLE IF EXISTS {name}")
+    Spark.get().sql(
+        f"""
+        CREATE TABLE {name}
+        (
+            id BIGINT,
+            rowHash {"BIGINT" if cache_format == 2 else "INTEGER"},
+            loadedTime TIMESTAMP,
+            deletedTime TIMESTAMP
+        )
+        USING DELTA
+        {"CLUSTER BY (id)" if cache_format == 2 else ""}
+        """
+    )
+    return CachedLoaderParameters(
+        cache_table_name=name, key_cols=["id"], cache_format=cache_format
+    )
+
+
+def timed(label: str, action) -> None:
+    start = time.perf_counter()
+    action()
+    print(f"{label}: {time.perf_counter() - start:.1f}s")
+
+
+def collisions(params: CachedLoaderParameters) -> int:
+    cache = Spark.get().table(params.cache_table_name)
+    return (
+        cache.groupBy("rowHash").count().where("count > 1").agg(f.sum("count")).first()
+    )[0] or 0
+
+
+def main(count: int, changed: int) -> None:
+    Spark.get().sql(f"CREATE DATABASE IF NOT EXISTS {DATABASE}")
+
+    for cache_format in (1, 2):
+        params = create_cache(cache_format)
+        timed(
+            f"format {cache_format}, prime",
+            lambda: BenchmarkCacher(params).save(rows(count)),
+        )
+        if cache_format == 2:
+            Spark.get().sql(f"OPTIMIZE {params.cache_table_name}")
+        print(f"format {cache_format}, colliding rows: {collisions(params)}")
+
+        timed(
+            f"format {cache_format}, full load",
+            lambda: BenchmarkCacher(params).save(rows(count, changed)),
+        )
+
+        incremental = CachedLoaderParameters(
+            cache_table_name=params.cache_table_name,
+            key_cols=params.key_cols,
+            incremental_input=True,
+            cache_format=cache_format,
+        )
+        timed(
+            f"format {cache_format}, incremental load",
+            lambda: BenchmarkCacher(incremental).save(
+                rows(count, 2 * changed).where(f"id < {2 * changed}")
+            ),
+        )
+
+    Spark.get().sql(f"DROP DATABASE {DATABASE} CASCADE")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10_000,
+    )
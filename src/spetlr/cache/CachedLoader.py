@@ -1,13 +1,18 @@
 import sys
+from functools import reduce
 from typing import List, Optional
 
 import pyspark.sql.functions as f
-from pyspark.sql import DataFrame
+from pyspark.sql import Column, DataFrame
+from pyspark.sql.types import LongType
 
+from spetlr.delta import DeltaHandle
+from spetlr.delta.merge_engine import MergeResult
+from spetlr.delta.metadata_cache import TableMetadataCache
 from spetlr.etl import Loader
 from spetlr.spark import Spark
+from spetlr.utils import GetPruningPredicate, RowFingerprint
 
-from ..functions import get_unique_tempview_name
 from .CachedLoaderParameters import CachedLoaderParameters
 
 
@@ -27,6 +32,10 @@ class CachedLoader(Loader):
     class ReductionResult:
         to_be_written: DataFrame
         to_be_deleted: DataFrame
+        # the cached join that both results are selected from
+        joined: DataFrame
+        # further persisted dataframes, released together with the join
+        persisted: List[DataFrame] = []
 
     def __init__(self, params: CachedLoaderParameters):
         super().__init__()
@@ -50,6 +59,18 @@ class CachedLoader(Loader):
             )
             raise
 
+        if p.cache_format == 2:
+            if not isinstance(df.schema[p.rowHash].dataType, LongType):
+                raise AssertionError(
+                    f"The {p.rowHash} column of a cache of format 2 must be BIGINT."
+                )
+            clustering = TableMetadataCache.get(p.cache_table_name).clustering
+            if set(clustering) != set(p.key_cols):
+                print(
+                    f"WARNING: The cache table {p.cache_table_name} is clustered by"
+                    f" {clustering}, not by the key columns {p.key_cols}."
+                )
+
         # validate overloading
         write_not_overloaded = "write_operation" not in self.__class__.__dict__
         delete_not_overloaded = "delete_operation" not in self.__class__.__dict__
@@ -80,7 +101,21 @@ class CachedLoader(Loader):
 
         cache = self._extract_cache()
 
-        result = self._discard_non_new_rows_against_cache(df, cache)
+        if self.params.incremental_input:
+            result = self._discard_non_new_rows_incremental(df, cache)
+            in_cols = [c for c in in_cols if c != self.params.tombstone_col]
+        else:
+            result = self._discard_non_new_rows_against_cache(df, cache)
+        try:
+            self._write_and_delete(result, in_cols)
+        finally:
+            result.joined.unpersist()
+            for persisted in result.persisted:
+                persisted.unpersist()
+
+    def _write_and_delete(self, result: ReductionResult, in_cols: List[str]) -> None:
+        if self.params.single_merge:
+            return self._write_and_delete_in_one_merge(result, in_cols)
 
         # write branch
         df_written = self.write_operation(result.to_be_written)
@@ -100,20 +135,39 @@ class CachedLoader(Loader):
             # this method is called a again separately in order to ensure that the
             # written cache is saved even if the delete operation fails.
 
-        return
+    def _write_and_delete_in_one_merge(
+        self, result: ReductionResult, in_cols: List[str]
+    ) -> None:
+        cache_updates = []
+
+        # write branch
+        df_written = self.write_operation(result.to_be_written)
+        if df_written:
+            cache_updates.append(
+                self._prepare_written_cache_update(df_written, in_cols)
+            )
+
+        # delete branch
+        try:
+            df_deleted = self.delete_operation(result.to_be_deleted)
+        except Exception:
+            # the written cache is saved even if the delete operation fails.
+            if cache_updates:
+                self._load_cache(cache_updates[0])
+            raise
+        if df_deleted:
+            cache_updates.append(self._prepare_deleted_cache_update(df_deleted))
+
+        # a key is either written or deleted, so the updates do not overlap.
+        if cache_updates:
+            self._load_cache(reduce(DataFrame.unionByName, cache_updates))
 
     def _extract_cache(self) -> DataFrame:
         # here we fix the version,
         # so we don't overwrite the cache before we might want to use it.
-        version = (
-            Spark.get()
-            .sql(f"DESCRIBE HISTORY {self.params.cache_table_name} LIMIT 1")
-            .select("version")
-            .take(1)[0][0]
-        )
-        cache = Spark.get().sql(
-            f"SELECT * FROM {self.params.cache_table_name} VERSION AS OF {version}"
-            f" WHERE {self.params.deletedTime} IS NULL"
+        dh = DeltaHandle(self.params.cache_table_name)
+        cache = dh.read(version=dh.get_latest_version()).where(
+            f"{self.params.deletedTime} IS NULL"
             f" AND {self.params.rowHash} IS NOT NULL"
             f" AND {self.params.loadedTime} IS NOT NULL"
         )
@@ -124,12 +178,17 @@ class CachedLoader(Loader):
         # re-hash the input row
         return df.select(
             *self.params.key_cols,
-            f.hash(*columns_to_hash).alias(self.params.rowHash),
+            self._row_hash(df, columns_to_hash).alias(self.params.rowHash),
             f.current_timestamp().alias(self.params.loadedTime),
             f.lit(None).cast("timestamp").alias(self.params.deletedTime),
             *self.params.cache_id_cols,
         )
 
+    def _row_hash(self, df: DataFrame, cols: List[str]) -> Column:
+        if self.params.cache_format == 2:
+            return RowFingerprint(df, cols)
+        return f.hash(*cols)
+
     def _prepare_deleted_cache_update(self, df: DataFrame):
         return df.select(
             *self.params.key_cols,
@@ -139,26 +198,12 @@ class CachedLoader(Loader):
             *self.params.cache_id_cols,
         )
 
-    def _load_cache(self, cache_to_load: DataFrame) -> None:
-        view_name = get_unique_tempview_name()
-
-        merge_sql_statement = (
-            f"MERGE INTO {self.params.cache_table_name} AS target "
-            f"USING {view_name} as source "
-            f"ON "
-            + (
-                " AND ".join(
-                    f"(source.{col} = target.{col})" for col in self.params.key_cols
-                )
-            )
-            +
-            # update existing records
-            "WHEN MATCHED THEN UPDATE SET * "
-            # insert new records.
-            "WHEN NOT MATCHED THEN INSERT * "
+    def _load_cache(self, cache_to_load: DataFrame) -> MergeResult:
+        # the rows of the cache update are always new or changed,
+        # so they are merged without comparing them to the cache first.
+        return DeltaHandle(self.params.cache_table_name).merge(
+            cache_to_load, self.params.key_cols, detect_changes=False
         )
-        cache_to_load.createOrReplaceTempView(view_name)
-        Spark.get().sql(merge_sql_statement)
 
     def _discard_non_new_rows_against_cache(
         self, df_in: DataFrame, cache: DataFrame
@@ -179,7 +224,7 @@ class CachedLoader(Loader):
         )
 
         # prepare hash of row
-        df_hashed = df_in.withColumn("rowHash", f.hash("*"))
+        df_hashed = df_in.withColumn("rowHash", self._row_hash(df_in, in_cols))
 
         # add a column to distinguish rows after the join
         df_hashed = df_hashed.withColumn("fromPayload", f.lit(True))
@@ -192,6 +237,7 @@ class CachedLoader(Loader):
         )
 
         result = self.ReductionResult()
+        result.joined = joined_df
 
         # rows coming from the original df will have a non-null fromPayload column
         result.to_be_written = (
@@ -227,3 +273,75 @@ class CachedLoader(Loader):
             )
 
         return result
+
+    def _discard_non_new_rows_incremental(
+        self, df_in: DataFrame, cache: DataFrame
+    ) -> ReductionResult:
+        """
+        For incremental input, which only holds new, changed and deleted rows.
+        Only the cache rows in the key ranges of the input are read, and the input
+        is left-joined with them. No full outer join with the cache is needed.
+
+        Returns:
+            to_be_written contains only rows that
+             - are new in the cache, or
+             - are a mismatch against the cache
+            to_be_deleted contains cached rows that
+             - have a tombstone in the data
+        """
+        p = self.params
+
+        # ensure no null keys:
+        df_in = df_in.filter(" AND ".join(f"({col} is NOT NULL)" for col in p.key_cols))
+
+        data_cols = [c for c in df_in.columns if c != p.tombstone_col]
+        tombstone = (
+            f.coalesce(f.col(p.tombstone_col).cast("boolean"), f.lit(False))
+            if p.tombstone_col
+            else f.lit(False)
+        )
+        # the hash is the same as of the rows of a full input
+        df_hashed = df_in.select(
+            *data_cols,
+            self._row_hash(df_in, data_cols).alias(p.rowHash),
+            tombstone.alias("isTombstone"),
+        ).persist()
+
+        # only the cache files in the key ranges of the input are read
+        predicate = GetPruningPredicate(df=df_hashed, join_cols=p.key_cols)
+        if predicate:
+            cache = cache.where(predicate)
+
+        joined_df = (
+            df_hashed.alias("df").join(cache.alias("cache"), p.key_cols, "left").cache()
+        )
+
+        result = self.ReductionResult()
+        result.joined = joined_df
+        result.persisted = [df_hashed]
+
+        result.to_be_written = (
+            joined_df.filter(~f.col("isTombstone"))
+            .filter(
+                # either the row has never been loaded before
+                (f.col(f"cache.{p.loadedTime}").isNull())
+                # or it has changed wrt the previous load
+                | (f.col(f"df.{p.rowHash}") != f.col(f"cache.{p.rowHash}"))
+            )
+            .select(
+                *p.key_cols,
+                *[f"df.{c}" for c in data_cols if c not in p.key_cols],
+            )
+        )
+
+        # tombstones of keys that are not in the cache have nothing to delete
+        result.to_be_deleted = (
+            joined_df.filter(f.col("isTombstone"))
+            .filter(f.col(f"cache.{p.loadedTime}").isNotNull())
+            .select(
+                *p.key_cols,
+                *[f"cache.{c}" for c in cache.columns if c not in p.key_cols],
+            )
+        )
+
+        return result
@@ -9,6 +9,11 @@ class CachedLoaderParameters:
         cache_table_name: str,
         key_cols: List[str],
         cache_id_cols: List[str] = None,
+        *,
+        incremental_input: bool = False,
+        tombstone_col: str = None,
+        cache_format: int = 1,
+        single_merge: bool = False,
     ):
         """
         Args:
@@ -16,15 +21,29 @@ class CachedLoaderParameters:
             key_cols: the set of columns that form the primary key for a row
             cache_id_cols: These columns, added by the write operation, will be saved
                 in the cache to identify e.g. the written batch.
+            incremental_input: The input only holds new, changed and deleted rows,
+                as from a change feed, instead of all rows. Rows that are missing
+                in the input are then not deleted, and only the cache rows of the
+                incoming keys are compared.
+            tombstone_col: With incremental_input, a boolean column of the input
+                that marks deleted rows. It is not written or hashed.
+            cache_format: 1 stores a 32-bit hash of each row. 2 stores a null-safe
+                64-bit fingerprint, see spetlr.utils.RowFingerprint, and expects the
+                cache table to be clustered by the key columns.
+                Use MigrateCacheToV2 to convert a cache table of format 1.
+            single_merge: Update the cache with the written and the deleted rows in
+                one merge, instead of one merge for each. If the delete operation
+                fails, the written rows are still merged into the cache.
 
         The table cache_table_name must exist and must have the following schema:
         (
             [key_cols column definitions],
-            rowHash INTEGER,
+            rowHash INTEGER,  -- BIGINT in cache_format 2
             loadedTime TIMESTAMP,
             deletedTime TIMESTAMP,
             [cache_id_cols definitions, (if used)]
         )
+        [CLUSTER BY ([key_cols]) in cache_format 2]
         """
 
         self.cache_id_cols = cache_id_cols or []
@@ -32,6 +51,14 @@ class CachedLoaderParameters:
         self.key_cols = key_cols
         if not key_cols:
             raise ValueError("key columns must be provided")
+        self.incremental_input = incremental_input
+        self.tombstone_col = tombstone_col
+        if tombstone_col and not incremental_input:
+            raise ValueError("a tombstone column requires incremental input")
+        self.cache_format = cache_format
+        if cache_format not in (1, 2):
+            raise ValueError(f"unknown cache format {cache_format}")
+        self.single_merge = single_merge
 
         self.rowHash = "rowHash"
         self.loadedTime = "loadedTime"
@@ -0,0 +1,91 @@
+import pyspark.sql.functions as f
+from pyspark.sql import DataFrame
+
+from spetlr.delta.metadata_cache import TableMetadataCache
+from spetlr.functions import get_unique_tempview_name
+from spetlr.spark import Spark
+from spetlr.utils import RowFingerprint
+
+from .CachedLoaderParameters import CachedLoaderParameters
+
+
+def MigrateCacheToV2(
+    params: CachedLoaderParameters,
+    target_table_name: str,
+    df: DataFrame = None,
+    location: str = None,
+) -> CachedLoaderParameters:
+    """
+    Copy the cache table of params, in cache format 1, into the new cache table
+    target_table_name in cache format 2, clustered by the key columns.
+
+    A 32-bit hash cannot be converted into a fingerprint. Without df, the cached
+    rows keep their hash as a BIGINT, which does not match the fingerprint of the
+    row, so every cached row is written once more by the first load with the new
+    cache. If df is the full input of the loader, the cached rows whose hash
+    matches their row in df get its fingerprint, so that only the rows that have
+    changed since the last load are written again.
+
+    Args:
+        params: The parameters of the cache of format 1.
+        target_table_name: The new cache table. It must not exist.
+        df: Optionally, all rows of the input of the loader.
+        location: Optionally, the location of the new cache table.
+
+    Returns:
+        The parameters for the new cache table.
+    """
+    p = params
+    if p.cache_format != 1:
+        raise ValueError("Only caches of format 1 can be migrated.")
+
+    cache = Spark.get().table(p.cache_table_name).alias("cache")
+    row_hash = f.col(f"cache.{p.rowHash}").cast("bigint")
+
+    if df is not None:
+        if p.tombstone_col:
+            df = df.where(~f.coalesce(f.col(p.tombstone_col), f.lit(False)))
+            df = df.drop(p.tombstone_col)
+        df = df.dropDuplicates(p.key_cols)
+        hashes = df.select(
+            *p.key_cols,
+            f.hash(*df.columns).alias("hashV1"),
+            RowFingerprint(df, df.columns).alias("hashV2"),
+        )
+        cache = cache.join(hashes.alias("df"), p.key_cols, "left")
+        row_hash = f.when(
+            f.col(f"cache.{p.deletedTime}").isNull()
+            & (f.col(f"cache.{p.rowHash}") == f.col("df.hashV1")),
+            f.col("df.hashV2"),
+        ).otherwise(row_hash)
+
+    cache = cache.select(
+        *p.key_cols,
+        row_hash.alias(p.rowHash),
+        f"cache.{p.loadedTime}",
+        f"cache.{p.deletedTime}",
+        *[f"cache.{c}" for c in p.cache_id_cols],
+    )
+
+    view_name = get_unique_tempview_name()
+    cache.createOrReplaceTempView(view_name)
+    try:
+        location_clause = f'LOCATION "{location}" ' if location else ""
+        Spark.get().sql(
+            f"CREATE TABLE {target_table_name} USING DELTA "
+            f"CLUSTER BY ({', '.join(p.key_cols)}) "
+            f"{location_clause}"
+            f"AS SELECT * FROM {view_name}"
+        )
+    finally:
+        Spark.get().catalog.dropTempView(view_name)
+    TableMetadataCache.invalidate(target_table_name)
+
+    return CachedLoaderParameters(
+        cache_table_name=target_table_name,
+        key_cols=p.key_cols,
+        cache_id_cols=p.cache_id_cols,
+        incremental_input=p.incremental_input,
+        tombstone_col=p.tombstone_col,
+        cache_format=2,
+    )
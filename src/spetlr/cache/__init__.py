@@ -1,2 +1,3 @@
 from .CachedLoader import CachedLoader  # noqa: F401
 from .CachedLoaderParameters import CachedLoaderParameters  # noqa: F401
+from .MigrateCache import MigrateCacheToV2  # noqa: F401
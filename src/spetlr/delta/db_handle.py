@@ -1,4 +1,5 @@
 from spetlr.configurator.configurator import Configurator
+from spetlr.delta.metadata_cache import TableMetadataCache
 from spetlr.exceptions import SpetlrException
 from spetlr.spark import Spark
 
@@ -43,9 +44,11 @@ class DbHandle:
 
     def drop(self) -> None:
         Spark.get().sql(f"DROP DATABASE IF EXISTS {self._name};")
+        TableMetadataCache.invalidate_database(self._name)
 
     def drop_cascade(self) -> None:
         Spark.get().sql(f"DROP DATABASE IF EXISTS {self._name} CASCADE;")
+        TableMetadataCache.invalidate_database(self._name)
 
     def create(self) -> None:
         sql = f"CREATE DATABASE IF NOT EXISTS {self._name} "
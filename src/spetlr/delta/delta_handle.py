@@ -2,14 +2,19 @@ from datetime import date, datetime
 from typing import Any, Dict, List, Optional, Union
 
 from pyspark.sql import DataFrame
+from pyspark.sql.utils import AnalysisException
 
 from spetlr.configurator.configurator import Configurator
+from spetlr.delta import table_statistics
+from spetlr.delta.merge_engine import MergeResult, merge_into, partition_predicate
+from spetlr.delta.metadata_cache import TableMetadataCache
+from spetlr.delta.snapshot import TableSnapshot
+from spetlr.delta.table_statistics import DeltaTableStatistics
 from spetlr.exceptions import SpetlrException
 from spetlr.functions import get_unique_tempview_name, init_dbutils
 from spetlr.spark import Spark
 from spetlr.tables.TableHandle import TableHandle
-from spetlr.utils.CheckDfMerge import CheckDfMerge
-from spetlr.utils.GetMergeStatement import GetMergeStatement
+from spetlr.utils.WriteSizing import WriteSizing
 
 
 class DeltaHandleException(SpetlrException):
@@ -34,6 +39,7 @@ class DeltaHandle(TableHandle):
         ignore_changes: bool = True,
         stream_start: Union[datetime, str] = None,
         max_bytes_per_trigger: int = None,
+        write_sizing: WriteSizing = None,
     ):
         """
         name: The name of the Delta table.
@@ -46,12 +52,15 @@ class DeltaHandle(TableHandle):
                                   the `dateparser` library can parse.
         max_bytes_per_trigger (optional): How much data gets
                                 processed in each micro-batch.
+        write_sizing (optional): The policy for the number of files that
+                                are written. By default, the partitioning of the
+                                written dataframe is kept.
         """
         self._name = name
         self._location = location
         self._data_format = data_format
+        self._write_sizing = write_sizing
 
-        self._partitioning: Optional[List[str]] = None
         self._validate()
 
         if options_dict is None or options_dict == "":
@@ -75,6 +84,7 @@ class DeltaHandle(TableHandle):
     @classmethod
     def from_tc(cls, id: str) -> "DeltaHandle":
         tc = Configurator()
+        write_target_bytes = tc.table_property(id, "write_target_bytes", "")
         return cls(
             name=tc.table_property(id, "name", ""),
             location=tc.table_property(id, "path", ""),
@@ -82,6 +92,11 @@ class DeltaHandle(TableHandle):
             ignore_changes=tc.table_property(id, "ignore_changes", "True"),
             stream_start=tc.table_property(id, "stream_start", ""),
             max_bytes_per_trigger=tc.table_property(id, "max_bytes_per_trigger", ""),
+            write_sizing=(
+                WriteSizing(target_bytes=int(write_target_bytes))
+                if write_target_bytes
+                else None
+            ),
         )
 
     def _validate(self):
@@ -107,22 +122,108 @@ class DeltaHandle(TableHandle):
         if self._data_format != "delta":
             raise DeltaHandleInvalidFormat("Only format delta is supported.")
 
-    def read(self) -> DataFrame:
-        """Read table by path if location is given, otherwise from name."""
+    def read(
+        self, version: int = None, timestamp: Union[datetime, str] = None
+    ) -> DataFrame:
+        """Read table by path if location is given, otherwise from name.
+
+        version or timestamp read the table as it was at that version or point in
+        time. Without them, the table is read at the version that is pinned by the
+        active TableSnapshot, if any, else at its latest version."""
+        if version is not None and timestamp is not None:
+            raise DeltaHandleException("Give either a version or a timestamp.")
+        if version is None and timestamp is None:
+            snapshot = TableSnapshot.current()
+            if snapshot is not None:
+                version = snapshot.pinned_version(self)
+
+        if version is None and timestamp is None:
+            return self.read_latest()
+
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")
+        if self._location:
+            reader = Spark.get().read.format(self._data_format)
+            if version is not None:
+                reader = reader.option("versionAsOf", version)
+            else:
+                reader = reader.option("timestampAsOf", timestamp)
+            return reader.load(self._location)
+
+        # like in the CachedLoader, the version is fixed by time travel in sql
+        travel = (
+            f"VERSION AS OF {int(version)}"
+            if version is not None
+            else f"TIMESTAMP AS OF '{timestamp}'"
+        )
+        return Spark.get().sql(f"SELECT * FROM {self._name} {travel}")
+
+    def read_latest(self) -> DataFrame:
+        """Read the latest version of the table, also in a TableSnapshot.
+        Used where the current state of the table is needed, e.g. to write to it."""
         if self._location:
             return Spark.get().read.format(self._data_format).load(self._location)
         return Spark.get().table(self._name)
 
+    def read_changes(self, start_version: int, end_version: int = None) -> DataFrame:
+        """Read the change data feed of the table from start_version to
+        end_version, both included, or to the latest version. The rows have the
+        columns of the table and _change_type, _commit_version and
+        _commit_timestamp. The table must have delta.enableChangeDataFeed."""
+        reader = (
+            Spark.get()
+            .read.format(self._data_format)
+            .option("readChangeFeed", "true")
+            .option("startingVersion", start_version)
+        )
+        if end_version is not None:
+            reader = reader.option("endingVersion", end_version)
+        if self._location:
+            return reader.load(self._location)
+        return reader.table(self._name)
+
+    def _release_snapshot(self) -> None:
+        snapshot = TableSnapshot.current()
+        if snapshot is not None:
+            snapshot.release(self)
+
     def write_or_append(
         self,
         df: DataFrame,
         mode: str,
         mergeSchema: bool = None,
         overwriteSchema: bool = None,
+        replaceWhere: str = None,
     ) -> None:
-        assert mode in {"append", "overwrite"}
+        """Write df to the table. The mode "overwrite_partitions" only replaces
+        the partitions that df has rows in, see overwrite_partitions."""
+        assert mode in {"append", "overwrite", "overwrite_partitions"}
+
+        dynamic = False
+        if mode == "overwrite_partitions":
+            mode = "overwrite"
+            if replaceWhere is None:
+                partition_cols = self.get_partitioning()
+                if not partition_cols:
+                    raise DeltaHandleException(
+                        f"Cannot overwrite partitions of {self._name}, "
+                        "the table is not partitioned."
+                    )
+                replaceWhere = partition_predicate(
+                    df, partition_cols, max_partition_values=100
+                )
+                # too many partitions for a predicate, or nothing to write
+                dynamic = replaceWhere is None
+
+        if self._write_sizing is not None:
+            df = self._write_sizing.apply(df, self._partitioning_if_exists())
 
         writer = df.write.format(self._data_format).mode(mode)
+        if replaceWhere is not None:
+            # only the rows that match the predicate are overwritten
+            writer = writer.option("replaceWhere", replaceWhere)
+        if dynamic:
+            writer = writer.option("partitionOverwriteMode", "dynamic")
         if mergeSchema is not None:
             writer = writer.option("mergeSchema", "true" if mergeSchema else "false")
 
@@ -131,10 +232,14 @@ class DeltaHandle(TableHandle):
                 "overwriteSchema", "true" if overwriteSchema else "false"
             )
 
-        if self._location:
-            return writer.save(self._location)
+        self._release_snapshot()
+        try:
+            if self._location:
+                return writer.save(self._location)
 
-        return writer.saveAsTable(self._name)
+            return writer.saveAsTable(self._name)
+        finally:
+            TableMetadataCache.invalidate(self._name)
 
     def overwrite(
         self, df: DataFrame, mergeSchema: bool = None, overwriteSchema: bool = None
@@ -146,11 +251,20 @@ class DeltaHandle(TableHandle):
     def append(self, df: DataFrame, mergeSchema: bool = None) -> None:
         return self.write_or_append(df, "append", mergeSchema=mergeSchema)
 
+    def overwrite_partitions(self, df: DataFrame, mergeSchema: bool = None) -> None:
+        """Replace the partitions of the table that df has rows in, and keep all
+        other partitions. Up to 100 partitions are replaced by a replaceWhere
+        predicate on their values, more by dynamic partition overwrite."""
+        return self.write_or_append(df, "overwrite_partitions", mergeSchema=mergeSchema)
+
     def truncate(self) -> None:
+        self._release_snapshot()
         Spark.get().sql(f"TRUNCATE TABLE {self._name};")
+        TableMetadataCache.invalidate(self._name)
 
     def drop(self) -> None:
         Spark.get().sql(f"DROP TABLE IF EXISTS {self._name};")
+        TableMetadataCache.invalidate(self._name)
 
     def drop_and_delete(self) -> None:
         self.drop()
@@ -162,6 +276,7 @@ class DeltaHandle(TableHandle):
         if self._location:
             sql += f" USING DELTA LOCATION '{self._location}'"
         Spark.get().sql(sql)
+        TableMetadataCache.invalidate(self._name)
 
     def recreate_hive_table(self):
         self.drop()
@@ -176,24 +291,55 @@ class DeltaHandle(TableHandle):
         +------+--------------------+--------------------+----------------+-------+
         but this method return the partitioning in the form ['mycolA'],
         if there is no partitioning, an empty list is returned.
+        The details are kept in the TableMetadataCache.
         """
-        if self._partitioning is None:
-            self._partitioning = (
-                Spark.get()
-                .sql(f"DESCRIBE DETAIL {self.get_tablename()}")
-                .select("partitionColumns")
-                .collect()[0][0]
-            )
-        return self._partitioning
+        return TableMetadataCache.get(self.get_tablename()).partitioning
+
+    def _partitioning_if_exists(self) -> List[str]:
+        try:
+            return self.get_partitioning()
+        except AnalysisException:
+            # the table is created by the write
+            return []
 
     def get_tablename(self) -> str:
         return self._name
 
+    def get_location(self) -> str:
+        """The file-system path of the table, from DESCRIBE DETAIL if the handle
+        was not created with a location."""
+        if self._location:
+            return self._location
+        return TableMetadataCache.get(self.get_tablename()).location
+
+    def get_statistics(self, columns: List[str] = None) -> DeltaTableStatistics:
+        """The row count, and the min, max and null count of the given columns,
+        from the statistics in the delta transaction log. The data is only
+        scanned where the log has no exact answer, see
+        spetlr.delta.table_statistics."""
+        return table_statistics.read_statistics(self, columns)
+
+    def is_empty(self) -> bool:
+        """True if the table has no rows, from the delta transaction log."""
+        return table_statistics.is_empty(self)
+
+    def get_latest_partition(self) -> Optional[Dict[str, Any]]:
+        """The values of the greatest partition that holds rows, ordered by the
+        partition columns, from the delta transaction log.
+        None if the table is empty."""
+        return table_statistics.latest_partition(self)
+
+    def get_latest_version(self) -> int:
+        """The version of the latest commit in the delta transaction log."""
+        return TableMetadataCache.get(self.get_tablename()).version
+
     def upsert(
         self,
         df: DataFrame,
         join_cols: List[str],
-    ) -> Union[DataFrame, None]:
+    ) -> Optional[MergeResult]:
+        """Upsert df into the table by the join columns, see merge. Rows with null
+        keys are discarded. Returns None if df is None."""
         if df is None:
             return None
 
@@ -203,50 +349,29 @@ class DeltaHandle(TableHandle):
             " will be discarded before load."
         )
 
-        df_target = self.read()
-
-        # If the target is empty, always do faster full load
-        if len(df_target.take(1)) == 0:
-            return self.write_or_append(df, mode="overwrite")
-
-        # Find records that need to be updated in the target (happens seldom)
+        return self.merge(df, join_cols)
 
-        # Define the column to be used for checking for new rows
-        # Checking the null-ness of one right row is sufficient to mark the row as new,
-        # since null keys are disallowed.
-
-        df, merge_required = CheckDfMerge(
-            df=df,
-            df_target=df_target,
-            join_cols=join_cols,
-            avoid_cols=[],
-        )
-
-        if not merge_required:
-            return self.write_or_append(df, mode="append")
-
-        temp_view_name = get_unique_tempview_name()
-        df.createOrReplaceGlobalTempView(temp_view_name)
-
-        target_table_name = self.get_tablename()
-        non_join_cols = [col for col in df.columns if col not in join_cols]
-
-        merge_sql_statement = GetMergeStatement(
-            merge_statement_type="delta",
-            target_table_name=target_table_name,
-            source_table_name="global_temp." + temp_view_name,
-            join_cols=join_cols,
-            insert_cols=df.columns,
-            update_cols=non_join_cols,
-            special_update_set="",
+    def merge(
+        self,
+        df: DataFrame,
+        join_cols: List[str],
+        *,
+        detect_changes: bool = True,
+        complete_partitions: bool = False,
+    ) -> MergeResult:
+        """Upsert df into the table by the join columns with the cheapest strategy,
+        and return the strategy and the delta operation metrics of the load.
+        See spetlr.delta.merge_engine for the strategies and the options.
+        Rows with null keys must be removed beforehand."""
+        self._release_snapshot()
+        return merge_into(
+            self,
+            df,
+            join_cols,
+            detect_changes=detect_changes,
+            complete_partitions=complete_partitions,
         )
 
-        df._jdf.sparkSession().sql(merge_sql_statement)
-
-        print("Incremental Base - incremental load with merge")
-
-        return df
-
     def delete_data(
         self, comparison_col: str, comparison_limit: Any, comparison_operator: str
     ) -> None:
@@ -256,11 +381,54 @@ class DeltaHandle(TableHandle):
             or isinstance(comparison_limit, datetime)
         )
         limit = f"'{comparison_limit}'" if needs_quotes else comparison_limit
-        sql_str = (
-            f"DELETE FROM {self._name}"
-            f" WHERE {comparison_col} {comparison_operator} {limit};"
+
+        # Whole partitions whose rows all match, by the statistics in the log, are
+        # deleted by a condition on the partition columns. Delta then removes
+        # their files without reading them. The partitions are None unless the
+        # log replay has found all active files, and only the row DELETE is run.
+        partitions = table_statistics.covered_partitions(
+            self, comparison_col, comparison_operator, str(limit)
+        )
+        predicate = (
+            partition_predicate(
+                partitions, self.get_partitioning(), max_partition_values=100
+            )
+            if partitions is not None
+            else None
         )
-        Spark.get().sql(sql_str)
+        self._release_snapshot()
+        try:
+            if predicate:
+                Spark.get().sql(f"DELETE FROM {self._name} WHERE {predicate};")
+
+            sql_str = (
+                f"DELETE FROM {self._name}"
+                f" WHERE {comparison_col} {comparison_operator} {limit};"
+            )
+            Spark.get().sql(sql_str)
+        finally:
+            TableMetadataCache.invalidate(self._name)
+
+    def delete_keys(self, df: DataFrame, join_cols: List[str]) -> None:
+        """Delete the rows of the table whose join columns match a row of df."""
+        keys = (
+            df.select(*join_cols)
+            .filter(" AND ".join(f"({col} is NOT NULL)" for col in join_cols))
+            .distinct()
+        )
+        temp_view_name = get_unique_tempview_name()
+        keys.createOrReplaceTempView(temp_view_name)
+        condition = " AND ".join(f"target.{col} = source.{col}" for col in join_cols)
+        self._release_snapshot()
+        try:
+            Spark.get().sql(
+                f"MERGE INTO {self._name} AS target"
+                f" USING {temp_view_name} AS source ON {condition}"
+                " WHEN MATCHED THEN DELETE"
+            )
+        finally:
+            Spark.get().catalog.dropTempView(temp_view_name)
+            TableMetadataCache.invalidate(self._name)
 
     def read_stream(self) -> DataFrame:
         reader = (
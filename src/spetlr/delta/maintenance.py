@@ -0,0 +1,461 @@
+"""
+Maintenance of delta tables by OPTIMIZE, Z-ordering and VACUUM.
+
+The file layout of every table is read from its transaction log, see
+spetlr.delta.table_statistics, and an operation is only planned where it is
+worthwhile:
+
+- compaction, when the table has at least min_small_files small files in
+  partitions that hold more than one of them. Only these partitions are compacted.
+- Z-ordering on the configured columns, when at least zorder_min_fraction of the
+  bytes of the table were written since the last Z-ordering. Only the partitions
+  with such files are Z-ordered. Z-ordering also compacts, so a table with
+  Z-order columns is never compacted separately.
+- VACUUM, when the last vacuum is older than vacuum_interval.
+
+Every operation is recorded in a history table. Tables that have no new commits
+since their last compaction or Z-ordering are not compacted again, and the
+recorded durations are used to skip operations that do not fit into the
+remaining time budget of a run.
+"""
+import calendar
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pyspark.sql.functions as f
+from pyspark.sql import DataFrame, Window
+from pyspark.sql.types import (
+    DoubleType,
+    LongType,
+    MapType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+from pyspark.sql.utils import AnalysisException
+
+from spetlr.delta.delta_handle import DeltaHandle
+from spetlr.delta.merge_engine import partition_predicate
+from spetlr.delta.metadata_cache import TableMetadataCache
+from spetlr.delta.table_statistics import active_files, physical_names
+from spetlr.exceptions import SpetlrException
+from spetlr.spark import Spark
+
+
+class TableMaintenanceException(SpetlrException):
+    """Raised after a run when one or more operations failed.
+    The errors are available per table and operation in the attribute errors."""
+
+    def __init__(self, errors: Dict[Tuple[str, str], BaseException]):
+        self.errors = errors
+        super().__init__(
+            f"{len(errors)} maintenance operation(s) failed: "
+            + ", ".join(f"{op} {name}: {err!r}" for (name, op), err in errors.items())
+        )
+
+
+@dataclass
+class FileLayout:
+    """The data files of a table, from its transaction log. The small files are
+    only counted in partitions with more than one small file, since a single
+    file cannot be compacted."""
+
+    num_files: int
+    total_bytes: int
+    num_partitions: int
+    max_partition_files: int
+    small_files: int
+
+    @property
+    def avg_file_bytes(self) -> float:
+        return self.total_bytes / self.num_files if self.num_files else 0.0
+
+    @property
+    def partition_skew(self) -> float:
+        """The number of files of the largest partition relative to the mean."""
+        if not self.num_files:
+            return 0.0
+        return self.max_partition_files / (self.num_files / self.num_partitions)
+
+
+@dataclass
+class MaintenanceAction:
+    table_name: str
+    operation: str
+    statement: str
+    reason: str
+    priority: float = 0.0
+    estimated_seconds: Optional[float] = None
+
+
+@dataclass
+class MaintenanceResult:
+    action: MaintenanceAction
+    version: Optional[int]
+    start_time: datetime
+    end_time: datetime
+    metrics: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def duration_seconds(self) -> float:
+        return (self.end_time - self.start_time).total_seconds()
+
+
+class TableMaintenance:
+    """Plan and run the maintenance of a set of delta tables.
+
+        maintenance = TableMaintenance(DeltaHandle.from_tc("MaintenanceHistory"))
+        maintenance.add("SalesTable", zorder_by=["CustomerId"])
+        maintenance.add(DeltaTableSpec.from_tc("EventsTable"))
+        maintenance.run(time_budget=timedelta(minutes=30))
+
+    The history table is created by the first run if it does not exist.
+    """
+
+    history_schema = StructType(
+        [
+            StructField("TableName", StringType()),
+            StructField("Operation", StringType()),
+            StructField("TableVersion", LongType()),
+            StructField("StartTime", TimestampType()),
+            StructField("EndTime", TimestampType()),
+            StructField("DurationSeconds", DoubleType()),
+            StructField("Reason", StringType()),
+            StructField("OperationMetrics", MapType(StringType(), LongType())),
+        ]
+    )
+
+    def __init__(
+        self,
+        history: DeltaHandle,
+        *,
+        target_file_bytes: int = 128 * 1024**2,
+        min_small_files: int = 16,
+        zorder_min_fraction: float = 0.1,
+        vacuum_interval: timedelta = timedelta(days=7),
+        vacuum_retain_hours: int = 168,
+        max_partition_values: int = 100,
+    ):
+        """
+        history: The delta table of the maintenance history.
+        target_file_bytes: Files below half this size are small.
+        min_small_files: The number of small files that makes compaction worthwhile.
+        zorder_min_fraction: The fraction of the bytes of a table that must be
+            new since the last Z-ordering to Z-order it again.
+        vacuum_interval: The minimum time between two vacuums of a table.
+        vacuum_retain_hours: The retention of the vacuum.
+        max_partition_values: An operation on more partitions covers the whole
+            table instead of a predicate on the partitions.
+        """
+        self.history = history
+        self.target_file_bytes = target_file_bytes
+        self.min_small_files = min_small_files
+        self.zorder_min_fraction = zorder_min_fraction
+        self.vacuum_interval = vacuum_interval
+        self.vacuum_retain_hours = vacuum_retain_hours
+        self.max_partition_values = max_partition_values
+        self.tables: List[Tuple[DeltaHandle, List[str]]] = []
+
+    def add(self, table, zorder_by: List[str] = None) -> "TableMaintenance":
+        """Add a table by its DeltaHandle, its DeltaTableSpec or its table id in
+        the Configurator. zorder_by are the columns to Z-order by, e.g. the join
+        columns of upserts into the table."""
+        from spetlr.deltaspec import DeltaTableSpec
+
+        if isinstance(table, str):
+            table = DeltaHandle.from_tc(table)
+        elif isinstance(table, DeltaTableSpec):
+            table = DeltaHandle(name=table.name)
+        self.tables.append((table, list(zorder_by or [])))
+        return self
+
+    def plan(self) -> List[MaintenanceAction]:
+        """The worthwhile operations on all tables, by descending priority."""
+        history = self._last_operations()
+        actions = []
+        for handle, zorder_by in self.tables:
+            actions += self._plan_table(handle, zorder_by, history)
+        return sorted(actions, key=lambda action: -action.priority)
+
+    def run(self, time_budget: timedelta = None) -> List[MaintenanceResult]:
+        """Run the planned operations until the time budget is spent. Operations
+        whose last duration exceeds the remaining budget are skipped. Every
+        completed operation is recorded in the history at once."""
+        start = time.monotonic()
+        budget = time_budget.total_seconds() if time_budget else None
+        results = []
+        errors = {}
+        for action in self.plan():
+            if budget is not None:
+                remaining = budget - (time.monotonic() - start)
+                if remaining <= 0 or (action.estimated_seconds or 0) > remaining:
+                    print(
+                        f"Maintenance of {action.table_name}: skipping "
+                        f"{action.operation}, it does not fit the time budget"
+                    )
+                    continue
+            try:
+                result = self._execute(action)
+            except Exception as e:
+                errors[(action.table_name, action.operation)] = e
+                continue
+            self._record(result)
+            results.append(result)
+
+        if errors:
+            raise TableMaintenanceException(errors)
+        return results
+
+    def file_layout(self, handle: DeltaHandle) -> Optional[FileLayout]:
+        """The layout of the files of the table, or None if the transaction log
+        cannot be read."""
+        partitions = self._partition_files(handle)
+        if partitions is None:
+            return None
+        return self._layout(partitions)
+
+    @staticmethod
+    def _layout(partitions: DataFrame) -> FileLayout:
+        (row,) = partitions.agg(
+            f.sum("files").alias("num_files"),
+            f.sum("bytes").alias("total_bytes"),
+            f.count(f.lit(1)).alias("num_partitions"),
+            f.max("files").alias("max_partition_files"),
+            f.sum(f.when(f.col("small") > 1, f.col("small"))).alias("small_files"),
+        ).collect()
+        return FileLayout(
+            num_files=row["num_files"] or 0,
+            total_bytes=row["total_bytes"] or 0,
+            num_partitions=row["num_partitions"],
+            max_partition_files=row["max_partition_files"] or 0,
+            small_files=row["small_files"] or 0,
+        )
+
+    def _partition_files(
+        self, handle: DeltaHandle, since: datetime = None
+    ) -> Optional[DataFrame]:
+        """Per partition, the number of files and bytes, the number of small files,
+        and the bytes written after since."""
+        names = physical_names(handle)
+        files = active_files(handle) if names is not None else None
+        if files is None:
+            return None
+        partition_cols = handle.get_partitioning()
+        types = {
+            field.name: field.dataType for field in handle.read_latest().schema.fields
+        }
+
+        new = f.lit(True)
+        if since is not None:
+            new = f.col("modificationTime") > calendar.timegm(since.timetuple()) * 1000
+        return files.groupBy(
+            *[
+                f.col("partitionValues")[names[col]].cast(types[col]).alias(col)
+                for col in partition_cols
+            ]
+        ).agg(
+            f.count(f.lit(1)).alias("files"),
+            f.sum("size").alias("bytes"),
+            f.sum(
+                f.when(f.col("size") < self.target_file_bytes / 2, 1).otherwise(0)
+            ).alias("small"),
+            f.sum(
+                f.when(f.col("size") < self.target_file_bytes / 2, f.col("size"))
+            ).alias("small_bytes"),
+            f.sum(f.when(new, f.col("size")).otherwise(0)).alias("new_bytes"),
+        )
+
+    def _plan_table(
+        self,
+        handle: DeltaHandle,
+        zorder_by: List[str],
+        history: Dict[Tuple[str, str], dict],
+    ) -> List[MaintenanceAction]:
+        name = handle.get_tablename()
+        partition_cols = handle.get_partitioning()
+        zorder_by = [col for col in zorder_by if col not in partition_cols]
+        optimize_op = "ZORDER" if zorder_by else "OPTIMIZE"
+        last_optimize = history.get((name, optimize_op))
+        last_vacuum = history.get((name, "VACUUM"))
+
+        actions = []
+        # a table without commits since its last optimize is not optimized again.
+        # Only the optimize counts, a vacuum alone does not compact the table.
+        if (
+            last_optimize
+            and last_optimize["TableVersion"] >= handle.get_latest_version()
+        ):
+            partitions = None
+        else:
+            since = last_optimize["EndTime"] if last_optimize else None
+            partitions = self._partition_files(handle, since)
+
+        if partitions is not None:
+            partitions = partitions.persist()
+            layout = self._layout(partitions)
+            (row,) = partitions.agg(
+                f.sum("new_bytes").alias("new_bytes"),
+                f.sum(f.when(f.col("small") > 1, f.col("small_bytes"))).alias(
+                    "small_bytes"
+                ),
+            ).collect()
+            new, small_bytes = row["new_bytes"] or 0, row["small_bytes"] or 0
+            summary = (
+                f"{layout.num_files} files of {layout.avg_file_bytes / 1024**2:.1f}MB"
+                f" on average, partition skew {layout.partition_skew:.1f}"
+            )
+
+            if (
+                zorder_by
+                and layout.total_bytes
+                and new / layout.total_bytes >= self.zorder_min_fraction
+            ):
+                where = self._where(
+                    partitions.where(f.col("new_bytes") > 0), partition_cols
+                )
+                actions.append(
+                    self._action(
+                        name,
+                        "ZORDER",
+                        f"OPTIMIZE {name}{where} ZORDER BY ({', '.join(zorder_by)})",
+                        f"{new / layout.total_bytes:.0%} of the bytes are new, "
+                        + summary,
+                        priority=new,
+                        history=history,
+                    )
+                )
+            elif not zorder_by and layout.small_files >= self.min_small_files:
+                where = self._where(
+                    partitions.where(f.col("small") > 1), partition_cols
+                )
+                actions.append(
+                    self._action(
+                        name,
+                        "OPTIMIZE",
+                        f"OPTIMIZE {name}{where}",
+                        f"{layout.small_files} small files, " + summary,
+                        priority=small_bytes,
+                        history=history,
+                    )
+                )
+            partitions.unpersist()
+
+        if (
+            last_vacuum is None
+            or datetime.utcnow() - last_vacuum["EndTime"] >= self.vacuum_interval
+        ):
+            actions.append(
+                self._action(
+                    name,
+                    "VACUUM",
+                    f"VACUUM {name} RETAIN {self.vacuum_retain_hours} HOURS",
+                    "never vacuumed" if last_vacuum is None else "vacuum interval",
+                    priority=0,
+                    history=history,
+                )
+            )
+        return actions
+
+    def _where(self, partitions: DataFrame, partition_cols: List[str]) -> str:
+        if not partition_cols:
+            return ""
+        predicate = partition_predicate(
+            partitions.select(*partition_cols),
+            partition_cols,
+            self.max_partition_values,
+        )
+        return f" WHERE {predicate}" if predicate else ""
+
+    @staticmethod
+    def _action(
+        name: str,
+        operation: str,
+        statement: str,
+        reason: str,
+        priority: float,
+        history: Dict[Tuple[str, str], dict],
+    ) -> MaintenanceAction:
+        last = history.get((name, operation))
+        return MaintenanceAction(
+            table_name=name,
+            operation=operation,
+            statement=statement,
+            reason=reason,
+            priority=priority,
+            estimated_seconds=last["DurationSeconds"] if last else None,
+        )
+
+    def _last_operations(self) -> Dict[Tuple[str, str], dict]:
+        """The latest record of every table and operation in the history."""
+        try:
+            df = self.history.read_latest()
+        except AnalysisException:
+            # the history is created by the first run
+            return {}
+        latest = Window.partitionBy("TableName", "Operation").orderBy(
+            f.col("EndTime").desc()
+        )
+        rows = (
+            df.where(
+                f.col("TableName").isin([h.get_tablename() for h, _ in self.tables])
+            )
+            .withColumn("rank", f.row_number().over(latest))
+            .where(f.col("rank") == 1)
+            .collect()
+        )
+        return {(row["TableName"], row["Operation"]): row.asDict() for row in rows}
+
+    @staticmethod
+    def _execute(action: MaintenanceAction) -> MaintenanceResult:
+        print(
+            f"Maintenance of {action.table_name}: {action.operation}, "
+            f"{action.reason}"
+        )
+        spark = Spark.get()
+        start_time = datetime.utcnow()
+        spark.sql(action.statement)
+        end_time = datetime.utcnow()
+        TableMetadataCache.invalidate(action.table_name)
+
+        (commit,) = (
+            spark.sql(f"DESCRIBE HISTORY {action.table_name} LIMIT 1")
+            .select("version", "operation", "operationMetrics")
+            .collect()
+        )
+        metrics = {}
+        # the vacuum of older delta versions does not commit
+        if commit["operation"].startswith(action.statement.split()[0]):
+            metrics = {
+                key: int(value)
+                for key, value in (commit["operationMetrics"] or {}).items()
+                if value is not None and value.lstrip("-").isdigit()
+            }
+        return MaintenanceResult(
+            action=action,
+            version=commit["version"],
+            start_time=start_time,
+            end_time=end_time,
+            metrics=metrics,
+        )
+
+    def _record(self, result: MaintenanceResult) -> None:
+        self.history.append(
+            Spark.get().createDataFrame(
+                [
+                    (
+                        result.action.table_name,
+                        result.action.operation,
+                        result.version,
+                        result.start_time,
+                        result.end_time,
+                        result.duration_seconds,
+                        result.action.reason,
+                        result.metrics,
+                    )
+                ],
+                schema=self.history_schema,
+            )
+        )
@@ -0,0 +1,310 @@
+"""
+A single implementation of loading a batch of rows into a delta table by key.
+
+For every batch, the cheapest strategy that gives the upserted result is chosen:
+
+- "overwrite" if the target is empty,
+- "replace_where" if the batch holds complete partitions of the target,
+- "skip" if the batch has no new or changed rows,
+- "append" if the batch only has new rows,
+- "merge" otherwise.
+
+The result of every load holds the strategy and the operationMetrics of the delta
+commit, such as numTargetRowsInserted, numTargetRowsUpdated, numTargetFilesAdded,
+numTargetFilesRemoved and executionTimeMs. A MergeMetricsCollector records the
+results of all loads in the process while it is active.
+
+The commit of a load is identified in the table history as the only commit with
+the expected operation after the version that the load started from. If other
+jobs committed the same operation to the table in the meantime, the commit is
+ambiguous. The version is then None, and a merge reports the row counts that the
+MERGE statement returned.
+"""
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from pyspark.sql import DataFrame, Row
+from pyspark.sql.types import (
+    LongType,
+    MapType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+
+from spetlr.delta.metadata_cache import TableMetadataCache
+from spetlr.functions import get_unique_tempview_name
+from spetlr.spark import Spark
+from spetlr.utils.CheckDfMerge import CheckDfMerge
+from spetlr.utils.GetMergeStatement import GetMergeStatement
+from spetlr.utils.GetPruningPredicate import GetPruningPredicate, _literal
+from spetlr.utils.RowFingerprint import FINGERPRINT_COL, AddRowFingerprint
+
+if TYPE_CHECKING:  # pragma: no cover
+    from spetlr.delta.delta_handle import DeltaHandle
+
+STRATEGIES = {"overwrite", "replace_where", "skip", "append", "merge"}
+
+# the operations in the table history that the strategies commit
+_OPERATIONS = {
+    "overwrite": {"WRITE", "CREATE OR REPLACE TABLE AS SELECT"},
+    "replace_where": {"WRITE", "CREATE OR REPLACE TABLE AS SELECT"},
+    "append": {"WRITE"},
+    "merge": {"MERGE"},
+}
+
+# the row counts of the result of a MERGE statement, by their operation metric
+_MERGE_OUTPUT_METRICS = {
+    "num_inserted_rows": "numTargetRowsInserted",
+    "num_updated_rows": "numTargetRowsUpdated",
+    "num_deleted_rows": "numTargetRowsDeleted",
+}
+
+
+@dataclass
+class MergeResult:
+    """The outcome of loading one batch into a delta table. The version and the
+    metrics are those of the delta commit, they are None and empty if nothing
+    was committed."""
+
+    table_name: str
+    strategy: str
+    version: Optional[int] = None
+    metrics: Dict[str, int] = field(default_factory=dict)
+    timestamp: datetime = field(default_factory=datetime.utcnow)
+
+
+class MergeMetricsCollector:
+    """Collects the results of all merges in the process while it is active.
+
+    with MergeMetricsCollector() as collector:
+        orchestrator.execute()
+    collector.to_dataframe()
+    """
+
+    _lock = threading.Lock()
+    _active: List["MergeMetricsCollector"] = []
+
+    schema = StructType(
+        [
+            StructField("TableName", StringType()),
+            StructField("Strategy", StringType()),
+            StructField("Version", LongType()),
+            StructField("MergeTimestamp", TimestampType()),
+            StructField("OperationMetrics", MapType(StringType(), LongType())),
+        ]
+    )
+
+    def __init__(self):
+        self.results: List[MergeResult] = []
+
+    def __enter__(self) -> "MergeMetricsCollector":
+        with self._lock:
+            self._active.append(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        with self._lock:
+            self._active.remove(self)
+
+    @classmethod
+    def record(cls, result: MergeResult) -> None:
+        with cls._lock:
+            for collector in cls._active:
+                collector.results.append(result)
+
+    def to_dataframe(self) -> DataFrame:
+        """The results as a dataframe with one row per merge."""
+        return Spark.get().createDataFrame(
+            [
+                (r.table_name, r.strategy, r.version, r.timestamp, r.metrics)
+                for r in self.results
+            ],
+            schema=self.schema,
+        )
+
+
+def merge_into(
+    handle: "DeltaHandle",
+    df: DataFrame,
+    join_cols: List[str],
+    *,
+    detect_changes: bool = True,
+    complete_partitions: bool = False,
+    max_partition_values: int = 100,
+) -> MergeResult:
+    """Upsert df into the delta table of the handle by the join columns.
+
+    With detect_changes, the incoming rows are first compared with the target, see
+    CheckDfMerge, so that unchanged rows are not written and a batch of only new
+    rows is appended. Without it, every row is merged, which is cheaper when the
+    rows are known to be new or changed.
+
+    With complete_partitions, the caller guarantees that df holds all rows of every
+    partition that it touches. These partitions are then replaced by replaceWhere,
+    and their target rows that are missing in df are removed. If there are more
+    than max_partition_values partitions in df, a merge is used instead.
+
+    Rows with null keys must be removed by the caller.
+    """
+    df_target = handle.read_latest()
+    target_is_empty = handle.is_empty()
+    start_version = handle.get_latest_version()
+
+    if FINGERPRINT_COL in df_target.columns and (
+        target_is_empty or complete_partitions or not detect_changes
+    ):
+        # otherwise, the fingerprint is added when comparing with the target
+        df = AddRowFingerprint(df, join_cols)
+
+    # If the target is empty, always do faster full load
+    if target_is_empty:
+        handle.write_or_append(df, mode="overwrite")
+        return _record(handle, "overwrite", start_version)
+
+    partition_cols = handle.get_partitioning()
+    if complete_partitions and partition_cols:
+        predicate = partition_predicate(df, partition_cols, max_partition_values)
+        if predicate:
+            handle.write_or_append(df, mode="overwrite", replaceWhere=predicate)
+            return _record(handle, "replace_where", start_version)
+
+    # The incoming rows are read more than once, to derive the pruning predicate
+    # and to compare them with the target.
+    df = df.persist()
+    persisted = [df]
+    try:
+        if not df.take(1):
+            return _record(handle, "skip", start_version)
+
+        # Only the target rows within the key ranges and partitions of the
+        # incoming rows can match, the rest of the target is not scanned.
+        target_filter = GetPruningPredicate(
+            df=df,
+            join_cols=join_cols,
+            partition_cols=partition_cols,
+            alias="target",
+        )
+
+        if detect_changes:
+            if target_filter:
+                df_target = df_target.alias("target").where(target_filter)
+
+            df, merge_required = CheckDfMerge(
+                df=df,
+                df_target=df_target,
+                join_cols=join_cols,
+                avoid_cols=[],
+                persisted=persisted,
+            )
+
+            if not merge_required:
+                if not df.take(1):
+                    return _record(handle, "skip", start_version)
+                handle.write_or_append(df, mode="append")
+                return _record(handle, "append", start_version)
+
+        temp_view_name = get_unique_tempview_name()
+        df.createOrReplaceGlobalTempView(temp_view_name)
+        try:
+            merge_sql_statement = GetMergeStatement(
+                merge_statement_type="delta",
+                target_table_name=handle.get_tablename(),
+                source_table_name="global_temp." + temp_view_name,
+                join_cols=join_cols,
+                insert_cols=df.columns,
+                update_cols=[col for col in df.columns if col not in join_cols],
+                target_filter=target_filter,
+            )
+            merge_output = Spark.get().sql(merge_sql_statement).collect()
+        finally:
+            Spark.get().catalog.dropGlobalTempView(temp_view_name)
+    finally:
+        for cached in persisted:
+            cached.unpersist()
+
+    return _record(handle, "merge", start_version, merge_output)
+
+
+def partition_predicate(
+    df: DataFrame, partition_cols: List[str], max_partition_values: int
+) -> Optional[str]:
+    """A predicate that selects exactly the partitions of the rows in df, or None
+    if df is empty or has too many partitions."""
+    partitions = (
+        df.select(*[df[col].cast("string").alias(col) for col in partition_cols])
+        .distinct()
+        .limit(max_partition_values + 1)
+        .collect()
+    )
+    if not partitions or len(partitions) > max_partition_values:
+        return None
+
+    types = {field.name: field.dataType for field in df.schema.fields}
+    conditions = []
+    for partition in partitions:
+        parts = []
+        for col in partition_cols:
+            if partition[col] is None:
+                parts.append(f"{col} IS NULL")
+            else:
+                parts.append(f"{col} = {_literal(partition[col], types[col])}")
+        conditions.append("(" + " AND ".join(parts) + ")")
+    return " OR ".join(conditions)
+
+
+def _record(
+    handle: "DeltaHandle",
+    strategy: str,
+    start_version: int,
+    merge_output: List[Row] = None,
+) -> MergeResult:
+    result = MergeResult(table_name=handle.get_tablename(), strategy=strategy)
+    if strategy != "skip":
+        TableMetadataCache.invalidate(handle.get_tablename())
+        commits = [
+            commit
+            for commit in _commits_since(handle, start_version)
+            if commit["operation"] in _OPERATIONS[strategy]
+        ]
+        if len(commits) == 1:
+            (commit,) = commits
+            result.version = commit["version"]
+            result.metrics = {
+                key: int(value)
+                for key, value in (commit["operationMetrics"] or {}).items()
+                if value is not None and value.lstrip("-").isdigit()
+            }
+        else:
+            print(
+                f"Merge into {result.table_name}: the commit of the load is "
+                f"ambiguous, {len(commits)} commits since version {start_version} "
+                "have its operation."
+            )
+            if merge_output:
+                counts = merge_output[0].asDict()
+                result.metrics = {
+                    metric: int(counts[column])
+                    for column, metric in _MERGE_OUTPUT_METRICS.items()
+                    if counts.get(column) is not None
+                }
+
+    print(f"Merge into {result.table_name}: {strategy}", result.metrics)
+    MergeMetricsCollector.record(result)
+    return result
+
+
+def _commits_since(handle: "DeltaHandle", version: int) -> List[Row]:
+    """The commits to the table after the given version, newest first."""
+    count = handle.get_latest_version() - version
+    if count <= 0:
+        return []
+    return (
+        Spark.get()
+        .sql(f"DESCRIBE HISTORY {handle.get_tablename()} LIMIT {count}")
+        .select("version", "operation", "operationMetrics")
+        .collect()
+    )
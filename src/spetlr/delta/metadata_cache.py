@@ -0,0 +1,147 @@
+"""
+A process-wide cache of the metadata of delta tables.
+
+DESCRIBE DETAIL, DESCRIBE HISTORY and the schema of a table each need a round trip
+to the catalog and the transaction log. The cache keeps them per table name, and
+validates an entry on every use by checking in the transaction log that the cached
+version is still the latest one. This costs two small file-system requests instead
+of the catalog commands.
+
+spetlr invalidates the entry of a table when it writes to, creates or drops the
+table. Tables that are dropped and recreated outside of spetlr are detected unless
+the new table happens to reach exactly the cached version.
+"""
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from py4j.protocol import Py4JJavaError
+from pyspark.sql.types import StructType
+from pyspark.sql.utils import AnalysisException
+
+from spetlr.spark import Spark
+
+
+@dataclass
+class TableMetadata:
+    """The metadata of a delta table at a version.
+    The details are the row of DESCRIBE DETAIL as a dict."""
+
+    name: str
+    version: Optional[int]
+    details: Dict[str, Any]
+    schema: StructType
+
+    @property
+    def location(self) -> str:
+        return self.details["location"]
+
+    @property
+    def partitioning(self) -> List[str]:
+        return list(self.details["partitionColumns"])
+
+    @property
+    def clustering(self) -> List[str]:
+        """The liquid clustering columns, empty if the table is not clustered."""
+        return list(self.details.get("clusteringColumns") or [])
+
+    @property
+    def properties(self) -> Dict[str, str]:
+        return dict(self.details["properties"] or {})
+
+
+class TableMetadataCache:
+    """The cached metadata of all tables in the process, keyed by table name,
+    e.g. db.table or delta.`/path/to/table`.
+
+        TableMetadataCache.get("db.table").partitioning
+    """
+
+    _lock = threading.Lock()
+    _entries: Dict[str, TableMetadata] = {}
+
+    @classmethod
+    def get(cls, name: str) -> TableMetadata:
+        """The metadata of the current version of the table. Raises the
+        AnalysisException of DESCRIBE DETAIL if the table does not exist."""
+        key = cls._key(name)
+        with cls._lock:
+            metadata = cls._entries.get(key)
+
+        if metadata is not None and cls._is_current(metadata):
+            return metadata
+
+        metadata = cls._fetch(name)
+        if metadata.version is not None:
+            with cls._lock:
+                cls._entries[key] = metadata
+        return metadata
+
+    @classmethod
+    def invalidate(cls, name: str = None) -> None:
+        """Forget the metadata of the table, or of all tables if no name is given."""
+        with cls._lock:
+            if name is None:
+                cls._entries.clear()
+            else:
+                cls._entries.pop(cls._key(name), None)
+
+    @classmethod
+    def invalidate_database(cls, db_name: str) -> None:
+        """Forget the metadata of all tables in the database."""
+        prefix = cls._key(db_name) + "."
+        with cls._lock:
+            for key in [key for key in cls._entries if key.startswith(prefix)]:
+                del cls._entries[key]
+
+    @staticmethod
+    def _key(name: str) -> str:
+        # paths are case-sensitive, catalog names are not
+        if name.startswith("delta.`"):
+            return name
+        return name.lower()
+
+    @staticmethod
+    def _fetch(name: str) -> TableMetadata:
+        spark = Spark.get()
+        # the version is read first. If a commit happens before the details are
+        # read, the version is outdated and the metadata is fetched again on the
+        # next use.
+        try:
+            version = (
+                spark.sql(f"DESCRIBE HISTORY {name} LIMIT 1")
+                .select("version")
+                .take(1)[0][0]
+            )
+        except AnalysisException:
+            # not a delta table, or no table at all. It is not cached.
+            version = None
+        details = spark.sql(f"DESCRIBE DETAIL {name}").collect()[0].asDict()
+
+        return TableMetadata(
+            name=name,
+            version=version,
+            details=details,
+            schema=spark.table(name).schema,
+        )
+
+    @staticmethod
+    def _is_current(metadata: TableMetadata) -> bool:
+        """The cached version is the latest, if its commit exists in the
+        transaction log and the next commit does not."""
+        spark = Spark.get()
+        jvm = spark.sparkContext._jvm
+        log_dir = jvm.org.apache.hadoop.fs.Path(
+            metadata.location.rstrip("/") + "/_delta_log"
+        )
+
+        def commit(version: int):
+            return jvm.org.apache.hadoop.fs.Path(log_dir, f"{version:020d}.json")
+
+        try:
+            fs = log_dir.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration())
+            return fs.exists(commit(metadata.version)) and not fs.exists(
+                commit(metadata.version + 1)
+            )
+        except Py4JJavaError:
+            return False
@@ -0,0 +1,167 @@
+"""
+Consistent reads of several delta tables.
+
+While a TableSnapshot is active, every DeltaHandle.read() without an explicit
+version reads the table as it was when the snapshot started. The version is
+looked up in the history of the table at its first read, and it is used for all
+later reads in the snapshot, also by other handles of the same table. Joins of
+tables that are written by other jobs during a run therefore see a consistent
+state.
+
+When a table is written through its DeltaHandle during the snapshot, it is no
+longer pinned, so that later steps see what the run has written.
+
+The pinned versions are recorded in the snapshot. They can be stored in a state
+table and used to pin the same versions in a re-run.
+
+A snapshot is active in the thread that entered it, and in the threads that run
+in a copy of its context, such as the steps of a parallel orchestrator. Other
+runs in the same process are not affected by it.
+"""
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import pyspark.sql.functions as f
+from pyspark.sql.types import (
+    LongType,
+    MapType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+
+from spetlr.exceptions import SpetlrException
+from spetlr.spark import Spark
+
+if TYPE_CHECKING:  # pragma: no cover
+    from spetlr.delta.delta_handle import DeltaHandle
+
+
+class TableSnapshotException(SpetlrException):
+    pass
+
+
+# the active snapshots of the current context, innermost last
+_active: ContextVar[Tuple["TableSnapshot", ...]] = ContextVar(
+    "spetlr_table_snapshots", default=()
+)
+
+
+class TableSnapshot:
+    """Pin the versions of all delta tables that are read in the context.
+
+        with TableSnapshot() as snapshot:
+            orchestrator.execute()
+        snapshot.versions  # e.g. {"db.orders": 12, "db.customers": 4}
+
+    Or pass it to the orchestrator as Orchestrator(snapshot=TableSnapshot()).
+
+    timestamp: The point in time of the snapshot. By default, the time at which
+        the context is entered.
+    versions: Explicit versions per table name, e.g. from a previous run.
+        Other tables are read as of the timestamp.
+
+    The snapshot can be entered again, e.g. by every execution of an
+    orchestrator. Each time, the versions that were looked up in the previous
+    run are forgotten, and without an explicit timestamp, the snapshot starts
+    at the current time.
+    """
+
+    schema = StructType(
+        [
+            StructField("RunId", StringType(), True),
+            StructField("SnapshotTime", TimestampType(), True),
+            StructField("TableVersions", MapType(StringType(), LongType()), True),
+        ]
+    )
+
+    def __init__(
+        self, timestamp: datetime = None, versions: Dict[str, int] = None
+    ) -> None:
+        self.timestamp = timestamp
+        self.versions: Dict[str, int] = dict(versions or {})
+        self._given_timestamp = timestamp
+        self._given_versions = dict(self.versions)
+        self._released = set()
+        self._pin_lock = threading.Lock()
+
+    def __enter__(self) -> "TableSnapshot":
+        # a new run does not reuse the versions of the previous one
+        self.versions = dict(self._given_versions)
+        self.timestamp = self._given_timestamp
+        if self.timestamp is None:
+            # the time of the spark session, so that it compares with the
+            # timestamps of the table histories
+            self.timestamp = Spark.get().sql("SELECT current_timestamp()").first()[0]
+        _active.set(_active.get() + (self,))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _active.set(
+            tuple(snapshot for snapshot in _active.get() if snapshot is not self)
+        )
+        self._released.clear()
+
+    @classmethod
+    def current(cls) -> Optional["TableSnapshot"]:
+        """The innermost active snapshot of the current context, if any."""
+        active = _active.get()
+        return active[-1] if active else None
+
+    def pinned_version(self, handle: "DeltaHandle") -> Optional[int]:
+        """The version that the table is read at in this snapshot, or None if it
+        is read at its latest version."""
+        name = handle.get_tablename()
+        with self._pin_lock:
+            if name in self._released:
+                return None
+            if name not in self.versions:
+                version = self._version_at(name)
+                if version is None:
+                    # the table was created after the start of the snapshot
+                    return None
+                self.versions[name] = version
+            return self.versions[name]
+
+    def release(self, handle: "DeltaHandle") -> None:
+        """Read the table at its latest version from now on."""
+        with self._pin_lock:
+            self._released.add(handle.get_tablename())
+
+    def _version_at(self, name: str) -> Optional[int]:
+        (version,) = (
+            Spark.get()
+            .sql(f"DESCRIBE HISTORY {name}")
+            .where(f.col("timestamp") <= f.lit(self.timestamp))
+            .agg(f.max("version"))
+            .first()
+        )
+        return version
+
+    def save(self, state_table: "DeltaHandle", run_id: str) -> None:
+        """Append the pinned versions to the state table under the run id.
+        The state table is created if it does not exist."""
+        state_table.append(
+            Spark.get().createDataFrame(
+                [(run_id, self.timestamp, self.versions)], schema=self.schema
+            )
+        )
+
+    @classmethod
+    def load(cls, state_table: "DeltaHandle", run_id: str) -> "TableSnapshot":
+        """A snapshot with the versions and the time of a saved run."""
+        rows = (
+            state_table.read_latest()
+            .where(f.col("RunId") == run_id)
+            .orderBy(f.col("SnapshotTime").desc())
+            .take(1)
+        )
+        if not rows:
+            raise TableSnapshotException(f"No snapshot was saved for run {run_id}.")
+        return cls(
+            timestamp=rows[0]["SnapshotTime"],
+            versions=dict(rows[0]["TableVersions"]),
+        )
@@ -0,0 +1,535 @@
+"""
+Statistics of a delta table from its transaction log, without scanning data files.
+
+Every file that delta adds to a table is recorded in the transaction log with its
+partition values and, usually, with statistics: the number of records, and the
+minimum, maximum and null count of the first columns of the table. The active
+files are found by replaying the log from the latest checkpoint, and their
+statistics are aggregated.
+
+The data files are only scanned where the log cannot give an exact answer:
+
+- when files have no statistics for a column, e.g. for columns beyond
+  delta.dataSkippingNumIndexedCols,
+- when files have deletion vectors, since the statistics then include deleted rows,
+- for the minimum and maximum of strings, which delta truncates,
+- for the minimum and maximum of timestamps, which delta rounds to milliseconds.
+  Here, only the files around the logged values are read.
+
+With column mapping, the log records the partition values and statistics by the
+physical names of the columns, which are read from the schema in the log.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import timedelta
+from functools import reduce
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import pyspark.sql.functions as f
+from py4j.protocol import Py4JJavaError
+from pyspark.sql import DataFrame, Window
+from pyspark.sql.types import (
+    DataType,
+    DateType,
+    LongType,
+    MapType,
+    NumericType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+
+from spetlr.delta.metadata_cache import TableMetadataCache
+from spetlr.spark import Spark
+
+if TYPE_CHECKING:  # pragma: no cover
+    from spetlr.delta.delta_handle import DeltaHandle
+
+# the types whose statistics in the log are exact
+_EXACT_TYPES = (NumericType, DateType)
+
+# the comparisons that covered_partitions can decide from the logged bounds
+_BOUNDS = {"<", "<=", ">", ">=", "="}
+
+_COMMIT = re.compile(r"(\d{20})\.json")
+_CHECKPOINT = re.compile(r"(\d{20})\.checkpoint(?:\.(\d{10})\.(\d{10}))?\.parquet")
+# any checkpoint, also the V2 checkpoints that are named by a uuid
+_ANY_CHECKPOINT = re.compile(r"(\d{20})\.checkpoint\..*")
+# the directory of the sidecar files of V2 checkpoints
+_SIDECARS = "_sidecars"
+
+_COLUMN_MAPPING_MODE = "delta.columnMapping.mode"
+_PHYSICAL_NAME = "delta.columnMapping.physicalName"
+
+_ACTIONS = StructType(
+    [
+        StructField(
+            "add",
+            StructType(
+                [
+                    StructField("path", StringType()),
+                    StructField("partitionValues", MapType(StringType(), StringType())),
+                    StructField("size", LongType()),
+                    StructField("modificationTime", LongType()),
+                    StructField("stats", StringType()),
+                    StructField(
+                        "deletionVector",
+                        StructType([StructField("cardinality", LongType())]),
+                    ),
+                ]
+            ),
+        ),
+        StructField("remove", StructType([StructField("path", StringType())])),
+        StructField(
+            "metaData", StructType([StructField("schemaString", StringType())])
+        ),
+    ]
+)
+
+
+@dataclass
+class ColumnStatistics:
+    min: Any = None
+    max: Any = None
+    null_count: Optional[int] = None
+
+
+@dataclass
+class DeltaTableStatistics:
+    """The statistics of a delta table. The scanned_columns were not answered by
+    the transaction log alone, and num_records_scanned tells if the rows had to
+    be counted."""
+
+    num_files: Optional[int]
+    num_records: int
+    columns: Dict[str, ColumnStatistics] = field(default_factory=dict)
+    num_records_scanned: bool = False
+    scanned_columns: List[str] = field(default_factory=list)
+
+
+def read_statistics(
+    handle: "DeltaHandle", columns: List[str] = None
+) -> DeltaTableStatistics:
+    """The row count, and the min, max and null count of the given columns."""
+    columns = columns or []
+    df = handle.read_latest()
+    types = {field.name: field.dataType for field in df.schema.fields}
+    partition_cols = handle.get_partitioning()
+
+    names = physical_names(handle)
+    files = active_files(handle) if names is not None else None
+    if files is None:
+        return _scan_statistics(df, columns)
+
+    files = _with_record_counts(files, df.schema, partition_cols, columns, names)
+
+    aggregations = [
+        f.count(f.lit(1)).alias("num_files"),
+        f.sum("records").alias("num_records"),
+        _count_where(f.col("records").isNull()).alias("missing_records"),
+    ]
+    for col in columns:
+        if col in partition_cols:
+            value = _partition_value(col, types[col], names)
+            low = high = value
+            nulls = f.when(value.isNull(), f.col("records")).otherwise(0)
+            incomplete = f.col("has_dv") | (value.isNull() & f.col("records").isNull())
+        else:
+            low, high, nulls = _logged_stats(col, names)
+            incomplete = (
+                f.col("has_dv")
+                | f.col("records").isNull()
+                | nulls.isNull()
+                # only columns that are entirely null have no min and max
+                | (low.isNull() & (nulls < f.col("records")))
+            )
+        aggregations += [
+            f.min(low).alias(f"min_{col}"),
+            f.max(high).alias(f"max_{col}"),
+            f.sum(nulls).alias(f"nulls_{col}"),
+            _count_where(incomplete).alias(f"incomplete_{col}"),
+        ]
+    (row,) = files.agg(*aggregations).collect()
+
+    stats = DeltaTableStatistics(
+        num_files=row["num_files"], num_records=row["num_records"] or 0
+    )
+    if row["missing_records"]:
+        stats.num_records = df.count()
+        stats.num_records_scanned = True
+
+    for col in columns:
+        if row[f"incomplete_{col}"]:
+            stats.scanned_columns.append(col)
+            continue
+
+        column = ColumnStatistics(
+            min=row[f"min_{col}"],
+            max=row[f"max_{col}"],
+            null_count=row[f"nulls_{col}"] or 0,
+        )
+        if col not in partition_cols and not isinstance(types[col], _EXACT_TYPES):
+            column = _exact_min_max(df, col, types[col], column)
+            if column is None:
+                stats.scanned_columns.append(col)
+                continue
+        stats.columns[col] = column
+
+    if stats.scanned_columns:
+        scanned = _scan_statistics(df, stats.scanned_columns)
+        stats.columns.update(scanned.columns)
+    return stats
+
+
+def is_empty(handle: "DeltaHandle") -> bool:
+    """True if the table has no rows. Only reads a data file if the log
+    does not record the row counts of the files."""
+    files = active_files(handle)
+    if files is None:
+        return len(handle.read_latest().take(1)) == 0
+
+    files = _with_record_counts(files, handle.read_latest().schema, [], [])
+    (row,) = files.agg(
+        f.count(f.lit(1)).alias("num_files"),
+        f.max("records").alias("max_records"),
+        _count_where(f.col("records").isNull()).alias("missing_records"),
+    ).collect()
+
+    if row["num_files"] == 0:
+        return True
+    if row["max_records"]:
+        return False
+    if row["missing_records"]:
+        return len(handle.read_latest().take(1)) == 0
+    return True
+
+
+def latest_partition(handle: "DeltaHandle") -> Optional[Dict[str, Any]]:
+    """The greatest partition of the table that holds rows, ordered by the
+    partition columns in their order of partitioning, or None if the table is
+    empty. The values have the types of the partition columns."""
+    partition_cols = handle.get_partitioning()
+    df = handle.read_latest()
+    types = {field.name: field.dataType for field in df.schema.fields}
+
+    names = physical_names(handle)
+    files = active_files(handle) if names is not None else None
+    if files is None:
+        rows = (
+            df.select(*partition_cols)
+            .orderBy(*[f.col(col).desc() for col in partition_cols])
+            .take(1)
+        )
+    else:
+        files = _with_record_counts(files, df.schema, [], [], names)
+        rows = (
+            files.where(f.col("records").isNull() | (f.col("records") > 0))
+            .select(
+                *[
+                    _partition_value(col, types[col], names).alias(col)
+                    for col in partition_cols
+                ]
+            )
+            .orderBy(*[f.col(col).desc() for col in partition_cols])
+            .take(1)
+        )
+    if not rows:
+        return None
+    return rows[0].asDict()
+
+
+def covered_partitions(
+    handle: "DeltaHandle", col: str, operator: str, limit: str
+) -> Optional[DataFrame]:
+    """The partitions in which every row satisfies the condition
+    `col operator limit`, as a dataframe of the partition values. A partition is
+    only returned if the min, max and null count of all its files in the log
+    prove it. The limit is a sql literal.
+
+    Returns None if the column is a partition column, since a condition on it
+    already selects whole partitions, or if the replay of the log is not
+    complete, see active_files. A partition must never be judged from only a
+    part of its files, since it is then deleted as a whole."""
+    partition_cols = handle.get_partitioning()
+    if not partition_cols or col in partition_cols or operator not in _BOUNDS:
+        return None
+
+    df = handle.read_latest()
+    types = {field.name: field.dataType for field in df.schema.fields}
+    names = physical_names(handle)
+    files = active_files(handle) if names is not None else None
+    if files is None:
+        return None
+    files = _with_record_counts(files, df.schema, partition_cols, [col], names)
+
+    low, high, nulls = _logged_stats(col, names)
+    if isinstance(types[col], TimestampType):
+        # the logged maximum is rounded down to milliseconds
+        high = high + f.expr("INTERVAL 1 MILLISECOND")
+    # truncated strings stay bounds: delta cuts the minimum and pads the maximum
+
+    value = f.expr(limit)
+    satisfied = {
+        "<": high < value,
+        "<=": high <= value,
+        ">": low > value,
+        ">=": low >= value,
+        "=": (low == value) & (high == value),
+    }[operator]
+    # rows with null never satisfy a comparison
+    satisfied = satisfied & (nulls == 0)
+
+    return (
+        files.groupBy(
+            *[_partition_value(c, types[c], names).alias(c) for c in partition_cols]
+        )
+        .agg(f.min(f.coalesce(satisfied, f.lit(False)).cast("int")).alias("covered"))
+        .where(f.col("covered") == 1)
+        .drop("covered")
+    )
+
+
+def active_files(handle: "DeltaHandle") -> Optional[DataFrame]:
+    """The add actions of the files in the current version of the table, found
+    by replaying the transaction log from the latest checkpoint.
+
+    Returns None unless the replay is provably complete: it must start from a
+    classic checkpoint, or from version 0, and every commit from there up to the
+    latest version in the log must exist. Otherwise, e.g. when the log has been
+    cleaned up behind a V2 checkpoint, the callers must scan the table."""
+    actions = _replay(handle)
+    if actions is None:
+        return None
+
+    # the latest action on a path tells if the file is part of the table
+    latest = Window.partitionBy("path").orderBy(f.col("version").desc())
+    return (
+        actions.select(
+            "version",
+            f.coalesce("add.path", "remove.path").alias("path"),
+            "add",
+        )
+        .where(f.col("path").isNotNull())
+        .withColumn("rank", f.row_number().over(latest))
+        .where((f.col("rank") == 1) & f.col("add").isNotNull())
+        .select("add.*")
+    )
+
+
+def physical_names(handle: "DeltaHandle") -> Optional[Dict[str, str]]:
+    """The names of the columns in the transaction log, by their names in the
+    table. Without column mapping, they are the same. With column mapping, they
+    are read from the latest schema in the log, and None is returned if the log
+    cannot be replayed."""
+    properties = TableMetadataCache.get(handle.get_tablename()).properties
+    if properties.get(_COLUMN_MAPPING_MODE, "none") == "none":
+        return {field.name: field.name for field in handle.read_latest().schema}
+
+    actions = _replay(handle)
+    if actions is None:
+        return None
+    rows = (
+        actions.where(f.col("metaData.schemaString").isNotNull())
+        .orderBy(f.col("version").desc())
+        .select("metaData.schemaString")
+        .take(1)
+    )
+    if not rows:
+        return None
+    return {
+        column["name"]: column["metadata"].get(_PHYSICAL_NAME, column["name"])
+        for column in json.loads(rows[0]["schemaString"])["fields"]
+    }
+
+
+def _replay(handle: "DeltaHandle") -> Optional[DataFrame]:
+    """The actions of the log from the latest checkpoint on, with their version,
+    or None if the replay is not provably complete, see active_files."""
+    spark = Spark.get()
+    log_dir = handle.get_location().rstrip("/") + "/_delta_log"
+
+    jvm = spark.sparkContext._jvm
+    path = jvm.org.apache.hadoop.fs.Path(log_dir)
+    try:
+        fs = path.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration())
+        names = [status.getPath().getName() for status in fs.listStatus(path)]
+    except Py4JJavaError as e:
+        print(f"The transaction log of {handle.get_tablename()} is not readable:", e)
+        return None
+
+    if _SIDECARS in names:
+        # the checkpoints of the table may hold their files in sidecars,
+        # which are not read here, so the replay has to start at version 0.
+        checkpoint_version, checkpoint_files = -1, []
+    else:
+        checkpoint_version, checkpoint_files = _latest_checkpoint(names)
+
+    versions = [int(name[:20]) for name in names if _COMMIT.fullmatch(name)]
+    versions += [int(name[:20]) for name in names if _ANY_CHECKPOINT.fullmatch(name)]
+    if not versions:
+        print(f"The transaction log of {handle.get_tablename()} has no commits.")
+        return None
+    latest_version = max(versions)
+
+    commits = sorted(
+        name
+        for name in names
+        if _COMMIT.fullmatch(name) and int(name[:20]) > checkpoint_version
+    )
+    if [int(name[:20]) for name in commits] != list(
+        range(checkpoint_version + 1, latest_version + 1)
+    ):
+        print(
+            f"The transaction log of {handle.get_tablename()} cannot be replayed"
+            " from a supported checkpoint without gaps."
+        )
+        return None
+
+    actions = []
+    if checkpoint_files:
+        actions.append(
+            spark.read.schema(_ACTIONS)
+            .parquet(*[f"{log_dir}/{name}" for name in checkpoint_files])
+            .withColumn("version", f.lit(checkpoint_version).cast("long"))
+        )
+    if commits:
+        actions.append(
+            spark.read.schema(_ACTIONS)
+            .json([f"{log_dir}/{name}" for name in commits])
+            .withColumn(
+                "version",
+                f.regexp_extract(f.input_file_name(), r"(\d{20})\.json$", 1).cast(
+                    "long"
+                ),
+            )
+        )
+    if not actions:
+        return None
+    return reduce(DataFrame.unionByName, actions)
+
+
+def _latest_checkpoint(names: List[str]):
+    """The version and the files of the latest complete checkpoint,
+    or -1 and no files if there is none."""
+    parts: Dict[int, List[str]] = {}
+    expected: Dict[int, int] = {}
+    for name in names:
+        match = _CHECKPOINT.fullmatch(name)
+        if match:
+            version = int(match.group(1))
+            parts.setdefault(version, []).append(name)
+            expected[version] = int(match.group(3) or 1)
+
+    for version in sorted(parts, reverse=True):
+        if len(parts[version]) == expected[version]:
+            return version, sorted(parts[version])
+    return -1, []
+
+
+def _with_record_counts(
+    files: DataFrame,
+    schema: StructType,
+    partition_cols: List[str],
+    columns: List[str],
+    names: Dict[str, str] = None,
+) -> DataFrame:
+    """Parse the statistics of the files for the given columns, and add the
+    number of records without the rows deleted by deletion vectors. The
+    statistics are parsed by the physical names of the columns."""
+    names = names or {}
+    stats_cols = [field for field in schema.fields if field.name in columns]
+    stats_cols = [field for field in stats_cols if field.name not in partition_cols]
+    stats_cols = [
+        StructField(names.get(c.name, c.name), c.dataType) for c in stats_cols
+    ]
+    stats_schema = StructType(
+        [
+            StructField("numRecords", LongType()),
+            StructField("minValues", StructType(_stats_fields(stats_cols))),
+            StructField("maxValues", StructType(_stats_fields(stats_cols))),
+            StructField(
+                "nullCount",
+                StructType([StructField(c.name, LongType()) for c in stats_cols]),
+            ),
+        ]
+    )
+    return (
+        files.withColumn("s", f.from_json("stats", stats_schema))
+        .withColumn("has_dv", f.col("deletionVector").isNotNull())
+        .withColumn(
+            "records",
+            f.col("s.numRecords")
+            - f.coalesce(f.col("deletionVector.cardinality"), f.lit(0)),
+        )
+    )
+
+
+def _partition_value(col: str, data_type: DataType, names: Dict[str, str]):
+    return f.col("partitionValues")[names.get(col, col)].cast(data_type)
+
+
+def _logged_stats(col: str, names: Dict[str, str]):
+    """The logged minimum, maximum and null count of a column in a file."""
+    name = names.get(col, col)
+    return (
+        f.col("s.minValues")[name],
+        f.col("s.maxValues")[name],
+        f.col("s.nullCount")[name],
+    )
+
+
+def _stats_fields(fields: List[StructField]) -> List[StructField]:
+    return [StructField(field.name, field.dataType) for field in fields]
+
+
+def _count_where(condition) -> Any:
+    return f.sum(f.when(condition, 1).otherwise(0))
+
+
+def _exact_min_max(
+    df: DataFrame, col: str, data_type: DataType, stats: ColumnStatistics
+) -> Optional[ColumnStatistics]:
+    """Make the logged min and max exact. Returns None if they must be scanned."""
+    if not isinstance(data_type, TimestampType):
+        return None
+    if stats.max is None:
+        return stats
+
+    # the logged values are rounded to milliseconds, so the exact values are
+    # within one millisecond of them. Reading these rows only needs the files
+    # whose statistics overlap this millisecond.
+    tick = timedelta(milliseconds=1)
+    (high,) = df.where(f.col(col) >= f.lit(stats.max - tick)).agg(f.max(col)).first()
+    (low,) = df.where(f.col(col) < f.lit(stats.min + tick)).agg(f.min(col)).first()
+    if high is None or low is None:
+        return None
+    return ColumnStatistics(min=low, max=high, null_count=stats.null_count)
+
+
+def _scan_statistics(df: DataFrame, columns: List[str]) -> DeltaTableStatistics:
+    """The statistics by reading the data. The number of files is not known."""
+    aggregations = [f.count(f.lit(1)).alias("num_records")]
+    for col in columns:
+        aggregations += [
+            f.min(col).alias(f"min_{col}"),
+            f.max(col).alias(f"max_{col}"),
+            _count_where(f.col(col).isNull()).alias(f"nulls_{col}"),
+        ]
+    (row,) = df.agg(*aggregations).collect()
+
+    return DeltaTableStatistics(
+        num_files=None,
+        num_records=row["num_records"],
+        columns={
+            col: ColumnStatistics(
+                min=row[f"min_{col}"],
+                max=row[f"max_{col}"],
+                null_count=row[f"nulls_{col}"],
+            )
+            for col in columns
+        },
+        num_records_scanned=True,
+        scanned_columns=list(columns),
+    )
@@ -5,6 +5,7 @@ from pyspark.sql.utils import AnalysisException
 from spetlr import Configurator
 from spetlr.configurator.sql.parse_sql import parse_single_sql_statement
 from spetlr.delta import DeltaHandle
+from spetlr.delta.metadata_cache import TableMetadataCache
 from spetlr.deltaspec.DeltaTableSpecBase import (
     DeltaTableSpecBase,
     _DEFAULT_blankedPropertyKeys,
@@ -92,22 +93,22 @@ class DeltaTableSpec(DeltaTableSpecBase):
     def from_name(cls, in_name: str) -> "DeltaTableSpec":
         """Return the DeltaTableSpec instance,
         that describes the table of the given name."""
-        spark = Spark.get()
         try:
-            details = spark.sql(f"DESCRIBE DETAIL {in_name}").collect()[0].asDict()
+            metadata = TableMetadataCache.get(in_name)
         except AnalysisException as e:
             raise NoTableAtTarget(str(e))
+        details = metadata.details
         if details["format"] != "delta":
             raise InvalidSpecificationError("The table is not of delta format.")
 
-        tblproperties = details["properties"]
+        tblproperties = metadata.properties
         tblproperties["delta.minReaderVersion"] = str(details["minReaderVersion"])
         tblproperties["delta.minWriterVersion"] = str(details["minWriterVersion"])
 
         return cls(
             name=details["name"],
-            schema=spark.table(in_name).schema,
-            partitioned_by=details["partitionColumns"],
+            schema=metadata.schema,
+            partitioned_by=metadata.partitioning,
             tblproperties=tblproperties,
             location=details["location"],
             comment=details["description"],
@@ -204,7 +205,11 @@ class DeltaTableSpec(DeltaTableSpecBase):
                 errors_as_warnings=errors_as_warnings,
             ):
                 print(f"Executing SQL: {statement}")
-                spark.sql(statement)
+                try:
+                    spark.sql(statement)
+                finally:
+                    for name in {diff.target.name, self.name} - {None}:
+                        TableMetadataCache.invalidate(name)
 
     def ensure_df_schema(self, df: DataFrame):
         # check if the df can be selected down into the schema of this table
@@ -8,6 +8,7 @@ from pyspark.sql import DataFrame
 from pyspark.sql import functions as f
 
 from spetlr.configurator.configurator import Configurator
+from spetlr.etl.sampling import sample
 from spetlr.spark import Spark
 
 utc = datetime.timezone.utc
@@ -19,23 +20,28 @@ class EventHubCaptureExtractor:
     The constructor argument should be given as a key that can be found in
     the Table Configurator, where the relevant table must be marked with
     format=avro and with a partitioning from the set of known partitions: y,m,d,h
+
+    When sampling is active, only the sample by the sample_keys is returned,
+    see spetlr.etl.sampling.
     """
 
     path: str
     partitioning: str
 
     @classmethod
-    def from_tc(cls, tbl_id: str):
+    def from_tc(cls, tbl_id: str, sample_keys: List[str] = None):
         tc = Configurator()
         assert tc.table_property(tbl_id, "format") == "avro"
         return cls(
             path=tc.table_property(tbl_id, "path"),
             partitioning=tc.table_property(tbl_id, "partitioning"),
+            sample_keys=sample_keys,
         )
 
-    def __init__(self, path: str, partitioning: str):
+    def __init__(self, path: str, partitioning: str, sample_keys: List[str] = None):
         self.path = path
         self.partitioning = partitioning.lower()
+        self.sample_keys = sample_keys
         assert self.partitioning in ["ymd", "ymdh"]
 
     def _validate_timestamp(self, stamp: dt):
@@ -232,8 +238,9 @@ class EventHubCaptureExtractor:
                 raise ValueError("Use both limits or only 'from' limit.")
             else:
                 # read all
-                return self._add_columns(
-                    Spark.get().read.format("avro").load(self.path)
+                return sample(
+                    self._add_columns(Spark.get().read.format("avro").load(self.path)),
+                    self.sample_keys,
                 )
 
         # now we know that a slice will be read.
@@ -258,7 +265,7 @@ class EventHubCaptureExtractor:
             schema = Spark.get().read.format("avro").load(self.path).schema
             df = Spark.get().createDataFrame([], schema)
 
-        return df
+        return sample(df, self.sample_keys)
 
     def get_partitioning(self):
         return list(self.partitioning)
@@ -1,9 +1,37 @@
 import importlib
 import inspect
+import re
 import sys
-from typing import Any, Callable, Dict
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+from spetlr.exceptions import SpetlrException
+from spetlr.spark import Spark
 
 ENTRY_POINT = "entry_point"
+ENTRY_POINTS = "entry_points"
+MAX_CONCURRENCY = "max_concurrency"
+
+
+class EntryPointsFailed(SpetlrException):
+    """Raised when one or more of the concurrently executed entry points failed."""
+
+    def __init__(self, results: List["EntryPointResult"]):
+        self.results = results
+        failed = [result.entry_point for result in results if not result.succeeded]
+        super().__init__(f"{len(failed)} entry point(s) failed: {', '.join(failed)}")
+
+
+@dataclass
+class EntryPointResult:
+    entry_point: str
+    pool: str
+    succeeded: bool
+    duration_seconds: float
+    error: str = None
 
 
 def main():
@@ -26,10 +54,17 @@ def main():
     ```
     The named parameter 'entry_point' is mandatory.
     All arguments must be of type string.
+
+    Alternatively, the named parameter 'entry_points' can be given as a comma
+    separated list of entry points. These are then executed concurrently in the
+    same spark application, see run_concurrently. At most 'max_concurrency' of
+    them run at the same time, all of them if it is not given.
     """
 
     kwargs = {}
     entry_point = None
+    entry_points = None
+    max_concurrency = None
     # sys.argv will contain strings like
     # [ "--entry_point=my.module:main", "--myarg=myval" ]
     for arg in sys.argv:
@@ -44,25 +79,99 @@ def main():
         if k == ENTRY_POINT:
             # magic mandatory parameter
             entry_point = v
+        elif k == ENTRY_POINTS:
+            entry_points = [ep.strip() for ep in v.split(",") if ep.strip()]
+        elif k == MAX_CONCURRENCY:
+            max_concurrency = int(v)
         else:
             # any other custom parameters
             kwargs[k] = v
 
+    if entry_points:
+        return run_concurrently(entry_points, kwargs, max_concurrency)
+
     if entry_point is None:
         raise Exception("No entry_point specified.")
 
-    # entry_point looks like "my.module:main"
+    obj = resolve_entry_point(entry_point)
+
+    kwargs = prepare_keyword_arguments(obj, kwargs)
+
+    # call the callable with custom parameters
+    return obj(**kwargs)
+
+
+def resolve_entry_point(entry_point: str) -> Callable:
+    """Import the callable object of an entry point like "my.module:main"."""
     modname, qualname_separator, qualname = entry_point.partition(":")
 
     obj = importlib.import_module(modname)
     if qualname_separator:
         for attr in qualname.split("."):
             obj = getattr(obj, attr)
+    return obj
 
-    kwargs = prepare_keyword_arguments(obj, kwargs)
 
-    # call the callable with custom parameters
-    return obj(**kwargs)
+def run_concurrently(
+    entry_points: List[str],
+    kwargs_dict: Dict[str, Any] = None,
+    max_concurrency: int = None,
+) -> List[EntryPointResult]:
+    """Call all entry points concurrently in the current spark application.
+
+    Each entry point runs in its own thread, in its own spark scheduler pool and
+    job group, both named after the entry point. With the FAIR scheduler mode,
+    the pools share the cluster evenly, so that a large job of one entry point
+    does not hold back the others. The keyword arguments are passed to every
+    entry point that can receive them.
+
+    All entry points are executed, also if some of them fail. The result of
+    each entry point is printed, and if any failed, EntryPointsFailed is raised.
+    """
+    kwargs_dict = kwargs_dict or {}
+    sc = Spark.get().sparkContext
+    if sc.getConf().get("spark.scheduler.mode", "FIFO") != "FAIR":
+        print(
+            "WARNING: The spark scheduler mode is not FAIR. "
+            "The scheduler pools of the entry points will not share the cluster."
+        )
+
+    def run(entry_point: str) -> EntryPointResult:
+        pool = re.sub(r"[^A-Za-z0-9_.]", "_", entry_point)
+        sc.setLocalProperty("spark.scheduler.pool", pool)
+        sc.setJobGroup(pool, f"spetlr_task {entry_point}")
+        start = time.perf_counter()
+        try:
+            obj = resolve_entry_point(entry_point)
+            obj(**prepare_keyword_arguments(obj, kwargs_dict))
+        except Exception as err:
+            traceback.print_exc()
+            return EntryPointResult(
+                entry_point, pool, False, time.perf_counter() - start, repr(err)
+            )
+        finally:
+            # the threads of the pool are reused
+            sc.setLocalProperty("spark.scheduler.pool", None)
+            sc.setLocalProperty("spark.jobGroup.id", None)
+            sc.setLocalProperty("spark.job.description", None)
+        return EntryPointResult(entry_point, pool, True, time.perf_counter() - start)
+
+    with ThreadPoolExecutor(
+        max_workers=max_concurrency or len(entry_points),
+        thread_name_prefix="spetlr-task",
+    ) as executor:
+        results = list(executor.map(run, entry_points))
+
+    for result in results:
+        status = "SUCCEEDED" if result.succeeded else f"FAILED: {result.error}"
+        print(
+            f"{result.entry_point} ({result.duration_seconds:.1f}s, "
+            f"pool {result.pool}): {status}"
+        )
+
+    if not all(result.succeeded for result in results):
+        raise EntryPointsFailed(results)
+    return results
 
 
 def prepare_keyword_arguments(callable_obj: Callable, kwargs_dict: Dict[str, Any]):
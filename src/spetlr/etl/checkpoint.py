@@ -0,0 +1,158 @@
+"""
+Checkpointing of the datasets of an orchestrator, to resume failed runs.
+
+After designated steps, the complete dataset group is written to delta tables
+below a location that is specific to a run id. When the orchestrator is executed
+again with the same run id, the dataset group of the last completed checkpoint is
+read back, and the execution continues with the step after it.
+"""
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from pyspark.sql import DataFrame
+from pyspark.sql.types import (
+    ArrayType,
+    IntegerType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+from pyspark.sql.utils import AnalysisException
+
+from spetlr.exceptions import SpetlrException
+from spetlr.spark import Spark
+
+from .types import EtlBase, dataset_group
+
+
+class OrchestratorCheckpointException(SpetlrException):
+    pass
+
+
+class StepCheckpoint:
+    """Materialize the dataset group after designated steps of an orchestrator.
+
+    Pass an instance to the orchestrator as Orchestrator(checkpoint=...).
+    After each step with an index in after_steps, or after every step if
+    after_steps is not given, all datasets are written as delta tables to
+    {location}/{run_id}/step_{index}/ and the datasets are replaced by reads of
+    these tables. A manifest records the completed checkpoints of the run.
+
+    When an orchestrator is executed with a run id that has completed
+    checkpoints, the steps up to the last checkpoint are not executed again.
+    The run then continues from the checkpointed datasets.
+
+    Only dataset groups with string keys and without streaming dataframes can be
+    checkpointed. Checkpointing requires a sequential orchestrator.
+    """
+
+    manifest_schema = StructType(
+        [
+            StructField("StepIndex", IntegerType(), True),
+            StructField("StepName", StringType(), True),
+            StructField("DatasetKeys", ArrayType(StringType()), True),
+            StructField("CheckpointTime", TimestampType(), True),
+        ]
+    )
+
+    def __init__(
+        self,
+        location: str,
+        run_id: str,
+        after_steps: Iterable[int] = None,
+        clear_on_success: bool = True,
+    ):
+        self.location = location.rstrip("/")
+        self.run_id = run_id
+        self.after_steps = None if after_steps is None else set(after_steps)
+        self.clear_on_success = clear_on_success
+
+    def get_run_location(self) -> str:
+        return f"{self.location}/{self.run_id}"
+
+    def _get_manifest_location(self) -> str:
+        return f"{self.get_run_location()}/_manifest"
+
+    def _get_dataset_location(self, index: int, position: int) -> str:
+        return f"{self.get_run_location()}/step_{index}/dataset_{position}"
+
+    def should_save(self, index: int) -> bool:
+        return self.after_steps is None or index in self.after_steps
+
+    def save(self, index: int, step: EtlBase, datasets: dataset_group) -> dataset_group:
+        """Write the datasets after the given step.
+        Returns the datasets as read from the checkpoint."""
+        for key, df in datasets.items():
+            if not isinstance(key, str):
+                raise OrchestratorCheckpointException(
+                    f"Cannot checkpoint the dataset key {key!r}. "
+                    "Only string keys are supported."
+                )
+            if not isinstance(df, DataFrame) or df.isStreaming:
+                raise OrchestratorCheckpointException(
+                    f"Cannot checkpoint the dataset {key}. "
+                    "Only non-streaming dataframes are supported."
+                )
+
+        spark = Spark.get()
+        keys = list(datasets.keys())
+        for position, key in enumerate(keys):
+            datasets[key].write.format("delta").mode("overwrite").option(
+                "overwriteSchema", "true"
+            ).save(self._get_dataset_location(index, position))
+
+        # the checkpoint is only complete once it is in the manifest
+        spark.createDataFrame(
+            [(index, type(step).__name__, keys, datetime.utcnow())],
+            schema=self.manifest_schema,
+        ).write.format("delta").mode("append").save(self._get_manifest_location())
+
+        return self._read_datasets(index, keys)
+
+    def restore(self, steps: Iterable[EtlBase]) -> Optional[Tuple[int, dataset_group]]:
+        """The index of the last checkpointed step and its datasets,
+        or None if the run has no completed checkpoint."""
+        steps = list(steps)
+        try:
+            last = (
+                Spark.get()
+                .read.format("delta")
+                .load(self._get_manifest_location())
+                .orderBy("StepIndex", ascending=False)
+                .take(1)
+            )
+        except AnalysisException:
+            # the run has never been checkpointed
+            return None
+        if not last:
+            return None
+
+        index, step_name, keys = (
+            last[0]["StepIndex"],
+            last[0]["StepName"],
+            list(last[0]["DatasetKeys"]),
+        )
+        if index >= len(steps) or type(steps[index]).__name__ != step_name:
+            raise OrchestratorCheckpointException(
+                f"The checkpoint of run {self.run_id} was made after step {index} "
+                f"({step_name}), which does not match the steps of the orchestrator."
+            )
+
+        print(f"Resuming run {self.run_id} after step {index} ({step_name}).")
+        return index, self._read_datasets(index, keys)
+
+    def _read_datasets(self, index: int, keys: Iterable[str]) -> dataset_group:
+        reader = Spark.get().read.format("delta")
+        return {
+            key: reader.load(self._get_dataset_location(index, position))
+            for position, key in enumerate(keys)
+        }
+
+    def clear(self) -> None:
+        """Delete all checkpoints of the run."""
+        spark = Spark.get()
+        jvm = spark.sparkContext._jvm
+        path = jvm.org.apache.hadoop.fs.Path(self.get_run_location())
+        fs = path.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration())
+        fs.delete(path, True)
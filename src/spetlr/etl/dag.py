@@ -0,0 +1,250 @@
+"""
+Dependency analysis and concurrent execution of orchestrator steps.
+
+Extractors, transformers and loaders declare through their dataset keys which
+datasets they read, which they remove and which they add. From these declarations
+a dependency graph of the steps of an orchestrator can be derived. Steps that do
+not share any dataset keys can then be executed concurrently, while the resulting
+dataset group is identical to that of a sequential execution.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Set, Tuple
+
+from spetlr.exceptions import SpetlrException
+
+from .extractor import Extractor
+from .loader import Loader
+from .transformer import Transformer
+from .types import EtlBase, dataset_group
+
+# signature of the function that executes a single step: (index, step, inputs)
+step_runner = Callable[[int, EtlBase, dataset_group], dataset_group]
+
+
+class OrchestratorStepFailed(SpetlrException):
+    """Raised when a step failed during a concurrent execution.
+    The reported step is always the first failing step in step order, as in a
+    sequential execution. Failures of later steps that were already running at
+    the time are kept in later_failures."""
+
+    def __init__(
+        self,
+        index: int,
+        step: EtlBase,
+        error: Exception,
+        later_failures: List[Tuple[int, EtlBase, Exception]] = None,
+    ):
+        self.index = index
+        self.step = step
+        self.error = error
+        self.later_failures = later_failures or []
+        super().__init__(
+            f"Orchestrator step {index} ({type(step).__name__}) failed: {error!r}"
+        )
+
+
+@dataclass
+class StepAccess:
+    """The dataset keys that a step reads, removes and adds.
+    A barrier step may access any key and is therefore never run concurrently."""
+
+    reads: List[str] = field(default_factory=list)
+    pops: List[str] = field(default_factory=list)
+    writes: List[str] = field(default_factory=list)
+    barrier: bool = False
+
+    def apply(self, keys: List[str]) -> List[str]:
+        """Return the ordered dataset keys that exist after this step."""
+        keys = [key for key in keys if key not in self.pops]
+        keys += [key for key in self.writes if key not in keys]
+        return keys
+
+    def conflicts_with(self, later: "StepAccess") -> bool:
+        """True if the later step has to wait for this step to finish."""
+        if self.barrier or later.barrier:
+            return True
+        changed = set(self.pops) | set(self.writes)
+        later_changed = set(later.pops) | set(later.writes)
+        return bool(
+            changed & (set(later.reads) | later_changed)
+            or set(self.reads) & later_changed
+        )
+
+
+def get_step_access(step: EtlBase, keys: List[str]) -> StepAccess:
+    """Derive the dataset access of a step from its declared keys,
+    given the ordered keys that exist before the step is executed.
+    Steps that replace the etl method of their base class do not follow
+    the declared keys and are treated as barriers."""
+    if isinstance(step, Extractor) and type(step).etl is Extractor.etl:
+        return StepAccess(writes=[step.dataset_key])
+
+    if isinstance(step, Transformer) and type(step).etl is Transformer.etl:
+        reads = step.dataset_input_keys or list(keys)
+        if isinstance(reads, str):
+            reads = [reads]
+        return StepAccess(
+            reads=list(reads),
+            pops=list(reads) if step.consume_inputs else [],
+            writes=[step.dataset_output_key],
+        )
+
+    if isinstance(step, Loader) and type(step).etl is Loader.etl:
+        reads = step.dataset_input_key_list
+        return StepAccess(reads=list(reads) if len(reads) else list(keys))
+
+    return StepAccess(barrier=True)
+
+
+class _StepResult:
+    """The change that a step made to its inputs, to be replayed in step order."""
+
+    def __init__(self, inputs: dataset_group, outputs: dataset_group, pops: List[str]):
+        self.removed = [key for key in inputs if key in pops or key not in outputs]
+        self.updated = {
+            key: df
+            for key, df in outputs.items()
+            if key in self.removed or key not in inputs or inputs[key] is not df
+        }
+
+    def replay(self, datasets: dataset_group) -> dataset_group:
+        for key in self.removed:
+            datasets.pop(key, None)
+        datasets.update(self.updated)
+        return datasets
+
+
+class DagRunner:
+    """Executes a list of steps concurrently according to their dependencies.
+
+    The steps are split into segments at every barrier step. Within a segment,
+    each step is submitted to the thread pool as soon as all earlier steps that
+    it conflicts with have finished. Every step receives only the datasets that
+    it reads, in the order they would have had in a sequential run. At the end of
+    each segment, the changes of the steps are replayed in step order.
+
+    If a step fails, no further steps after it are started. Steps before it are
+    still executed, as they would have been in a sequential run. All failures are
+    then reported with an OrchestratorStepFailed exception.
+    """
+
+    def __init__(
+        self,
+        run_step: step_runner,
+        *,
+        max_workers: int = None,
+        on_first_step: Callable[[dataset_group], None] = None,
+    ):
+        self.run_step = run_step
+        self.max_workers = max_workers
+        self.on_first_step = on_first_step
+
+    def run(self, steps: List[EtlBase], datasets: dataset_group) -> dataset_group:
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            start = 0
+            while start < len(steps):
+                if self._is_barrier(steps[start]):
+                    try:
+                        datasets = self.run_step(start, steps[start], datasets)
+                    except Exception as err:
+                        raise OrchestratorStepFailed(start, steps[start], err) from err
+                    self._first_step_done(start, datasets)
+                    start += 1
+                    continue
+
+                end = start
+                while end < len(steps) and not self._is_barrier(steps[end]):
+                    end += 1
+                datasets = self._run_segment(pool, steps, start, end, datasets)
+                start = end
+        return datasets
+
+    @staticmethod
+    def _is_barrier(step: EtlBase) -> bool:
+        return get_step_access(step, []).barrier
+
+    def _first_step_done(self, index: int, datasets: dataset_group) -> None:
+        if index == 0 and self.on_first_step:
+            self.on_first_step(datasets)
+
+    def _run_segment(
+        self,
+        pool: ThreadPoolExecutor,
+        steps: List[EtlBase],
+        start: int,
+        end: int,
+        datasets: dataset_group,
+    ) -> dataset_group:
+        # statically simulate the keys that exist before each step
+        keys_before: Dict[int, List[str]] = {}
+        access: Dict[int, StepAccess] = {}
+        keys = list(datasets)
+        for index in range(start, end):
+            keys_before[index] = keys
+            access[index] = get_step_access(steps[index], keys)
+            keys = access[index].apply(keys)
+
+        depends_on: Dict[int, Set[int]] = {
+            index: {
+                earlier
+                for earlier in range(start, index)
+                if access[earlier].conflicts_with(access[index])
+            }
+            for index in range(start, end)
+        }
+
+        # the current value of every dataset key, as seen by the finished steps
+        values = dict(datasets)
+        results: Dict[int, _StepResult] = {}
+        failures: List[Tuple[int, EtlBase, Exception]] = []
+        pending = list(range(start, end))
+        running = {}
+
+        while True:
+            for index in list(pending):
+                if failures and index > min(failure[0] for failure in failures):
+                    pending.remove(index)
+                elif depends_on[index].issubset(results):
+                    pending.remove(index)
+                    reads = set(access[index].reads)
+                    inputs = {
+                        key: values[key]
+                        for key in keys_before[index]
+                        if key in reads and key in values
+                    }
+                    # the step sees the run settings of the orchestrator thread
+                    future = pool.submit(
+                        copy_context().run,
+                        self.run_step,
+                        index,
+                        steps[index],
+                        inputs.copy(),
+                    )
+                    running[future] = (index, inputs)
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index, inputs = running.pop(future)
+                try:
+                    outputs = future.result()
+                except Exception as err:
+                    failures.append((index, steps[index], err))
+                    continue
+                results[index] = _StepResult(inputs, outputs, access[index].pops)
+                results[index].replay(values)
+                if index == 0:
+                    self._first_step_done(0, results[0].replay(datasets.copy()))
+
+        if failures:
+            failures.sort(key=lambda failure: failure[0])
+            index, step, err = failures[0]
+            raise OrchestratorStepFailed(index, step, err, failures[1:]) from err
+
+        for index in range(start, end):
+            datasets = results[index].replay(datasets)
+        return datasets
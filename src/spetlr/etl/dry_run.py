@@ -0,0 +1,248 @@
+"""
+Plan-only validation of orchestrators.
+
+In a dry run, the datasets of all extractors are replaced by empty, schema-only
+dataframes. The transformers are executed on these, so that the schemas propagate
+through the whole orchestrator, but the loaders are not executed. Instead, the
+final schemas are compared with the schemas of the loader targets. For every step
+the size of the analyzed and of the optimized logical plan of its outputs is
+reported.
+
+The plans are optimized in a separate spark session, without the optimizer rules
+that would collapse the empty dataframes. The settings of the shared session, and
+so of other jobs that run at the same time, are not changed.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import pyspark.sql.functions as F
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql.types import StructType
+
+from spetlr.spark import Spark
+
+from .extractor import Extractor
+from .loader import Loader
+from .orchestrator import Orchestrator
+from .transformer import Transformer
+from .types import EtlBase, dataset_group
+
+# optimizer rules that would replace the plans of the empty dataframes by an
+# empty local relation, hiding the actual complexity of the optimized plan.
+_EMPTY_RELATION_RULES = [
+    "org.apache.spark.sql.catalyst.optimizer.PruneFilters",
+    "org.apache.spark.sql.catalyst.optimizer.PropagateEmptyRelation",
+    "org.apache.spark.sql.catalyst.optimizer.ConvertToLocalRelation",
+]
+_EXCLUDED_RULES_CONF = "spark.sql.optimizer.excludedRules"
+
+
+@dataclass
+class DryRunStep:
+    """The result of a single step. The plan sizes are the number of nodes in the
+    logical plans of the datasets that the step produced or changed."""
+
+    step_index: str
+    step_name: str
+    output_keys: List[str] = field(default_factory=list)
+    analyzed_plan_nodes: int = 0
+    optimized_plan_nodes: int = 0
+    issues: List[str] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+
+
+@dataclass
+class DryRunReport:
+    steps: List[DryRunStep] = field(default_factory=list)
+
+    @property
+    def issues(self) -> List[str]:
+        return [
+            f"step {step.step_index} ({step.step_name}): {issue}"
+            for step in self.steps
+            for issue in step.issues
+        ]
+
+    @property
+    def succeeded(self) -> bool:
+        return not self.issues
+
+    def report(self) -> str:
+        """A human-readable summary of the dry run."""
+        lines = [f"{'step':>6} {'name':<40} {'analyzed':>9} {'optimized':>9}"]
+        for step in self.steps:
+            lines.append(
+                f"{step.step_index:>6} {step.step_name:<40} "
+                f"{step.analyzed_plan_nodes:>9} {step.optimized_plan_nodes:>9}"
+            )
+            lines += [f"{'':>6} ISSUE: {issue}" for issue in step.issues]
+            lines += [f"{'':>6} NOTE: {note}" for note in step.notes]
+        return "\n".join(lines)
+
+
+def dry_run(steps: List[EtlBase], inputs: dataset_group = None) -> DryRunReport:
+    """Validate the steps of an orchestrator on schema-only dataframes.
+    Use Orchestrator.dry_run instead of calling this function directly."""
+    report = DryRunReport()
+    datasets = {key: _empty(df) for key, df in (inputs or {}).items()}
+
+    spark = Spark.get()
+    planner = spark.newSession()
+    previous_rules = spark.conf.get(_EXCLUDED_RULES_CONF, None)
+    planner.conf.set(
+        _EXCLUDED_RULES_CONF,
+        ",".join(filter(None, [previous_rules] + _EMPTY_RELATION_RULES)),
+    )
+    _dry_run_steps(steps, datasets, report, planner, prefix="")
+
+    return report
+
+
+def _dry_run_steps(
+    steps: List[EtlBase],
+    datasets: dataset_group,
+    report: DryRunReport,
+    planner: SparkSession,
+    prefix: str,
+) -> Optional[dataset_group]:
+    """Returns the resulting datasets, or None if a step failed."""
+    for index, step in enumerate(steps):
+        step_index = f"{prefix}{index}"
+
+        # nested orchestrators are analyzed step by step
+        if isinstance(step, Orchestrator):
+            datasets = _dry_run_steps(
+                step.steps, datasets, report, planner, prefix=f"{step_index}."
+            )
+            if datasets is None:
+                return None
+            continue
+
+        result = DryRunStep(step_index=step_index, step_name=type(step).__name__)
+        report.steps.append(result)
+
+        if isinstance(step, Loader):
+            _check_loader(step, datasets, result)
+            continue
+
+        if not isinstance(step, (Extractor, Transformer)):
+            result.notes.append("Not an extractor, transformer or loader. Skipped.")
+            continue
+
+        before = dict(datasets)
+        try:
+            datasets = step.etl(datasets)
+        except Exception as err:
+            result.issues.append(f"The step failed: {err!r}")
+            return None
+
+        for key, df in datasets.items():
+            if before.get(key) is df:
+                continue
+            if isinstance(step, Extractor):
+                df = datasets[key] = _empty(df)
+            result.output_keys.append(key)
+            analyzed, optimized = _plan_nodes(df, planner)
+            result.analyzed_plan_nodes += analyzed
+            result.optimized_plan_nodes += optimized
+
+    return datasets
+
+
+def _empty(df: DataFrame) -> DataFrame:
+    return df.where(F.lit(False))
+
+
+def _plan_nodes(df: DataFrame, planner: SparkSession) -> Tuple[int, int]:
+    analyzed = df._jdf.queryExecution().analyzed()
+    # the analyzed plan does not depend on temporary views of the session
+    optimized = (
+        planner.sparkContext._jvm.org.apache.spark.sql.Dataset.ofRows(
+            planner._jsparkSession, analyzed
+        )
+        .queryExecution()
+        .optimizedPlan()
+    )
+    return (
+        len(analyzed.treeString().splitlines()),
+        len(optimized.treeString().splitlines()),
+    )
+
+
+def _check_loader(step: Loader, datasets: dataset_group, result: DryRunStep):
+    if step.dataset_input_key_list:
+        missing = [key for key in step.dataset_input_key_list if key not in datasets]
+        if missing:
+            result.issues.append(f"The datasets {missing} do not exist.")
+            return
+        selected = {key: datasets[key] for key in step.dataset_input_key_list}
+    else:
+        selected = dict(datasets)
+
+    # only loaders that write their datasets have a mode or join columns
+    if not (hasattr(step, "mode") or hasattr(step, "join_cols")):
+        result.notes.append("The loader targets were not checked.")
+        return
+
+    targets = _get_targets(step, selected)
+    if targets is None:
+        result.notes.append("The loader targets were not found and not checked.")
+        return
+
+    join_cols = None
+    if getattr(step, "mode", "upsert") == "upsert":
+        join_cols = getattr(step, "join_cols", None)
+
+    for key, handle in targets:
+        target = f"{type(handle).__name__}"
+        try:
+            target += f" {handle.get_tablename()}"
+        except NotImplementedError:
+            pass
+
+        try:
+            target_schema = handle.read().schema
+        except Exception as err:
+            result.notes.append(f"The schema of {target} is unavailable: {err!r}")
+            continue
+
+        for issue in _schema_issues(selected[key].schema, target_schema, join_cols):
+            result.issues.append(f"Dataset {key} into {target}: {issue}")
+
+
+def _get_targets(
+    step: Loader, datasets: Dict[str, DataFrame]
+) -> Optional[List[Tuple[str, object]]]:
+    """The pairs of (dataset key, handle) that the loader writes to."""
+    if isinstance(getattr(step, "handles", None), dict):
+        return [(key, step.handles[key]) for key in datasets if key in step.handles]
+    if isinstance(getattr(step, "handles", None), list):
+        return [(key, handle) for key in datasets for handle in step.handles]
+    if hasattr(step, "handle"):
+        return [(key, step.handle) for key in datasets]
+    return None
+
+
+def _schema_issues(
+    source: StructType, target: StructType, join_cols: List[str] = None
+) -> List[str]:
+    """Checks that a dataframe with the source schema can be written to a table
+    with the target schema without schema evolution."""
+    issues = []
+    target_fields = {f.name.lower(): f for f in target.fields}
+    for source_field in source.fields:
+        target_field = target_fields.get(source_field.name.lower())
+        if target_field is None:
+            issues.append(f"The column {source_field.name} is not in the target.")
+        elif source_field.dataType != target_field.dataType:
+            issues.append(
+                f"The column {source_field.name} has the type "
+                f"{source_field.dataType.simpleString()}, but the target has "
+                f"{target_field.dataType.simpleString()}."
+            )
+
+    source_names = {f.name.lower() for f in source.fields}
+    for col in join_cols or []:
+        if col.lower() not in source_names:
+            issues.append(f"The join column {col} is not in the dataset.")
+    return issues
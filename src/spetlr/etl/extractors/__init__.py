@@ -1,9 +1,14 @@
+from .change_feed_extractor import ChangeFeedExtractor, ChangeFeedVersionStore
 from .incremental_extractor import IncrementalExtractor
 from .simple_extractor import SimpleExtractor
 from .stream_extractor import StreamExtractor
+from .watermark_store import WatermarkStore
 
 __all__ = [
+    "ChangeFeedExtractor",
+    "ChangeFeedVersionStore",
     "IncrementalExtractor",
     "SimpleExtractor",
     "StreamExtractor",
+    "WatermarkStore",
 ]
@@ -0,0 +1,175 @@
+"""
+Extraction of the changes of a delta table since the last run.
+
+The ChangeFeedExtractor reads the change data feed of its source between the last
+version that its consumer has processed and the current version. The processed
+versions are kept per consumer in a ChangeFeedVersionStore, so that several jobs
+can consume the changes of the same table independently.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+import pyspark.sql.functions as f
+from pyspark.sql import DataFrame, Window
+from pyspark.sql.types import (
+    LongType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+
+from spetlr.delta import DeltaHandle
+from spetlr.delta.snapshot import TableSnapshot
+from spetlr.etl import Extractor
+from spetlr.etl.sampling import Sampling, sample
+from spetlr.spark import Spark
+
+_CDF_COLS = ["_change_type", "_commit_version", "_commit_timestamp"]
+
+
+class ChangeFeedVersionStore:
+    """The last processed version of each source table per consumer.
+
+    The state table must exist and must have the following schema:
+    (
+        ConsumerId STRING,
+        TableName STRING,
+        Version BIGINT,
+        UpdatedTime TIMESTAMP
+    )
+    """
+
+    schema = StructType(
+        [
+            StructField("ConsumerId", StringType(), True),
+            StructField("TableName", StringType(), True),
+            StructField("Version", LongType(), True),
+            StructField("UpdatedTime", TimestampType(), True),
+        ]
+    )
+
+    def __init__(self, state_table: DeltaHandle):
+        self.state_table = state_table
+
+    def get(self, consumer_id: str, table_name: str) -> Optional[int]:
+        """The last processed version, or None if none was stored."""
+        rows = (
+            self.state_table.read_latest()
+            .where(
+                (f.col("ConsumerId") == consumer_id)
+                & (f.col("TableName") == table_name)
+            )
+            .select("Version")
+            .take(1)
+        )
+        return rows[0]["Version"] if rows else None
+
+    def set(self, consumer_id: str, table_name: str, version: int) -> None:
+        """Store the last processed version."""
+        df = Spark.get().createDataFrame(
+            [(consumer_id, table_name, version, datetime.utcnow())],
+            schema=self.schema,
+        )
+        self.state_table.merge(df, ["ConsumerId", "TableName"], detect_changes=False)
+
+
+class ChangeFeedExtractor(Extractor):
+    """Extracts the rows of a delta table that changed since the last run of the
+    consumer. The table must have the property delta.enableChangeDataFeed.
+
+    The result has the columns of the table and the boolean tombstone_col, which
+    is true for deleted rows. Every key appears once, with its latest change.
+    It can be loaded by a SimpleLoader in upsert mode with the same tombstone_col,
+    or by a CachedLoader with incremental_input and the same tombstone_col.
+
+    The first run of a consumer returns all rows of the table. The version that
+    was read up to is stored by commit_watermark() once the rows are loaded. An
+    orchestrator calls it after a successful run. Nothing is stored while
+    sampling is active. In a TableSnapshot, the changes are read up to the pinned
+    version of the table.
+
+    Args:
+        handle: The source table.
+        key_cols: The columns that identify a row.
+        version_store: Where the processed versions are kept.
+        consumer_id: The key in the version store. Every job that consumes the
+            table needs its own consumer id.
+        tombstone_col: The name of the column that marks deleted rows.
+    """
+
+    def __init__(
+        self,
+        handle: DeltaHandle,
+        key_cols: List[str],
+        version_store: ChangeFeedVersionStore,
+        *,
+        consumer_id: str,
+        dataset_key: str = None,
+        tombstone_col: str = "isDeleted",
+        sample_keys: List[str] = None,
+    ):
+        super().__init__(dataset_key=dataset_key)
+        self.handle = handle
+        self.key_cols = key_cols
+        self.version_store = version_store
+        self.consumer_id = consumer_id
+        self.tombstone_col = tombstone_col
+        self.sample_keys = sample_keys
+        self._pending_version: Optional[int] = None
+
+    def read(self) -> DataFrame:
+        table_name = self.handle.get_tablename()
+        snapshot = TableSnapshot.current()
+        end_version = snapshot.pinned_version(self.handle) if snapshot else None
+        if end_version is None:
+            end_version = self.handle.get_latest_version()
+        last_version = self.version_store.get(self.consumer_id, table_name)
+
+        if last_version is None:
+            print(f"No processed version of {table_name}. Extracting all rows.")
+            df = self.handle.read(version=end_version).withColumn(
+                self.tombstone_col, f.lit(False)
+            )
+        elif last_version >= end_version:
+            df = (
+                self.handle.read(version=end_version)
+                .withColumn(self.tombstone_col, f.lit(False))
+                .limit(0)
+            )
+        else:
+            df = self._latest_changes(
+                self.handle.read_changes(last_version + 1, end_version)
+            )
+
+        self._pending_version = end_version if Sampling.get_fraction() is None else None
+
+        return sample(df, self.sample_keys)
+
+    def commit_watermark(self) -> None:
+        """Store the version of the last read as processed.
+        Call it when the extracted rows have been loaded."""
+        if self._pending_version is not None:
+            self.version_store.set(
+                self.consumer_id, self.handle.get_tablename(), self._pending_version
+            )
+        self._pending_version = None
+
+    def _latest_changes(self, changes: DataFrame) -> DataFrame:
+        # the pre-images of updates hold the old values
+        changes = changes.where(f.col("_change_type") != "update_preimage")
+
+        # within a commit, a row that is deleted and inserted again is kept
+        latest = Window.partitionBy(*self.key_cols).orderBy(
+            f.col("_commit_version").desc(),
+            (f.col("_change_type") == "delete").asc(),
+        )
+        data_cols = [c for c in changes.columns if c not in _CDF_COLS]
+        return (
+            changes.withColumn("_change_rank", f.row_number().over(latest))
+            .where(f.col("_change_rank") == 1)
+            .select(
+                *data_cols,
+                (f.col("_change_type") == "delete").alias(self.tombstone_col),
+            )
+        )
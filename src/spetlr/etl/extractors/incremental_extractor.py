@@ -1,11 +1,15 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
+from typing import List, Optional
 
 import pyspark.sql.functions as f
 from pyspark.sql import DataFrame
 
+from spetlr.delta import DeltaHandle
 from spetlr.eh import EventHubCapture
 from spetlr.etl import Extractor
 from spetlr.etl.extractors.simple_extractor import Readable
+from spetlr.etl.extractors.watermark_store import WatermarkStore
+from spetlr.etl.sampling import Sampling, sample
 
 
 class IncrementalExtractor(Extractor):
@@ -14,7 +18,17 @@ class IncrementalExtractor(Extractor):
     If needed it's possible to define a overlapping period using the timedelta function.
     NB: It is not recommended to use this on Eventhub data.
         Use EventHubCaptureExtractor instead.
+    When sampling is active, only the sample by the sample_keys is returned,
+    see spetlr.etl.sampling.
 
+    With a watermark_store, the latest time of the target is read from the store
+    under the extractor_id, which must then be given. It identifies the extractor
+    in all jobs that share the store, so it must be unique. If the store has
+    no entry, it is taken from the delta transaction log of a DeltaHandle target,
+    and else from the maximum of the target. The latest source time of the
+    extracted rows becomes the new high-water mark, which is stored by
+    commit_watermark() once the rows are loaded. An orchestrator calls it after
+    a successful run. Nothing is stored while sampling is active.
     """
 
     def __init__(
@@ -25,13 +39,22 @@ class IncrementalExtractor(Extractor):
         time_col_target: str,
         dataset_key: str = None,
         overlap_period: timedelta = None,
+        sample_keys: List[str] = None,
+        watermark_store: WatermarkStore = None,
+        extractor_id: str = None,
     ):
         super().__init__(dataset_key=dataset_key)
+        if watermark_store and not extractor_id:
+            raise ValueError("An extractor_id is required with a watermark_store.")
         self.handle_source = handle_source
         self.handle_target = handle_target
-        self._timecol_source = time_col_source
-        self._timecol_target = time_col_target
-        self._overlap_period = overlap_period
+        self.time_col_source = time_col_source
+        self.time_col_target = time_col_target
+        self.overlap_period = overlap_period
+        self.sample_keys = sample_keys
+        self.watermark_store = watermark_store
+        self.extractor_id = extractor_id
+        self._pending_watermark: Optional[datetime] = None
 
     def read(self) -> DataFrame:
         if isinstance(self.handle_source, EventHubCapture):
@@ -42,22 +65,51 @@ class IncrementalExtractor(Extractor):
             )
 
         df = self.handle_source.read()
-        df_target = self.handle_target.read()
 
         # For incremental load, get the latest record from target table
         # In other words, get the maximum of the timestamp column
-        target_max_time = (
-            df_target.groupBy().agg(f.max(self._timecol_target)).collect()[0][0]
-        )
+        target_max_time = self._get_target_max_time()
+        high_water_mark = target_max_time
 
         # If overlap_period is defined extract it from target_max_time
-        if self._overlap_period and target_max_time is not None:
-            target_max_time = target_max_time - self._overlap_period
+        if self.overlap_period and target_max_time is not None:
+            target_max_time = target_max_time - self.overlap_period
 
         # If the target table is empty, target_max_time will be None
         # Only filter the input dataframe if the table is non-empty
         # table non-empty = target_max_time not None
         if target_max_time:
-            df = df.where(f.col(self._timecol_source) > f.lit(target_max_time))
+            df = df.where(f.col(self.time_col_source) > f.lit(target_max_time))
+
+        self._pending_watermark = None
+        if self.watermark_store and Sampling.get_fraction() is None:
+            # the rows that arrive in the source after this point are not part of
+            # the mark, they are extracted again in the next run.
+            (extracted_max_time,) = df.agg(f.max(self.time_col_source)).first()
+            self._pending_watermark = max(
+                [t for t in (high_water_mark, extracted_max_time) if t is not None],
+                default=None,
+            )
+
+        return sample(df, self.sample_keys)
 
-        return df
+    def commit_watermark(self) -> None:
+        """Store the high-water mark of the last read in the watermark store.
+        Call it when the extracted rows have been loaded."""
+        if self.watermark_store and self._pending_watermark is not None:
+            self.watermark_store.set(self.extractor_id, self._pending_watermark)
+        self._pending_watermark = None
+
+    def _get_target_max_time(self):
+        if self.watermark_store:
+            stored = self.watermark_store.get(self.extractor_id)
+            if stored is not None:
+                return stored
+
+        if isinstance(self.handle_target, DeltaHandle):
+            # the maximum is known from the delta transaction log
+            stats = self.handle_target.get_statistics([self.time_col_target])
+            return stats.columns[self.time_col_target].max
+
+        df_target = self.handle_target.read()
+        return df_target.groupBy().agg(f.max(self.time_col_target)).collect()[0][0]
@@ -1,8 +1,9 @@
-from typing import Protocol
+from typing import List, Protocol
 
 from pyspark.sql import DataFrame
 
 from spetlr.etl import Extractor
+from spetlr.etl.sampling import sample
 
 
 class Readable(Protocol):
@@ -11,11 +12,16 @@ class Readable(Protocol):
 
 
 class SimpleExtractor(Extractor):
-    """This extractor will extract from any object that has a .read() method."""
+    """This extractor will extract from any object that has a .read() method.
+    When sampling is active, only the sample by the sample_keys is returned,
+    see spetlr.etl.sampling."""
 
-    def __init__(self, handle: Readable, dataset_key: str):
+    def __init__(
+        self, handle: Readable, dataset_key: str, sample_keys: List[str] = None
+    ):
         super().__init__(dataset_key=dataset_key)
         self.handle = handle
+        self.sample_keys = sample_keys
 
     def read(self) -> DataFrame:
-        return self.handle.read()
+        return sample(self.handle.read(), self.sample_keys)
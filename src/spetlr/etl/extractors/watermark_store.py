@@ -0,0 +1,57 @@
+"""
+Persistent high-water marks of incremental extractors.
+
+An IncrementalExtractor finds the rows of its source that are newer than the
+latest time in its target. Looking that time up in a large target is slow,
+unless the delta transaction log has it. A WatermarkStore keeps the time of the
+last successful load per extractor id in a small delta table instead, so that
+it is read with a single key lookup.
+"""
+from datetime import datetime
+from typing import Optional
+
+import pyspark.sql.functions as f
+from pyspark.sql.types import StringType, StructField, StructType, TimestampType
+
+from spetlr.delta import DeltaHandle
+from spetlr.spark import Spark
+
+
+class WatermarkStore:
+    """The high-water marks of extractors, keyed by extractor id.
+
+    The state table must exist and must have the following schema:
+    (
+        ExtractorId STRING,
+        Watermark TIMESTAMP,
+        UpdatedTime TIMESTAMP
+    )
+    """
+
+    schema = StructType(
+        [
+            StructField("ExtractorId", StringType(), True),
+            StructField("Watermark", TimestampType(), True),
+            StructField("UpdatedTime", TimestampType(), True),
+        ]
+    )
+
+    def __init__(self, state_table: DeltaHandle):
+        self.state_table = state_table
+
+    def get(self, extractor_id: str) -> Optional[datetime]:
+        """The stored high-water mark, or None if none was stored."""
+        rows = (
+            self.state_table.read_latest()
+            .where(f.col("ExtractorId") == extractor_id)
+            .select("Watermark")
+            .take(1)
+        )
+        return rows[0]["Watermark"] if rows else None
+
+    def set(self, extractor_id: str, watermark: datetime) -> None:
+        """Store the high-water mark of the extractor."""
+        df = Spark.get().createDataFrame(
+            [(extractor_id, watermark, datetime.utcnow())], schema=self.schema
+        )
+        self.state_table.merge(df, ["ExtractorId"], detect_changes=False)
@@ -0,0 +1,211 @@
+"""
+Skip-if-unchanged execution of orchestrators.
+
+A run fingerprint consists of the delta table versions of all sources that the
+extractors of an orchestrator read, and a hash of the configuration of the
+orchestrator. The fingerprint of the last successful run is stored in a state
+table. When the current fingerprint equals the stored one, the run can be skipped.
+"""
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pyspark.sql.types import (
+    LongType,
+    MapType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+
+from spetlr.delta import DeltaHandle
+from spetlr.functions import get_unique_tempview_name, json_hash
+from spetlr.spark import Spark
+from spetlr.tables import TableHandle
+
+from .extractor import Extractor
+from .loader import Loader
+from .orchestrator import Orchestrator
+from .transformer import Transformer
+from .types import EtlBase
+
+# e.g. in the repr of functions, which would differ in every process
+_MEMORY_ADDRESS = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+class RunFingerprint:
+    """Skip the run of an orchestrator if none of its delta sources has changed.
+
+    Pass an instance to the orchestrator as Orchestrator(fingerprint=...).
+    Before any step is executed, the latest versions of all DeltaHandles that the
+    extractors read are looked up in the delta transaction logs. If these versions
+    and the configuration hash equal those of the last successful run with the
+    same orchestrator_id, no step is executed. After a successful run, the versions
+    that were observed at the start of the run are stored in the state table.
+
+    The sources are found in the attributes `handle` and `handle_source` of the
+    extractors, also in nested orchestrators. If any extractor reads from something
+    else than a DeltaHandle, or a step is not an extractor, transformer, loader or
+    orchestrator, the run is never skipped. Tables that transformers or loaders
+    read by other means are not tracked.
+
+    The state table must exist and must have the following schema:
+    (
+        OrchestratorId STRING,
+        ConfigHash STRING,
+        InputVersions MAP<STRING, BIGINT>,
+        RunTime TIMESTAMP
+    )
+    """
+
+    schema = StructType(
+        [
+            StructField("OrchestratorId", StringType(), True),
+            StructField("ConfigHash", StringType(), True),
+            StructField("InputVersions", MapType(StringType(), LongType()), True),
+            StructField("RunTime", TimestampType(), True),
+        ]
+    )
+
+    def __init__(self, state_table: DeltaHandle, orchestrator_id: str):
+        self.state_table = state_table
+        self.orchestrator_id = orchestrator_id
+        self._current: Optional[Dict[str, Any]] = None
+
+    def is_unchanged(self, orchestrator: Orchestrator) -> bool:
+        """Compute the current fingerprint and compare it with the last run."""
+        self._current = self.compute(orchestrator)
+        if self._current is None:
+            return False
+
+        stored = (
+            self.state_table.read()
+            .filter(f"OrchestratorId = '{self.orchestrator_id}'")
+            .select("ConfigHash", "InputVersions")
+            .take(1)
+        )
+        if not stored:
+            return False
+
+        return (
+            stored[0]["ConfigHash"] == self._current["ConfigHash"]
+            and dict(stored[0]["InputVersions"]) == self._current["InputVersions"]
+        )
+
+    def record(self) -> None:
+        """Store the fingerprint that was computed at the start of the run."""
+        if self._current is None:
+            return
+
+        df = Spark.get().createDataFrame(
+            [
+                (
+                    self.orchestrator_id,
+                    self._current["ConfigHash"],
+                    self._current["InputVersions"],
+                    datetime.utcnow(),
+                )
+            ],
+            schema=self.schema,
+        )
+        view_name = get_unique_tempview_name()
+        df.createOrReplaceTempView(view_name)
+        Spark.get().sql(
+            f"MERGE INTO {self.state_table.get_tablename()} AS target "
+            f"USING {view_name} AS source "
+            "ON source.OrchestratorId = target.OrchestratorId "
+            "WHEN MATCHED THEN UPDATE SET * "
+            "WHEN NOT MATCHED THEN INSERT * "
+        )
+        self._current = None
+
+    def compute(self, orchestrator: Orchestrator) -> Optional[Dict[str, Any]]:
+        """The fingerprint of the orchestrator,
+        or None if its sources cannot be determined."""
+        handles = self._get_source_handles(orchestrator.steps)
+        if handles is None:
+            print(
+                "RunFingerprint: Not all sources of the orchestrator are delta "
+                "tables. The run cannot be skipped."
+            )
+            return None
+
+        return dict(
+            ConfigHash=json_hash(_describe(orchestrator)),
+            InputVersions={
+                handle.get_tablename(): handle.get_latest_version()
+                for handle in handles
+            },
+        )
+
+    @classmethod
+    def _get_source_handles(cls, steps: List[EtlBase]) -> Optional[List[DeltaHandle]]:
+        handles = []
+        for step in steps:
+            if isinstance(step, Orchestrator):
+                nested = cls._get_source_handles(step.steps)
+                if nested is None:
+                    return None
+                handles += nested
+            elif isinstance(step, Extractor):
+                sources = [
+                    getattr(step, attr)
+                    for attr in ["handle", "handle_source"]
+                    if hasattr(step, attr)
+                ]
+                if not sources or not all(
+                    isinstance(source, DeltaHandle) for source in sources
+                ):
+                    return None
+                handles += sources
+            elif not isinstance(step, (Transformer, Loader)):
+                return None
+        return handles
+
+
+def _describe(obj: Any, depth: int = 0) -> Any:
+    """A json-serializable description of the configuration of an etl object.
+    Other values, e.g. a timedelta, are described by their repr without memory
+    addresses, so that the description is the same across runs. Objects without
+    a repr of their own are described by their public attributes."""
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if depth > 10:
+        return type(obj).__qualname__
+    if isinstance(obj, (list, tuple)):
+        return [_describe(item, depth + 1) for item in obj]
+    if isinstance(obj, (set, frozenset)):
+        return sorted(
+            (_describe(item, depth + 1) for item in obj),
+            key=lambda item: json.dumps(item, sort_keys=True),
+        )
+    if isinstance(obj, dict):
+        return {str(key): _describe(value, depth + 1) for key, value in obj.items()}
+    if isinstance(obj, TableHandle):
+        try:
+            return {"handle": type(obj).__qualname__, "name": obj.get_tablename()}
+        except NotImplementedError:
+            return type(obj).__qualname__
+    if isinstance(obj, EtlBase) or (
+        type(obj).__repr__ is object.__repr__ and hasattr(obj, "__dict__")
+    ):
+        return {
+            "type": type(obj).__qualname__,
+            "attributes": {
+                key: _describe(value, depth + 1)
+                for key, value in sorted(vars(obj).items())
+                # the datasets of previous runs are not part of the configuration
+                if not key.startswith("_") and key != "previous_extractions"
+            },
+        }
+    return {
+        "type": type(obj).__qualname__,
+        "repr": _MEMORY_ADDRESS.sub("", repr(obj)),
+    }
+
+
+def describe_configuration(orchestrator: Orchestrator) -> str:
+    """The configuration of the orchestrator as it enters the fingerprint."""
+    return json.dumps(_describe(orchestrator), indent=2, sort_keys=True)
@@ -0,0 +1,228 @@
+"""
+Hooks that are called around every step of an orchestrator.
+
+The SparkStepMetrics hook runs each step in its own spark job group and collects
+the timing and the spark metrics of the jobs of each step in a structured report.
+"""
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from pyspark.sql import DataFrame
+from pyspark.sql.types import (
+    ArrayType,
+    BooleanType,
+    DoubleType,
+    IntegerType,
+    LongType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+
+from spetlr.spark import Spark
+
+from .types import EtlBase
+
+
+class StepHook:
+    """Base class for hooks around the steps of an orchestrator.
+    In parallel mode, the hooks are called from the thread that runs the step."""
+
+    def before_step(self, index: int, step: EtlBase) -> None:
+        pass
+
+    def after_step(
+        self, index: int, step: EtlBase, error: Optional[BaseException]
+    ) -> None:
+        pass
+
+
+@dataclass
+class StepMetrics:
+    """The measurements of a single step. The spark metrics are summed over all
+    stages of the jobs of the step, they are None if they could not be obtained."""
+
+    step_index: int
+    step_name: str
+    start_time: datetime
+    duration_seconds: float = None
+    succeeded: bool = None
+    error: str = None
+    job_group: str = None
+    job_ids: List[int] = field(default_factory=list)
+    stage_ids: List[int] = field(default_factory=list)
+    shuffle_read_bytes: int = None
+    shuffle_write_bytes: int = None
+    memory_bytes_spilled: int = None
+    disk_bytes_spilled: int = None
+    output_rows: int = None
+
+
+class SparkStepMetrics(StepHook):
+    """Records wall-clock time and spark metrics for every step.
+
+    Each step is executed in its own spark job group, from which the job and
+    stage ids of the step are found with the spark status tracker. The shuffle,
+    spill and output metrics of the stages are read from the monitoring REST API
+    of the spark UI of the driver. If the UI is not available, only the timing
+    and the ids are recorded.
+
+    After the orchestrator has run, the measurements are available in the
+    attribute metrics, in step order, and with the method to_dataframe.
+    """
+
+    # the fields of the REST api stage data and the corresponding metrics
+    _stage_fields = {
+        "shuffleReadBytes": "shuffle_read_bytes",
+        "shuffleWriteBytes": "shuffle_write_bytes",
+        "memoryBytesSpilled": "memory_bytes_spilled",
+        "diskBytesSpilled": "disk_bytes_spilled",
+        "outputRecords": "output_rows",
+    }
+
+    _job_properties = [
+        "spark.jobGroup.id",
+        "spark.job.description",
+        "spark.job.interruptOnCancel",
+    ]
+
+    def __init__(self, name: str = None):
+        self.run_id = uuid.uuid4().hex
+        self.name = name
+        self.metrics: List[StepMetrics] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def before_step(self, index: int, step: EtlBase) -> None:
+        sc = Spark.get().sparkContext
+        group = f"spetlr-{self.run_id}-{index}"
+        description = f"{self.name or 'Orchestrator'} step {index}"
+        description += f": {type(step).__name__}"
+
+        self._local.previous = {
+            key: sc.getLocalProperty(key) for key in self._job_properties
+        }
+        sc.setJobGroup(group, description)
+        self._local.metrics = StepMetrics(
+            step_index=index,
+            step_name=type(step).__name__,
+            start_time=datetime.utcnow(),
+            job_group=group,
+        )
+        self._local.start = time.perf_counter()
+
+    def after_step(
+        self, index: int, step: EtlBase, error: Optional[BaseException]
+    ) -> None:
+        metrics: StepMetrics = self._local.metrics
+        metrics.duration_seconds = time.perf_counter() - self._local.start
+        metrics.succeeded = error is None
+        metrics.error = None if error is None else repr(error)
+
+        sc = Spark.get().sparkContext
+        for key, value in self._local.previous.items():
+            sc.setLocalProperty(key, value)
+
+        tracker = sc.statusTracker()
+        metrics.job_ids = sorted(tracker.getJobIdsForGroup(metrics.job_group))
+        for job_id in metrics.job_ids:
+            info = tracker.getJobInfo(job_id)
+            if info:
+                metrics.stage_ids.extend(info.stageIds)
+        metrics.stage_ids.sort()
+
+        for name, value in self._get_stage_metrics(metrics.stage_ids).items():
+            setattr(metrics, name, value)
+
+        with self._lock:
+            self.metrics.append(metrics)
+            self.metrics.sort(key=lambda m: m.step_index)
+
+    def _get_stage_metrics(self, stage_ids: List[int]) -> Dict[str, int]:
+        sc = Spark.get().sparkContext
+        if not sc.uiWebUrl:
+            return {}
+
+        totals = dict.fromkeys(self._stage_fields.values(), 0)
+        base_url = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}/stages"
+        try:
+            for stage_id in stage_ids:
+                with urlopen(f"{base_url}/{stage_id}", timeout=10) as response:
+                    # the stage data contains one entry per attempt
+                    for attempt in json.load(response):
+                        for key, name in self._stage_fields.items():
+                            totals[name] += attempt.get(key, 0)
+        except (URLError, OSError, ValueError) as err:
+            print(f"WARNING: Could not obtain the spark stage metrics: {err}")
+            return {}
+
+        return totals
+
+    schema = StructType(
+        [
+            StructField("StepIndex", IntegerType(), True),
+            StructField("StepName", StringType(), True),
+            StructField("StartTime", TimestampType(), True),
+            StructField("DurationSeconds", DoubleType(), True),
+            StructField("Succeeded", BooleanType(), True),
+            StructField("Error", StringType(), True),
+            StructField("JobGroup", StringType(), True),
+            StructField("JobIds", ArrayType(IntegerType()), True),
+            StructField("StageIds", ArrayType(IntegerType()), True),
+            StructField("ShuffleReadBytes", LongType(), True),
+            StructField("ShuffleWriteBytes", LongType(), True),
+            StructField("MemoryBytesSpilled", LongType(), True),
+            StructField("DiskBytesSpilled", LongType(), True),
+            StructField("OutputRows", LongType(), True),
+        ]
+    )
+
+    def to_dataframe(self) -> DataFrame:
+        """The measurements as a dataframe with one row per step."""
+        return Spark.get().createDataFrame(
+            [
+                (
+                    m.step_index,
+                    m.step_name,
+                    m.start_time,
+                    m.duration_seconds,
+                    m.succeeded,
+                    m.error,
+                    m.job_group,
+                    m.job_ids,
+                    m.stage_ids,
+                    m.shuffle_read_bytes,
+                    m.shuffle_write_bytes,
+                    m.memory_bytes_spilled,
+                    m.disk_bytes_spilled,
+                    m.output_rows,
+                )
+                for m in self.metrics
+            ],
+            schema=self.schema,
+        )
+
+    def report(self) -> str:
+        """A human-readable summary of the measurements, slowest steps first."""
+        lines = [
+            f"{'step':>4} {'name':<40} {'seconds':>9} {'jobs':>5} "
+            f"{'shuffle read':>14} {'shuffle write':>14} {'spilled':>14}"
+        ]
+        for m in sorted(self.metrics, key=lambda m: -(m.duration_seconds or 0)):
+            spilled = None
+            if m.memory_bytes_spilled is not None:
+                spilled = m.memory_bytes_spilled + m.disk_bytes_spilled
+            lines.append(
+                f"{m.step_index:>4} {m.step_name:<40} {m.duration_seconds:>9.2f} "
+                f"{len(m.job_ids):>5} {str(m.shuffle_read_bytes):>14} "
+                f"{str(m.shuffle_write_bytes):>14} {str(spilled):>14}"
+            )
+        return "\n".join(lines)
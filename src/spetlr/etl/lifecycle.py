@@ -0,0 +1,100 @@
+import threading
+from typing import Dict, List, Tuple
+
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame
+
+from .dag import get_step_access
+from .types import EtlBase, dataset_group
+
+# a dataset produced by a step: (index of the producing step, dataset key)
+production = Tuple[int, str]
+
+
+class DatasetLifecycle:
+    """Reference counting of the datasets that flow through the steps of an
+    orchestrator.
+
+    From the dataset keys of the steps, it is determined how many later steps
+    read each produced dataset. A dataset with more than one consumer is persisted
+    with the given storage level as soon as it is produced, and it is unpersisted
+    as soon as its last consumer has finished. This avoids that the lineage of
+    the dataset is computed once per consumer.
+
+    Datasets that are produced by steps that do not declare their dataset keys,
+    such as nested orchestrators, are not managed. Such steps count as consumers
+    of all datasets that exist before them.
+    """
+
+    def __init__(
+        self,
+        steps: List[EtlBase],
+        keys: List[str],
+        storage_level: StorageLevel = StorageLevel.MEMORY_AND_DISK,
+    ):
+        self.storage_level = storage_level
+        self._lock = threading.Lock()
+        self._persisted: Dict[production, DataFrame] = {}
+
+        consumers: Dict[production, List[int]] = {}
+        alive: Dict[str, production] = {}
+        keys = list(keys)
+        for index, step in enumerate(steps):
+            access = get_step_access(step, keys)
+            if access.barrier:
+                read = list(alive.values())
+                alive.clear()
+                keys = []
+            else:
+                read = [alive[key] for key in access.reads if key in alive]
+                for key in access.pops:
+                    alive.pop(key, None)
+                for key in access.writes:
+                    alive[key] = (index, key)
+                    consumers[(index, key)] = []
+                keys = access.apply(keys)
+
+            for produced in read:
+                consumers[produced].append(index)
+
+        shared = {
+            produced: indexes
+            for produced, indexes in consumers.items()
+            if len(indexes) > 1
+        }
+
+        # the datasets to persist after each step
+        self._persist_after: Dict[int, List[str]] = {}
+        # the shared datasets that each step reads
+        self._consumed_by: Dict[int, List[production]] = {}
+        # the number of consumers that have not finished yet
+        self._remaining: Dict[production, int] = {}
+        for (index, key), indexes in shared.items():
+            self._persist_after.setdefault(index, []).append(key)
+            self._remaining[(index, key)] = len(indexes)
+            for consumer in indexes:
+                self._consumed_by.setdefault(consumer, []).append((index, key))
+
+    def shared_datasets(self) -> Dict[production, int]:
+        """The datasets that will be persisted, with their number of consumers."""
+        return dict(self._remaining)
+
+    def step_done(self, index: int, datasets: dataset_group) -> None:
+        """To be called with the outputs of each step when it has finished."""
+        with self._lock:
+            for key in self._persist_after.get(index, []):
+                df = datasets.get(key)
+                if isinstance(df, DataFrame) and not df.isStreaming:
+                    self._persisted[(index, key)] = df.persist(self.storage_level)
+
+            for produced in self._consumed_by.get(index, []):
+                self._remaining[produced] -= 1
+                if self._remaining[produced] == 0 and produced in self._persisted:
+                    self._persisted.pop(produced).unpersist()
+
+    def release_all(self) -> None:
+        """Unpersist all datasets that are still persisted, e.g. after a failure."""
+        with self._lock:
+            for df in self._persisted.values():
+                df.unpersist()
+            self._persisted.clear()
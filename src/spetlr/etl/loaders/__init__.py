@@ -1,4 +1,16 @@
-from .load_modes import Appendable, Overwritable, Upsertable  # noqa: F401
+from .concurrent_loader import (  # noqa: F401
+    ConcurrentLoader,
+    ConcurrentLoadException,
+    MultiTableLoader,
+)
+from .load_modes import (  # noqa: F401
+    Appendable,
+    KeyDeletable,
+    Overwritable,
+    PartitionOverwritable,
+    Upsertable,
+)
+from .multi_sink_loader import MultiSinkLoader  # noqa: F401
 from .simple_loader import SimpleLoader  # noqa: F401
 from .simple_sql_loader import SimpleSqlServerLoader  # noqa: F401
 from .upsert_loader_streaming import UpsertLoaderStreaming  # noqa: F401
@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial
+from typing import Callable, Dict, List, Union
+
+from pyspark.sql import DataFrame
+
+from spetlr.etl import Loader, dataset_group
+from spetlr.exceptions import SpetlrException
+
+from .load_modes import Appendable, Overwritable, Upsertable
+from .simple_loader import SimpleLoader
+
+
+class ConcurrentLoadException(SpetlrException):
+    """Raised when one or more of the concurrent writes failed.
+    The errors are available per dataset key in the attribute errors."""
+
+    def __init__(self, errors: Dict[str, BaseException]):
+        self.errors = errors
+        super().__init__(
+            f"{len(errors)} concurrent write(s) failed: "
+            + ", ".join(f"{key}: {err!r}" for key, err in errors.items())
+        )
+
+
+class ConcurrentLoader(Loader):
+    """Base class for loaders that write a group of datasets concurrently.
+
+    All selected datasets are passed to save_many, also if there is only one.
+    Every dataset is written with save_dataset on a thread pool with at most
+    max_workers threads, so that the spark jobs of the writes run at the same time.
+    All writes are completed before the errors of the failed writes, if any, are
+    raised together in a ConcurrentLoadException.
+    """
+
+    def __init__(
+        self,
+        *,
+        dataset_input_keys: Union[str, List[str]] = None,
+        max_workers: int = None,
+    ):
+        super().__init__(dataset_input_keys=dataset_input_keys)
+        self.max_workers = max_workers
+
+    def etl(self, inputs: dataset_group) -> dataset_group:
+        if len(self.dataset_input_key_list) > 0:
+            self.save_many({key: inputs[key] for key in self.dataset_input_key_list})
+        else:
+            self.save_many(inputs)
+
+        return inputs
+
+    def save(self, df: DataFrame) -> None:
+        raise NotImplementedError("Use save_many to save datasets with their keys.")
+
+    def save_many(self, datasets: dataset_group) -> None:
+        self.run_concurrently(
+            {key: partial(self.save_dataset, key, df) for key, df in datasets.items()}
+        )
+
+    def save_dataset(self, key: str, df: DataFrame) -> None:
+        raise NotImplementedError()
+
+    def run_concurrently(self, writes: Dict[str, Callable[[], None]]) -> None:
+        """Execute all writes on the thread pool and collect their errors."""
+        if not writes:
+            return
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="spetlr-load"
+        ) as pool:
+            # the writes see the run settings of the calling thread
+            futures = {
+                key: pool.submit(copy_context().run, write)
+                for key, write in writes.items()
+            }
+
+        errors = {
+            key: future.exception()
+            for key, future in futures.items()
+            if future.exception() is not None
+        }
+        if errors:
+            raise ConcurrentLoadException(errors) from next(iter(errors.values()))
+
+
+class MultiTableLoader(ConcurrentLoader):
+    """Writes each dataset to the handle that is given for its key, concurrently.
+
+    The mode and join_cols apply to all handles, and have the same meaning as in
+    the SimpleLoader.
+    """
+
+    def __init__(
+        self,
+        handles: Dict[str, Union[Overwritable, Appendable, Upsertable]],
+        *,
+        mode: str = "overwrite",
+        join_cols: List[str] = None,
+        max_workers: int = None,
+    ):
+        super().__init__(dataset_input_keys=list(handles), max_workers=max_workers)
+        self.handles = handles
+        self.mode = mode.lower()
+        self.join_cols = join_cols
+
+    def save_dataset(self, key: str, df: DataFrame) -> None:
+        SimpleLoader(self.handles[key], mode=self.mode, join_cols=self.join_cols).save(
+            df
+        )
@@ -16,3 +16,13 @@ class Overwritable(Protocol):
 class Appendable(Protocol):
     def append(self, df: DataFrame) -> None:
         pass
+
+
+class PartitionOverwritable(Protocol):
+    def overwrite_partitions(self, df: DataFrame) -> None:
+        pass
+
+
+class KeyDeletable(Protocol):
+    def delete_keys(self, df: DataFrame, join_cols: List[str]) -> None:
+        pass
@@ -0,0 +1,108 @@
+import uuid
+from functools import partial
+from typing import List, Union
+
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame
+
+from spetlr.etl import dataset_group
+from spetlr.spark import Spark
+
+from .concurrent_loader import ConcurrentLoader
+from .load_modes import Appendable, Overwritable, Upsertable
+from .simple_loader import SimpleLoader
+
+
+class MultiSinkLoader(ConcurrentLoader):
+    """Writes the same dataset to several handles, computing it only once.
+
+    Before the writes, the dataset is materialized. By default, it is persisted
+    with the given storage_level. If a staging_path is given, the dataset is
+    instead written as a delta snapshot to a new directory below this path, and
+    all sinks read from the snapshot. The snapshot is deleted after the writes.
+    With storage_level=None and no staging_path, every sink computes the dataset
+    again.
+
+    The loader writes a single dataset. With several datasets in the input, the
+    dataset_input_keys must select one of them. The mode and join_cols have the
+    same meaning as in the SimpleLoader and apply to all handles. If parallel is
+    set, the writes to the sinks run concurrently on at most max_workers threads.
+    In all cases, every sink is written to before the failures are raised in a
+    ConcurrentLoadException.
+    """
+
+    def __init__(
+        self,
+        handles: List[Union[Overwritable, Appendable, Upsertable]],
+        *,
+        mode: str = "overwrite",
+        join_cols: List[str] = None,
+        storage_level: StorageLevel = StorageLevel.MEMORY_AND_DISK,
+        staging_path: str = None,
+        parallel: bool = False,
+        max_workers: int = None,
+        dataset_input_keys: Union[str, List[str]] = None,
+    ):
+        super().__init__(
+            dataset_input_keys=dataset_input_keys,
+            max_workers=max_workers if parallel else 1,
+        )
+        if len(self.dataset_input_key_list) > 1:
+            raise ValueError("The MultiSinkLoader writes a single dataset key.")
+        self.handles = handles
+        self.mode = mode.lower()
+        self.join_cols = join_cols
+        self.storage_level = storage_level
+        self.staging_path = staging_path
+
+    def save_many(self, datasets: dataset_group) -> None:
+        # every dataset would be written to the same handles
+        if len(datasets) != 1:
+            raise ValueError(
+                "The MultiSinkLoader writes a single dataset, but got "
+                f"{len(datasets)}: {', '.join(datasets)}. "
+                "Select one with dataset_input_keys."
+            )
+        super().save_many(datasets)
+
+    def save_dataset(self, key: str, df: DataFrame) -> None:
+        self.save(df)
+
+    def save(self, df: DataFrame) -> None:
+        persisted = None
+        staging_location = None
+        if self.staging_path:
+            # every dataset has its own snapshot, also when they are saved at once
+            staging_location = f"{self.staging_path.rstrip('/')}/{uuid.uuid4().hex}"
+            df.write.format("delta").save(staging_location)
+            df = Spark.get().read.format("delta").load(staging_location)
+        elif self.storage_level and not df.isStreaming:
+            persisted = df.persist(self.storage_level)
+            # compute the dataset before the sinks start to read it concurrently
+            persisted.count()
+            df = persisted
+
+        try:
+            self.run_concurrently(
+                {
+                    f"{index}: {type(handle).__name__}": partial(
+                        SimpleLoader(
+                            handle, mode=self.mode, join_cols=self.join_cols
+                        ).save,
+                        df,
+                    )
+                    for index, handle in enumerate(self.handles)
+                }
+            )
+        finally:
+            if persisted is not None:
+                persisted.unpersist()
+            if staging_location:
+                self._delete_snapshot(staging_location)
+
+    def _delete_snapshot(self, location: str) -> None:
+        spark = Spark.get()
+        jvm = spark.sparkContext._jvm
+        path = jvm.org.apache.hadoop.fs.Path(location)
+        fs = path.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration())
+        fs.delete(path, True)
@@ -1,29 +1,68 @@
 from typing import List, Union
 
+import pyspark.sql.functions as f
 from pyspark.sql import DataFrame
 
 from spetlr.etl import Loader
-from spetlr.etl.loaders import Appendable, Overwritable, Upsertable
+
+from .load_modes import (
+    Appendable,
+    KeyDeletable,
+    Overwritable,
+    PartitionOverwritable,
+    Upsertable,
+)
 
 
 class SimpleLoader(Loader):
+    """Loads into the handle by the mode.
+
+    In upsert mode with a tombstone_col, the rows where the boolean tombstone
+    column is true are deleted from the target by the join columns, e.g. the
+    deleted rows from a ChangeFeedExtractor. The other rows are upserted
+    without the tombstone column. The input is persisted for the two writes.
+    They are separate commits to the target, so if the upsert fails, the deletes
+    are kept.
+    """
+
     def __init__(
         self,
-        handle: Union[Overwritable, Appendable, Upsertable],
+        handle: Union[
+            Overwritable, Appendable, Upsertable, PartitionOverwritable, KeyDeletable
+        ],
         *,
         mode: str = "overwrite",
         join_cols: List[str] = None,
         dataset_input_keys: List[str] = None,
+        tombstone_col: str = None,
     ):
         super().__init__(dataset_input_keys=dataset_input_keys)
         self.mode = mode.lower()
         self.handle = handle
         self.join_cols = join_cols
+        self.tombstone_col = tombstone_col
 
     def save(self, df: DataFrame) -> None:
         if self.mode == "overwrite":
             self.handle.overwrite(df)
         elif self.mode == "upsert":
-            self.handle.upsert(df, self.join_cols)
+            if self.tombstone_col:
+                self._delete_and_upsert(df)
+            else:
+                self.handle.upsert(df, self.join_cols)
+        elif self.mode == "overwrite_partitions":
+            self.handle.overwrite_partitions(df)
         else:
             self.handle.append(df)
+
+    def _delete_and_upsert(self, df: DataFrame) -> None:
+        # the input is read by both writes, it is only computed once
+        df = df.persist()
+        try:
+            deleted = f.coalesce(f.col(self.tombstone_col), f.lit(False))
+            self.handle.delete_keys(df.filter(deleted), self.join_cols)
+            self.handle.upsert(
+                df.filter(~deleted).drop(self.tombstone_col), self.join_cols
+            )
+        finally:
+            df.unpersist()
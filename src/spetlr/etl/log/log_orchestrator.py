@@ -1,9 +1,14 @@
+from datetime import datetime
 from typing import List
 from uuid import uuid4
 
+import pyspark.sql.functions as F
+from pyspark.sql import DataFrame
+
+from spetlr.delta.merge_engine import MergeMetricsCollector
 from spetlr.etl import EtlBase, Orchestrator, dataset_group
-from spetlr.etl.loaders import SimpleLoader
-from spetlr.etl.loaders.simple_loader import Appendable
+from spetlr.etl.instrumentation import SparkStepMetrics
+from spetlr.etl.loaders import Appendable, MultiSinkLoader
 from spetlr.transformers import UnionTransformer
 
 from .log_transformer import LogTransformer
@@ -23,10 +28,22 @@ class LogOrchestrator(Orchestrator):
 
     Arguments:
         handles (List[Appendable]): A list of appendable handles that determine the
-            sink location of the output generated by LogTransformers.
+            sink location of the output generated by LogTransformers. The output
+            is appended to all handles concurrently.
         suppress_composition_warning (bool, optional):
             Whether to suppress warnings about potential changes in the composition of
             the ETL process. Defaults to False.
+        step_metrics_log_name (str, optional): If given, the timing and the spark
+            metrics of every step are recorded with a SparkStepMetrics hook, and
+            appended to the handles under this log name after the execution, also
+            if the execution failed. Defaults to None.
+        merge_metrics_log_name (str, optional): If given, the strategy and the
+            delta operation metrics of every merge into a delta table during the
+            execution, see DeltaHandle.merge, are appended to the handles under
+            this log name after the execution, also if the execution failed.
+            Merges from other threads of the process are included. Defaults to None.
+        **orchestrator_options: Further keyword arguments, such as parallel or
+            persist_shared_datasets, are passed on to the Orchestrator class.
 
     Methods:
         step(etl: EtlBase) -> LogOrchestrator:
@@ -44,9 +61,14 @@ class LogOrchestrator(Orchestrator):
         self,
         handles: List[Appendable],
         suppress_composition_warning=False,
+        step_metrics_log_name: str = None,
+        merge_metrics_log_name: str = None,
+        **orchestrator_options,
     ):
         self.handles = handles
-        super().__init__(suppress_composition_warning)
+        super().__init__(suppress_composition_warning, **orchestrator_options)
+        self.step_metrics_log_name = step_metrics_log_name
+        self.merge_metrics_log_name = merge_metrics_log_name
         self.log_transformers_output_keys = []
 
     def step_log(
@@ -101,16 +123,56 @@ class LogOrchestrator(Orchestrator):
                 )
 
             # now the output from the log transformer(s) can be loaded
-            for handle in self.handles:
-                self.steps.append(
-                    SimpleLoader(
-                        handle=handle,
-                        mode="append",
-                        dataset_input_keys=dataset_key_to_log,
-                    )
+            self.steps.append(
+                MultiSinkLoader(
+                    self.handles,
+                    mode="append",
+                    parallel=True,
+                    dataset_input_keys=dataset_key_to_log,
+                )
+            )
+
+        if not self.merge_metrics_log_name:
+            return self._etl_with_step_metrics(inputs)
+
+        merge_metrics = MergeMetricsCollector()
+        try:
+            with merge_metrics:
+                return self._etl_with_step_metrics(inputs)
+        finally:
+            if merge_metrics.results:
+                self._append_log(
+                    merge_metrics.to_dataframe(),
+                    self.merge_metrics_log_name,
+                    type(merge_metrics).__name__,
                 )
-
-        # finally execute the orchestrator as usual
-        return super().etl(inputs)
 
     execute = etl
+
+    def _etl_with_step_metrics(self, inputs: dataset_group) -> dataset_group:
+        if not self.step_metrics_log_name:
+            # finally execute the orchestrator as usual
+            return super().etl(inputs)
+
+        step_metrics = SparkStepMetrics(name=self.step_metrics_log_name)
+        self.hooks.append(step_metrics)
+        try:
+            return super().etl(inputs)
+        finally:
+            self.hooks.remove(step_metrics)
+            self._append_log(
+                step_metrics.to_dataframe(),
+                self.step_metrics_log_name,
+                type(step_metrics).__name__,
+            )
+
+    def _append_log(self, df_log: DataFrame, log_name: str, method_name: str) -> None:
+        # the metrics get the same log columns as the log transformers
+        df_log = df_log.select(
+            F.lit(str(uuid4())).alias("LogId"),
+            F.lit(log_name).alias("LogName"),
+            F.lit(datetime.utcnow()).cast("timestamp").alias("LogTimestamp"),
+            F.lit(method_name).alias("LogMethodName"),
+            *df_log.columns,
+        )
+        MultiSinkLoader(self.handles, mode="append", parallel=True).save(df_log)
@@ -1,20 +1,91 @@
+import contextlib
 import warnings
-from typing import List
+from typing import TYPE_CHECKING, List
 
+from pyspark import StorageLevel
+
+from .checkpoint import OrchestratorCheckpointException, StepCheckpoint
+from .dag import DagRunner
+from .instrumentation import StepHook
+from .lifecycle import DatasetLifecycle
+from .sampling import Sampling
 from .types import EtlBase, dataset_group
 
+if TYPE_CHECKING:  # these modules depend on this module
+    from spetlr.delta.snapshot import TableSnapshot
+
+    from .dry_run import DryRunReport
+    from .fingerprint import RunFingerprint
+
 
 class Orchestrator(EtlBase):
     """
     It is up to the user of this library that extractors,
     transformers and loaders live up to their names and are not
     used in a wrong order.
+
+    If parallel is set, the steps are executed concurrently on a thread pool
+    with at most max_workers threads, wherever the dataset keys that the steps
+    declare allow it. The resulting datasets are the same as in a sequential run.
+    Nested orchestrators and other steps that do not declare their keys run
+    alone. In this mode, extractors see no datasets in self.previous_extractions.
+
+    If persist_shared_datasets is set, every dataset that is read by more than one
+    later step is persisted with the given storage_level when it is produced, and
+    unpersisted when its last consumer has finished.
+
+    The hooks are called before and after every step, e.g. to record the spark
+    metrics of each step with the SparkStepMetrics hook.
+
+    If a RunFingerprint is given, the execution is skipped when none of the delta
+    tables that the extractors read has changed since the last successful run.
+
+    If a StepCheckpoint is given, the datasets are materialized after the designated
+    steps. A failed run that is executed again with the same run id resumes after
+    the last completed checkpoint. Checkpointing requires sequential execution.
+
+    If a sample_fraction is given, the extractors return only a deterministic
+    sample of their sources during the run, see spetlr.etl.sampling.
+
+    If a TableSnapshot is given, all delta tables are read at the versions of the
+    start of the run, see spetlr.delta.snapshot. The versions are available in
+    the snapshot after the run.
+
+    After a successful run, the extractors that keep track of what they have
+    extracted, see IncrementalExtractor and ChangeFeedExtractor, store their
+    progress. The extractors of a nested orchestrator store it only when the
+    outermost orchestrator has completed.
     """
 
-    def __init__(self, suppress_composition_warning=False):
+    def __init__(
+        self,
+        suppress_composition_warning=False,
+        *,
+        parallel: bool = False,
+        max_workers: int = None,
+        persist_shared_datasets: bool = False,
+        storage_level: StorageLevel = StorageLevel.MEMORY_AND_DISK,
+        hooks: List[StepHook] = None,
+        fingerprint: "RunFingerprint" = None,
+        checkpoint: StepCheckpoint = None,
+        sample_fraction: float = None,
+        snapshot: "TableSnapshot" = None,
+    ):
         super().__init__()
         self.steps: List[EtlBase] = []
         self.suppress_composition_warning = suppress_composition_warning
+        self.parallel = parallel
+        self.max_workers = max_workers
+        self.persist_shared_datasets = persist_shared_datasets
+        self.storage_level = storage_level
+        self.hooks: List[StepHook] = hooks or []
+        self.fingerprint = fingerprint
+        self.checkpoint = checkpoint
+        self.sample_fraction = sample_fraction
+        self.snapshot = snapshot
+        self._lifecycle: DatasetLifecycle = None
+        # set while the orchestrator runs as a step of another orchestrator
+        self._nested = False
 
     def step(self, etl: EtlBase) -> "Orchestrator":
         self.steps.append(etl)
@@ -33,8 +104,120 @@ class Orchestrator(EtlBase):
         if not self.steps:
             raise NotImplementedError("The orchestrator has no steps.")
 
-        # treat the fist step differently to warn in case the input was not handled
-        datasets = self.steps[0].etl(datasets)
+        if self.fingerprint and self.fingerprint.is_unchanged(self):
+            print(
+                "The sources of the orchestrator are unchanged since the last "
+                "successful run. Skipping execution."
+            )
+            return datasets
+
+        start = 0
+        if self.checkpoint:
+            if self.parallel:
+                raise OrchestratorCheckpointException(
+                    "Checkpointing is not supported in parallel mode."
+                )
+            restored = self.checkpoint.restore(self.steps)
+            if restored:
+                last_index, datasets = restored
+                start = last_index + 1
+
+        if self.persist_shared_datasets:
+            self._lifecycle = DatasetLifecycle(
+                self.steps, list(datasets), self.storage_level
+            )
+        nested = [step for step in self.steps if isinstance(step, Orchestrator)]
+        for step in nested:
+            step._nested = True
+        try:
+            with Sampling.fraction(self.sample_fraction), (
+                self.snapshot or contextlib.nullcontext()
+            ):
+                datasets = self._run_steps(inputs, datasets, start)
+        finally:
+            if self._lifecycle:
+                self._lifecycle.release_all()
+                self._lifecycle = None
+            for step in nested:
+                step._nested = False
+
+        if self.checkpoint and self.checkpoint.clear_on_success:
+            self.checkpoint.clear()
+        if self.fingerprint:
+            self.fingerprint.record()
+        if not self._nested:
+            self.commit_watermark()
+        return datasets
+
+    execute = etl
+
+    def commit_watermark(self) -> None:
+        """Store the progress of the extractors of the run, also in nested
+        orchestrators. Called when the outermost orchestrator has completed."""
+        for step in self.steps:
+            commit_watermark = getattr(step, "commit_watermark", None)
+            if commit_watermark:
+                commit_watermark()
+
+    def dry_run(self, inputs: dataset_group = None) -> "DryRunReport":
+        """Validate the orchestrator without processing any data.
+
+        All extracted datasets are replaced by empty dataframes with the same
+        schema, the transformers are applied to these, and the final schemas are
+        compared with the schemas of the loader targets. The loaders are not
+        executed. The returned report holds the issues that were found and the
+        sizes of the logical plans of every step."""
+        # the dry run module depends on this module
+        from .dry_run import dry_run
+
+        return dry_run(self.steps, inputs)
+
+    def _run_steps(
+        self, inputs: dataset_group, datasets: dataset_group, start: int = 0
+    ):
+        if self.parallel:
+            runner = DagRunner(
+                self._execute_step,
+                max_workers=self.max_workers,
+                on_first_step=lambda first: self._check_composition(inputs, first),
+            )
+            return runner.run(self.steps, datasets)
+
+        for index in range(start, len(self.steps)):
+            datasets = self._execute_step(index, self.steps[index], datasets)
+            if index == 0:
+                # warn after the first step in case the input was not handled
+                self._check_composition(inputs, datasets)
+
+            # a checkpoint after the last step would never be resumed from
+            if (
+                self.checkpoint
+                and index < len(self.steps) - 1
+                and self.checkpoint.should_save(index)
+            ):
+                datasets = self.checkpoint.save(index, self.steps[index], datasets)
+        return datasets
+
+    def _execute_step(
+        self, index: int, step: EtlBase, datasets: dataset_group
+    ) -> dataset_group:
+        hooks = list(self.hooks)
+        for hook in hooks:
+            hook.before_step(index, step)
+        try:
+            datasets = step.etl(datasets)
+        except BaseException as err:
+            for hook in reversed(hooks):
+                hook.after_step(index, step, err)
+            raise
+        for hook in reversed(hooks):
+            hook.after_step(index, step, None)
+
+        if self._lifecycle:
+            self._lifecycle.step_done(index, datasets)
+        return datasets
+
+    def _check_composition(self, inputs: dataset_group, datasets: dataset_group):
         if len(inputs) and (len(inputs) + 1 == len(datasets)):
             # There were inputs to the orchestrator,
             # and the first step did not clean them up.
@@ -55,9 +238,3 @@ class Orchestrator(EtlBase):
                     "Expect problems in your etl pipeline. To avoid this, "
                     "write extractors that clean up in self.previous_extractions"
                 )
-
-        for step in self.steps[1:]:
-            datasets = step.etl(datasets)
-        return datasets
-
-    execute = etl
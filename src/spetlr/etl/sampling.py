@@ -0,0 +1,101 @@
+"""
+Deterministic sampling of extracted datasets for development.
+
+When sampling is active, the extractors return only a fraction of the rows of
+their sources. A row is kept if the hash of its key columns falls below the
+fraction. Since the decision depends only on the key values, rows with the same
+keys are kept in all sampled datasets, and joins between the samples still match.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+import pyspark.sql.functions as F
+from pyspark.sql import DataFrame
+from pyspark.sql.types import MapType
+
+from spetlr.configurator.configurator import Configurator
+
+# the resolution of the sample fraction
+_BUCKETS = 1_000_000
+
+# the fraction of the current run. Other runs in the same process, e.g. entry
+# points that run concurrently, are not affected by it.
+_fraction_override: ContextVar[Optional[float]] = ContextVar(
+    "spetlr_sample_fraction", default=None
+)
+
+
+class Sampling:
+    """The sampling settings.
+
+    Sampling is active if a fraction below 1 is set for the current run with
+    Orchestrator(sample_fraction=...), or otherwise if a fraction is registered
+    in the Configurator under the key SAMPLE_FRACTION. With a release and a debug
+    value, the Configurator debug flag selects whether sampling is active:
+
+        SAMPLE_FRACTION:
+          release: ""
+          debug: "0.01"
+    """
+
+    configurator_key = "SAMPLE_FRACTION"
+
+    @classmethod
+    def get_fraction(cls) -> Optional[float]:
+        """The active sample fraction, or None if sampling is not active."""
+        fraction = _fraction_override.get()
+        if fraction is None:
+            tc = Configurator()
+            value = (
+                tc.get(cls.configurator_key, default=None)
+                if cls.configurator_key in tc.all_keys()
+                else None
+            )
+            fraction = float(value) if value not in (None, "") else None
+
+        if fraction is None or fraction >= 1:
+            return None
+        return fraction
+
+    @classmethod
+    @contextmanager
+    def fraction(cls, fraction: Optional[float]) -> Iterator[None]:
+        """Set the sample fraction for the duration of the context.
+        With None, the current setting is kept. The fraction applies to the
+        current thread, and to the threads that run in a copy of its context."""
+        if fraction is None:
+            yield
+            return
+
+        token = _fraction_override.set(fraction)
+        try:
+            yield
+        finally:
+            _fraction_override.reset(token)
+
+
+def sample(df: DataFrame, key_cols: List[str] = None, seed: int = 0) -> DataFrame:
+    """Return the deterministic sample of the dataframe if sampling is active,
+    otherwise the dataframe itself.
+
+    The key columns are hashed as strings, so that keys of different numeric
+    types in different tables are sampled alike. Without key columns, all columns
+    that can be hashed are used, which gives a stable but not join-consistent
+    sample."""
+    fraction = Sampling.get_fraction()
+    if fraction is None:
+        return df
+
+    if not key_cols:
+        key_cols = [
+            field.name
+            for field in df.schema.fields
+            if not isinstance(field.dataType, MapType)
+        ]
+
+    bucket = F.pmod(
+        F.xxhash64(*[F.col(col).cast("string") for col in key_cols], F.lit(seed)),
+        F.lit(_BUCKETS),
+    )
+    return df.where(bucket < F.lit(int(fraction * _BUCKETS)))
@@ -50,10 +50,11 @@ def drop_table_cascade(DBDotTableName: str) -> None:
             f"The table {DBDotTableName} not found. Remember syntax db.tablename."
         )
 
+    # avoid a circular import, spetlr.delta uses this module
+    from spetlr.delta.metadata_cache import TableMetadataCache
+
     # Get table path
-    table_path = str(
-        Spark.get().sql(f"DESCRIBE DETAIL {DBDotTableName}").collect()[0]["location"]
-    )
+    table_path = str(TableMetadataCache.get(DBDotTableName).location)
 
     if table_path is None:
         raise NoTableException("Table path is NONE.")
@@ -63,6 +64,7 @@ def drop_table_cascade(DBDotTableName: str) -> None:
 
     # Remove table
     Spark.get().sql(f"DROP TABLE IF EXISTS {DBDotTableName}")
+    TableMetadataCache.invalidate(DBDotTableName)
 
 
 def get_unique_tempview_name() -> str:
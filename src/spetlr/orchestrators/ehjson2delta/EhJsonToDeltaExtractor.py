@@ -1,9 +1,8 @@
 from datetime import datetime as dt
 from datetime import timezone
-from typing import List, Optional
+from typing import List
 
 from pyspark.sql import DataFrame
-from pyspark.sql import functions as f
 
 from spetlr.delta import DeltaHandle
 from spetlr.eh.EventHubCaptureExtractor import EventHubCaptureExtractor
@@ -37,13 +36,14 @@ class EhJsonToDeltaExtractor(Extractor):
         # assert correct schema
         assert pdate_df.schema.fields[0].dataType.typeName().upper() == "TIMESTAMP"
 
-        max_pdate: Optional[dt] = pdate_df.groupBy().agg(f.max("pdate")).collect()[0][0]
-        if max_pdate is None:
+        # the partitions are known from the delta transaction log
+        latest = self.dh.get_latest_partition()
+        if latest is None:
             # if it is None, no previous data exists,
             # so don't truncate and read everything
             return self.eh.read()
 
-        max_pdate = max_pdate.astimezone(timezone.utc)
+        max_pdate: dt = latest["pdate"].astimezone(timezone.utc)
 
         # truncate this largest partition...
         self._delete_table_partitions(
@@ -76,34 +76,23 @@ class EhJsonToDeltaExtractor(Extractor):
 
         dh_parts = self.dh.get_partitioning()
 
-        # this df will be filtered stepwise
-        df = self.dh.read()
-
         # assert partitioning columns are all integers
-        for field in df.select(*dh_parts).schema.fields:
+        for field in self.dh.read().select(*dh_parts).schema.fields:
             assert field.dataType.typeName().upper() == "INTEGER"
 
-        y = df.groupBy().agg(f.max("y")).collect()[0][0]
-        if y is None:
+        # the greatest partition is known from the delta transaction log
+        latest = self.dh.get_latest_partition()
+        if latest is None:
             # if it is None, no previous data exists,
             # so don't truncate and read everything
             return self.eh.read()
 
-        # continue the logic. We know there is a partition.
-        truncate_partiton_spec = [f"y={y}"]
-        df = df.filter(f"y={y}")
-
-        # if there was a y, there is a partition and hence the others must exist
-        m = df.groupBy().agg(f.max("m")).collect()[0][0]
-        truncate_partiton_spec.append(f"m={m}")
-        df = df.filter(f"m={m}")
-
-        d = df.groupBy().agg(f.max("d")).collect()[0][0]
-        truncate_partiton_spec.append(f"d={d}")
-        df = df.filter(f"d={d}")
+        # We know there is a partition, and hence all its parts exist.
+        y, m, d = latest["y"], latest["m"], latest["d"]
+        truncate_partiton_spec = [f"y={y}", f"m={m}", f"d={d}"]
 
         if "h" in dh_parts:
-            h = df.groupBy().agg(f.max("h")).collect()[0][0]
+            h = latest["h"]
             truncate_partiton_spec.append(f"h={h}")
         else:
             h = 0
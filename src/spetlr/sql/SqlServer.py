@@ -14,7 +14,7 @@ from spetlr.spark import Spark
 from spetlr.sql.sql_handle import SqlHandle
 from spetlr.sql.SqlBaseServer import SqlBaseServer
 from spetlr.sql.SqlServerBaseOptions import SqlServerBaseOptions
-from spetlr.utils import GetMergeStatement
+from spetlr.utils import GetMergeStatement, WriteSizing
 
 
 class SqlServer(SqlBaseServer):
@@ -30,11 +30,20 @@ class SqlServer(SqlBaseServer):
         spnid: str = None,
         spnpassword: str = None,
         options: SqlServerBaseOptions = None,
+        write_sizing: WriteSizing = None,
     ):
         """Create object to interact with sql servers. Pass all but
         connection_string to connect via values or pass only the
-        connection_string as a keyword param to connect via connection string"""
+        connection_string as a keyword param to connect via connection string.
+        The write_sizing decides the number of connections that tables are
+        written with. By default, one per 128MB of estimated data, up to 60."""
         self.options = options or SqlServerBaseOptions()
+        self.write_sizing = write_sizing or WriteSizing(
+            target_bytes=128 * 1024**2,
+            max_partitions=60,
+            default_partitions=60,
+            shuffle=True,
+        )
         self._use_builtin_driver = Spark.version() >= Spark.DATABRICKS_RUNTIME_11_3
 
         if connection_string is not None:
@@ -203,11 +212,20 @@ class SqlServer(SqlBaseServer):
         append: bool = False,
         big_data_set: bool = True,
         batch_size: int = 10 * 1024,
-        partition_count: int = 60,
+        partition_count: int = None,
+        write_sizing: WriteSizing = None,
     ):
+        """Every partition of the written dataframe is a connection to the server.
+        A given partition_count is used as is, else the count is chosen by the
+        write_sizing, or the write_sizing of the server."""
         self.test_odbc_connection()
 
-        writer = df_source.repartition(partition_count).write
+        if partition_count is not None:
+            df_source = df_source.repartition(partition_count)
+        else:
+            df_source = (write_sizing or self.write_sizing).apply(df_source)
+
+        writer = df_source.write
         if self._use_builtin_driver:
             writer = self._add_sqlserver_auth(writer.format("sqlserver"))
         else:
@@ -241,6 +259,7 @@ class SqlServer(SqlBaseServer):
         big_data_set: bool = True,
         batch_size: int = 10 * 1024,
         partition_count: int = 60,
+        merge_mode: str = "upsert",
     ):
         if df_source is None:
             return None
@@ -296,6 +315,7 @@ class SqlServer(SqlBaseServer):
                 join_cols=join_cols,
                 insert_cols=df_source.columns,
                 update_cols=df_source.columns,
+                merge_mode=merge_mode,
             )
 
             conn.execute(mergeQuery)
@@ -376,7 +396,7 @@ class SqlServer(SqlBaseServer):
         append: bool = False,
         big_data_set: bool = True,
         batch_size: int = 10 * 1024,
-        partition_count: int = 60,
+        partition_count: int = None,
     ):
         self.write_table_by_name(
             df_source,
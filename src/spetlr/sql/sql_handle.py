@@ -6,6 +6,7 @@ from pyspark.sql import DataFrame
 from spetlr.exceptions import SpetlrException
 from spetlr.sql.SqlBaseServer import SqlBaseServer
 from spetlr.tables.TableHandle import TableHandle
+from spetlr.utils.WriteSizing import WriteSizing
 
 
 class SqlHandleException(SpetlrException):
@@ -21,9 +22,14 @@ class SqlHandleInvalidFormat(SqlHandleException):
 
 
 class SqlHandle(TableHandle):
-    def __init__(self, name: str, sql_server: SqlBaseServer):
+    def __init__(
+        self, name: str, sql_server: SqlBaseServer, write_sizing: WriteSizing = None
+    ):
+        """The write_sizing overrides the write sizing of the sql server
+        for this table."""
         self._name = name
         self._sql_server = sql_server
+        self._write_sizing = write_sizing
 
         self._validate()
 
@@ -49,17 +55,26 @@ class SqlHandle(TableHandle):
         append = True if mode == "append" else False
 
         return self._sql_server.write_table_by_name(
-            df_source=df, table_name=self._name, append=append
+            df_source=df,
+            table_name=self._name,
+            append=append,
+            write_sizing=self._write_sizing,
         )
 
     def overwrite(self, df: DataFrame) -> None:
         return self._sql_server.write_table_by_name(
-            df_source=df, table_name=self._name, append=False
+            df_source=df,
+            table_name=self._name,
+            append=False,
+            write_sizing=self._write_sizing,
         )
 
     def append(self, df: DataFrame) -> None:
         return self._sql_server.write_table_by_name(
-            df_source=df, table_name=self._name, append=True
+            df_source=df,
+            table_name=self._name,
+            append=True,
+            write_sizing=self._write_sizing,
         )
 
     def upsert(self, df: DataFrame, join_cols: List[str]) -> Union[DataFrame, None]:
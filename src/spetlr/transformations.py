@@ -4,8 +4,9 @@ from typing import List
 import pyspark.sql.functions as F
 from pyspark.sql import DataFrame, Window
 
+from spetlr.delta import DeltaHandle
+from spetlr.delta.merge_engine import MergeResult
 from spetlr.exceptions import NoTableException
-from spetlr.functions import get_unique_tempview_name
 from spetlr.spark import Spark
 
 
@@ -242,17 +243,18 @@ def merge_df_into_target(
     database_name: str,
     join_cols: List[str],
     table_format: str = "Delta",
-) -> None:
+) -> MergeResult:
     """
 
-    Merges a databricks dataframe into a target database table
+    Merges a databricks dataframe into a target database table.
+    The strategy is chosen as in DeltaHandle.merge, whose result is returned.
 
     :param df: The dataframe
     :param table_name: The name of the table which the dataframe (p1)
         should be merged into
     :param database_name: The database name associated with the table
     :param join_cols: A list of strings which tells which columns to join on
-    :param table_format: The format of the table
+    :param table_format: The format of the table, only delta is supported
 
     """
 
@@ -273,81 +275,10 @@ def merge_df_into_target(
         )
         df = df.filter(" AND ".join(f"({col} is NOT NULL)" for col in join_cols))
 
-    df_target = Spark.get().table(target_table_name)
-
-    # If the target is empty, always do faster full load
-    if len(df_target.take(1)) == 0:
-        return (
-            df.write.format(table_format)
-            .mode("overwrite")
-            .saveAsTable(target_table_name)
-        )  # Consider use .save instead
-
-    # Find records that need to be updated in the target (happens seldom)
-
-    # Define the column to be used for checking for new rows
-    # Checking the null-ness of one right row is sufficient to mark the row as new,
-    # since null keys are disallowed.
-    key_col = join_cols[-1]
-
-    # Write the filtering string including casting maps to strings
-    filter_string = f"{key_col} IS NULL"
-    for col, col_typ in df.dtypes:
-        if col not in join_cols:
-            if col_typ == "map":
-                filter_string += (
-                    f" OR (CAST(a.{col} AS varchar) <> CAST(b.{col} AS varchar))"
-                )
-            else:
-                filter_string += f" OR (a.{col} <> b.{col})"
-                filter_string += f" OR (a.{col} IS NULL AND b.{col} IS NOT NULL)"
-                filter_string += f" OR (a.{col} IS NOT NULL AND b.{col} IS NULL)"
-
-    df = (
-        df.alias("a")
-        .join(
-            df_target.alias("b").select(
-                "b.*", F.col(f"b.{key_col}").alias(f"{key_col}_copy")
-            ),
-            on=join_cols,
-            how="left",
-        )
-        .filter(filter_string)
-        .withColumn(
-            "is_new",
-            F.when(F.col(f"{key_col}_copy").isNull(), True).otherwise(False),
-        )
-        .select("a.*", "is_new")
-        .cache()
+    return DeltaHandle(target_table_name, data_format=table_format.lower()).merge(
+        df, join_cols
     )
 
-    # If merge is not required, the data can just be appended
-    merge_required = len(df.filter(~F.col("is_new")).take(1)) > 0
-    df = df.drop("is_new")
-
-    if not merge_required:
-        return (
-            df.write.format(table_format).mode("append").saveAsTable(target_table_name)
-        )  # Consider use .save instead
-
-    temp_view_name = get_unique_tempview_name()
-    df.createOrReplaceTempView(temp_view_name)
-
-    merge_sql_statement = f"""
-        MERGE INTO {target_table_name} AS target
-        USING {temp_view_name} as source
-        ON
-        {" AND ".join(f"(source.{col} = target.{col})" for col in join_cols)}
-        WHEN MATCHED
-        THEN UPDATE -- update existing records
-        SET
-        *
-        WHEN NOT MATCHED
-        THEN INSERT -- insert new records
-        *
-        """
-    Spark.get().sql(merge_sql_statement)
-
 
 def concat_dfs(dfs: List[DataFrame]):
     """
@@ -1,8 +1,15 @@
-from typing import List
+from typing import List, Optional
 
 import pyspark.sql.functions as f
 from pyspark.sql import DataFrame
 
+from spetlr.utils.RowFingerprint import (
+    FINGERPRINT_COL,
+    AddRowFingerprint,
+    FingerprintColumns,
+    RowFingerprint,
+)
+
 
 def CheckDfMerge(
     *,
@@ -10,44 +17,60 @@ def CheckDfMerge(
     df_target: DataFrame,
     join_cols: List[str],
     avoid_cols: List[str],
+    persisted: Optional[List[DataFrame]] = None,
 ):
     """This logic optimizes data load of dataframe, df, into a target table, df_target.
     it checks whether a merge is needed.
     If it is not needed, a simple insert is executed.
+
+    Changed rows are found by comparing a single fingerprint of the non-key columns,
+    see RowFingerprint. If the target has the column _spetlr_fingerprint, the
+    fingerprint of the incoming rows is added to df in this column, and the stored
+    fingerprint of the target rows is used instead of hashing the target.
+
+    The comparison result is cached. If a list is given as persisted, the cached
+    dataframe is added to it, so that the caller can unpersist it after the load.
     """
 
     key_col = join_cols[-1]
 
-    # Write the filtering string including casting maps to strings
-    filter_string = f"b.{key_col} IS NULL"
-    for col, col_typ in df.dtypes:
-        if col not in join_cols + avoid_cols:
-            if col_typ == "map":
-                filter_string += (
-                    f" OR (CAST(a.{col} AS varchar) <> CAST(b.{col} AS varchar))"
-                )
-            else:
-                filter_string += f" OR (a.{col} <> b.{col})"
-                filter_string += f" OR (a.{col} IS NULL AND b.{col} IS NOT NULL)"
-                filter_string += f" OR (a.{col} IS NOT NULL AND b.{col} IS NULL)"
+    if FINGERPRINT_COL in df_target.columns:
+        df = AddRowFingerprint(df, join_cols, avoid_cols)
+        df_fingerprint = f.col(FINGERPRINT_COL)
+        target_fingerprint = f.col(FINGERPRINT_COL)
+    else:
+        compare_cols = FingerprintColumns(df, join_cols, avoid_cols)
+        df_fingerprint = RowFingerprint(df, compare_cols)
+        # hash the target values as if they had the types of the incoming values
+        target_fingerprint = RowFingerprint(
+            df_target, compare_cols, [df.schema[col].dataType for col in compare_cols]
+        )
 
     # The following compares the df and df_target to check if any merging is required.
     #
     df = (
-        df.alias("a")
+        df.select("*", df_fingerprint.alias("__fingerprint"))
+        .alias("a")
         .join(
-            df_target.alias("b").select(
-                "b.*", f.col(f"b.{key_col}").alias(f"{key_col}_copy")
-            ),
+            df_target.select(
+                *join_cols,
+                f.col(key_col).alias(f"{key_col}_copy"),
+                target_fingerprint.alias("__target_fingerprint"),
+            ).alias("b"),
             on=join_cols,
             how="left",
         )
-        .filter(filter_string)
+        .filter(
+            f.col(f"b.{key_col}_copy").isNull()
+            # target rows without a stored fingerprint count as changed
+            | ~f.col("a.__fingerprint").eqNullSafe(f.col("b.__target_fingerprint"))
+        )
         .withColumn(
             "is_new",
             f.when(f.col(f"{key_col}_copy").isNull(), True).otherwise(False),
         )
         .select("a.*", "is_new")
+        .drop("__fingerprint")
         .cache()
     )
 
@@ -56,6 +79,8 @@ def CheckDfMerge(
     # note: inserts alone happen almost always and can use "append",
     # which is much faster than merge
     merge_required = len(df.filter(~f.col("is_new")).take(1)) > 0
+    if persisted is not None:
+        persisted.append(df)
     df = df.drop("is_new")
 
     return df, merge_required
@@ -1,4 +1,10 @@
-from typing import List
+from typing import List, Set
+
+from pyspark.sql.types import ArrayType, DataType, MapType, StructType
+
+from spetlr.utils.RowFingerprint import FINGERPRINT_COL
+
+MERGE_MODES = {"upsert", "upsert_changed", "insert"}
 
 
 def GetMergeStatement(
@@ -10,19 +16,53 @@ def GetMergeStatement(
     insert_cols: List[str] = None,
     update_cols: List[str] = None,
     special_update_set: str = None,
+    target_filter: str = None,
+    merge_mode: str = "upsert",
+    target_schema: StructType = None,
 ) -> str:
+    """The target_filter is an additional condition on the target rows, which is
+    added to the ON clause, e.g. to restrict the merge to the relevant partitions.
+
+    The merge_mode is one of
+    - "upsert": matched rows are updated and new rows are inserted.
+    - "upsert_changed": like upsert, but matched rows are only updated if any of
+      the update columns differ, where null equals null. If the fingerprint column
+      _spetlr_fingerprint is an update column, only the fingerprints are compared.
+      Unchanged rows are not rewritten.
+    - "insert": only new rows are inserted, the update columns are ignored.
+
+    Spark cannot compare maps, so in the "upsert_changed" mode of a delta merge,
+    the update columns whose types contain maps are compared by their json. Maps
+    with the same entries in a different order therefore count as changed. These
+    columns are found in the target_schema, which is looked up in the metadata
+    cache of the target table if it is not given.
+    """
     assert merge_statement_type in {"delta", "sql"}
+    assert merge_mode in MERGE_MODES
+
+    on_conditions = [f"(source.{col} = target.{col})" for col in join_cols]
+    if target_filter:
+        on_conditions.append(f"({target_filter})")
 
     merge_sql_statement = (
         f"MERGE {'INTO ' if merge_statement_type == 'delta' else ''}"
         f"{target_table_name} AS target "
         f"USING {source_table_name} AS source "
-        f"ON {' AND '.join(f'(source.{col} = target.{col})' for col in join_cols)} "
+        f"ON {' AND '.join(on_conditions)} "
     )
 
-    if update_cols and len(update_cols) > 0:
+    if update_cols and len(update_cols) > 0 and merge_mode != "insert":
+        merge_sql_statement += "WHEN MATCHED "
+        if merge_mode == "upsert_changed":
+            merge_sql_statement += (
+                "AND "
+                + _changed_condition(
+                    merge_statement_type, target_table_name, update_cols, target_schema
+                )
+                + " "
+            )
         merge_sql_statement += (
-            "WHEN MATCHED THEN UPDATE "
+            "THEN UPDATE "
             f"SET {', '.join(f'target.{col} = source.{col}' for col in update_cols)}"
         )
 
@@ -42,3 +82,59 @@ def GetMergeStatement(
     merge_sql_statement = merge_sql_statement.strip() + ";"
 
     return merge_sql_statement
+
+
+def _changed_condition(
+    merge_statement_type: str,
+    target_table_name: str,
+    update_cols: List[str],
+    target_schema: StructType = None,
+) -> str:
+    """A null-safe condition that is true if the source and target rows differ
+    in any of the update columns."""
+    compare_cols = [FINGERPRINT_COL] if FINGERPRINT_COL in update_cols else update_cols
+
+    if merge_statement_type == "delta":
+        map_cols = set()
+        if compare_cols != [FINGERPRINT_COL]:
+            map_cols = _map_columns(target_table_name, target_schema)
+        return (
+            "NOT ("
+            + " AND ".join(
+                f"to_json(source.{col}) <=> to_json(target.{col})"
+                if col.lower() in map_cols
+                else f"source.{col} <=> target.{col}"
+                for col in compare_cols
+            )
+            + ")"
+        )
+
+    # T-SQL has no null-safe comparison operator, but EXCEPT treats nulls as equal
+    return (
+        f"EXISTS (SELECT {', '.join(f'source.{col}' for col in compare_cols)} "
+        f"EXCEPT SELECT {', '.join(f'target.{col}' for col in compare_cols)})"
+    )
+
+
+def _map_columns(target_table_name: str, target_schema: StructType = None) -> Set[str]:
+    """The lower-case names of the columns of the target whose types contain maps."""
+    if target_schema is None:
+        # avoid a circular import, spetlr.delta uses this module
+        from spetlr.delta.metadata_cache import TableMetadataCache
+
+        target_schema = TableMetadataCache.get(target_table_name).schema
+    return {
+        field.name.lower()
+        for field in target_schema.fields
+        if _contains_map(field.dataType)
+    }
+
+
+def _contains_map(data_type: DataType) -> bool:
+    if isinstance(data_type, MapType):
+        return True
+    if isinstance(data_type, ArrayType):
+        return _contains_map(data_type.elementType)
+    if isinstance(data_type, StructType):
+        return any(_contains_map(field.dataType) for field in data_type.fields)
+    return False
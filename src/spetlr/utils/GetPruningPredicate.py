@@ -0,0 +1,84 @@
+from typing import List, Optional
+
+import pyspark.sql.functions as f
+from pyspark.sql import DataFrame
+from pyspark.sql.types import (
+    BooleanType,
+    DateType,
+    NumericType,
+    StringType,
+    TimestampType,
+)
+
+# the types that can be compared by min and max and written as literals
+_RANGE_TYPES = (NumericType, StringType, DateType, TimestampType, BooleanType)
+
+
+def GetPruningPredicate(
+    *,
+    df: DataFrame,
+    join_cols: List[str],
+    partition_cols: List[str] = None,
+    alias: str = None,
+    max_partition_values: int = 100,
+) -> Optional[str]:
+    """Derive a predicate on the target of an upsert from the incoming rows in df.
+
+    Every target row that matches an incoming row on the join columns fulfills
+    the predicate, so the predicate can be added to the join or MERGE condition
+    to let delta skip the files and partitions that cannot match. It consists of
+
+    - the range from min to max of every join column,
+    - the distinct values of every partition column that is also a join column,
+      as long as there are at most max_partition_values of them.
+
+    Partition columns that are not join columns are not used, since a matching
+    target row may be in any partition. The values are compared as literals of
+    the column types, so the predicate only needs a single aggregation of df.
+    Returns None if no predicate could be derived, e.g. for an empty df.
+    If an alias is given, the columns are prefixed with it.
+    """
+    prefix = f"{alias}." if alias else ""
+    types = {field.name: field.dataType for field in df.schema.fields}
+
+    range_cols = [col for col in join_cols if isinstance(types[col], _RANGE_TYPES)]
+    in_cols = [col for col in partition_cols or [] if col in join_cols]
+    if not range_cols and not in_cols:
+        return None
+
+    aggregations = []
+    for col in range_cols:
+        aggregations.append(f.min(col).cast("string").alias(f"min_{col}"))
+        aggregations.append(f.max(col).cast("string").alias(f"max_{col}"))
+    for col in in_cols:
+        aggregations.append(
+            f.collect_set(f.col(col).cast("string")).alias(f"values_{col}")
+        )
+    (row,) = df.agg(*aggregations).collect()
+
+    predicates = []
+    for col in range_cols:
+        low, high = row[f"min_{col}"], row[f"max_{col}"]
+        if low is None:
+            # there are no incoming rows with non-null keys
+            return None
+        predicates.append(
+            f"({prefix}{col} BETWEEN {_literal(low, types[col])} "
+            f"AND {_literal(high, types[col])})"
+        )
+    for col in in_cols:
+        values = row[f"values_{col}"]
+        if not values or len(values) > max_partition_values:
+            continue
+        literals = ", ".join(_literal(value, types[col]) for value in sorted(values))
+        predicates.append(f"({prefix}{col} IN ({literals}))")
+
+    return " AND ".join(predicates) or None
+
+
+def _literal(value: str, data_type) -> str:
+    """A sql literal of the given type from its string representation."""
+    escaped = value.replace("\\", "\\\\").replace("'", "\\'")
+    if isinstance(data_type, StringType):
+        return f"'{escaped}'"
+    return f"CAST('{escaped}' AS {data_type.simpleString()})"
@@ -0,0 +1,97 @@
+from typing import List
+
+import pyspark.sql.functions as f
+from pyspark.sql import Column, DataFrame
+from pyspark.sql.types import ArrayType, DataType, MapType, StructType
+
+# If a target table has a BIGINT column with this name, the fingerprint of its
+# rows is stored in it, so that only the incoming rows need to be hashed.
+FINGERPRINT_COL = "_spetlr_fingerprint"
+
+
+def RowFingerprint(
+    df: DataFrame, cols: List[str], types: List[DataType] = None
+) -> Column:
+    """A null-safe 64-bit xxhash64 fingerprint of the given columns of df.
+
+    Two rows have the same fingerprint if all the columns are equal, where null
+    equals null. xxhash64 skips null values, also in struct fields and array
+    elements, so every value is accompanied by its null-ness, down to the nested
+    fields and elements. A null in one place can therefore not be confused with a
+    null in another place, nor with a missing array element. Maps are hashed as
+    their entries sorted by key, also when nested in arrays and structs, so the
+    fingerprint does not depend on the order of the map entries.
+
+    If types are given, the columns are cast to these types before hashing. This
+    gives equal fingerprints for tables that store the same values in different
+    types.
+    """
+    fields = {field.name: field.dataType for field in df.schema.fields}
+    types = types or [fields[col] for col in cols]
+
+    parts = []
+    for col, data_type in zip(cols, types):
+        column = df[col]
+        if data_type != fields[col]:
+            column = column.cast(data_type)
+        parts.append(column.isNull())
+        parts.append(_canonical(column, data_type))
+
+    return f.xxhash64(*parts)
+
+
+def AddRowFingerprint(
+    df: DataFrame, join_cols: List[str], avoid_cols: List[str] = None
+) -> DataFrame:
+    """Add the fingerprint of all columns of df, except the join columns and the
+    avoided columns, as the column _spetlr_fingerprint."""
+    return df.withColumn(
+        FINGERPRINT_COL,
+        RowFingerprint(df, FingerprintColumns(df, join_cols, avoid_cols)),
+    )
+
+
+def FingerprintColumns(
+    df: DataFrame, join_cols: List[str], avoid_cols: List[str] = None
+) -> List[str]:
+    """The columns of df that are compared by their fingerprint in an upsert."""
+    excluded = set(join_cols) | set(avoid_cols or []) | {FINGERPRINT_COL}
+    return [col for col in df.columns if col not in excluded]
+
+
+def _canonical(column: Column, data_type: DataType) -> Column:
+    """Every nested value is paired with its null-ness, and maps, which cannot be
+    hashed, are replaced by their sorted entries. Other types are hashed as is."""
+    if isinstance(data_type, MapType):
+        return f.array_sort(
+            f.transform(
+                f.map_entries(column),
+                lambda entry: f.struct(
+                    _canonical(entry["key"], data_type.keyType).alias("key"),
+                    _flagged(entry["value"], data_type.valueType).alias("value"),
+                ),
+            )
+        )
+    if isinstance(data_type, ArrayType):
+        return f.transform(
+            column, lambda element: _flagged(element, data_type.elementType)
+        )
+    if isinstance(data_type, StructType):
+        return f.when(
+            column.isNotNull(),
+            f.struct(
+                *[
+                    _flagged(column[field.name], field.dataType).alias(field.name)
+                    for field in data_type.fields
+                ]
+            ),
+        )
+    return column
+
+
+def _flagged(column: Column, data_type: DataType) -> Column:
+    """The null-ness of a nested value and its canonical form."""
+    return f.struct(
+        column.isNull().alias("isNull"),
+        _canonical(column, data_type).alias("value"),
+    )
@@ -0,0 +1,108 @@
+import math
+from dataclasses import dataclass
+from typing import List, Optional
+
+import pyspark.sql.functions as f
+from py4j.protocol import Py4JError
+from pyspark.sql import DataFrame
+from pyspark.sql.types import MapType
+
+from spetlr.spark import Spark
+
+
+def EstimateSizeInBytes(df: DataFrame) -> Optional[int]:
+    """
+    The size of the rows of df as estimated by the optimized plan, without
+    executing it.
+
+    The estimate is the size of the rows in memory, which is typically several
+    times the size of the compressed files that hold them. Spark does not shrink
+    the estimate for filters unless the cost based optimizer has column statistics,
+    so it is an upper bound after selective transformations.
+
+    return: The estimate in bytes, or None if spark has no estimate for the plan.
+    """
+    try:
+        stats = df._jdf.queryExecution().optimizedPlan().stats()
+        size = int(str(stats.sizeInBytes()))
+    except (Py4JError, AttributeError, ValueError):
+        return None
+
+    # plans without statistics, e.g. from jdbc or python rows, get the default
+    default = int(
+        Spark.get().conf.get("spark.sql.defaultSizeInBytes", str(2**63 - 1))
+    )
+    if size <= 0 or size >= default:
+        return None
+    return size
+
+
+@dataclass
+class WriteSizing:
+    """
+    A policy for the number of partitions that a dataframe is written with, and
+    thereby the number of files or of parallel database connections.
+
+    The count is the estimated size of the rows divided by target_bytes, limited by
+    min_partitions and max_partitions. If the plan has no size estimate,
+    default_partitions is used, or the partitioning is kept if it is None.
+
+    When the rows are written to a partitioned table, they are repartitioned into
+    the chosen count by the partition columns and a salt. The salt is a hash of the
+    row in partition_buckets buckets, by default the chosen count, so that a large
+    table partition is written by several tasks. A table partition is written as at
+    most partition_buckets files, also if it is small. With partition_buckets=1,
+    every table partition is written by one task. Else, with shuffle, the rows are
+    repartitioned into exactly the chosen count, and without it, partitions are
+    only merged by coalesce, which avoids a shuffle but never increases the count.
+
+    param target_bytes: The estimated size of the rows per partition. See
+        EstimateSizeInBytes for how the estimate relates to the file size.
+    """
+
+    target_bytes: int = 512 * 1024**2
+    min_partitions: int = 1
+    max_partitions: Optional[int] = None
+    default_partitions: Optional[int] = None
+    shuffle: bool = False
+    partition_buckets: Optional[int] = None
+
+    def partition_count(self, df: DataFrame) -> Optional[int]:
+        """The number of partitions for df, or None to keep its partitioning."""
+        size = EstimateSizeInBytes(df)
+        if size is None:
+            return self.default_partitions
+
+        count = max(self.min_partitions, math.ceil(size / self.target_bytes))
+        if self.max_partitions:
+            count = min(count, self.max_partitions)
+        return count
+
+    def apply(self, df: DataFrame, partition_cols: List[str] = None) -> DataFrame:
+        """Partition df for writing by this policy."""
+        if df.isStreaming:
+            return df
+
+        count = self.partition_count(df)
+        if count is None:
+            return df
+
+        if partition_cols:
+            return df.repartition(
+                count, *partition_cols, self._salt(df, self.partition_buckets or count)
+            )
+        if self.shuffle:
+            return df.repartition(count)
+        return df.coalesce(count)
+
+    @staticmethod
+    def _salt(df: DataFrame, buckets: int):
+        # deterministic, so that a retried task receives the same rows
+        hashable = [
+            f.col(field.name)
+            for field in df.schema.fields
+            if not isinstance(field.dataType, MapType)
+        ]
+        if buckets <= 1 or not hashable:
+            return f.lit(0)
+        return f.pmod(f.xxhash64(*hashable), f.lit(buckets))
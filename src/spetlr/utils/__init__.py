@@ -2,16 +2,24 @@ from .DataframeCreator import DataframeCreator
 from .DeleteMismatchedSchemas import DeleteMismatchedSchemas
 from .DropOldestDuplicates import DropOldestDuplicates
 from .GetMergeStatement import GetMergeStatement
+from .GetPruningPredicate import GetPruningPredicate
 from .MockExtractor import MockExtractor
 from .MockLoader import MockLoader
+from .RowFingerprint import AddRowFingerprint, RowFingerprint
 from .SelectAndCastColumns import SelectAndCastColumns
+from .WriteSizing import EstimateSizeInBytes, WriteSizing
 
 __all__ = [
     DataframeCreator,
     MockLoader,
     GetMergeStatement,
+    GetPruningPredicate,
+    RowFingerprint,
+    AddRowFingerprint,
     MockExtractor,
     DropOldestDuplicates,
     SelectAndCastColumns,
     DeleteMismatchedSchemas,
+    WriteSizing,
+    EstimateSizeInBytes,
 ]
@@ -0,0 +1,103 @@
+import unittest
+
+from pyspark.sql import functions as f
+from pyspark.sql.dataframe import DataFrame
+
+from spetlr import Configurator
+from spetlr.cache import CachedLoader, CachedLoaderParameters
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.spark import Spark
+
+
+class IncrementalCacher(CachedLoader):
+    to_be_written: DataFrame
+    to_be_deleted: DataFrame
+
+    def write_operation(self, df: DataFrame):
+        self.to_be_written = df
+        return df.withColumn("myId", f.lit(1))
+
+    def delete_operation(self, df: DataFrame) -> DataFrame:
+        self.to_be_deleted = df
+        return df
+
+
+class IncrementalCachedLoaderTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register(
+            "IncrementalCacheDb",
+            dict(name="inccache{ID}", path="/tmp/inccache{ID}.db"),
+        )
+        tc.register(
+            "IncrementalCache",
+            dict(
+                name="{IncrementalCacheDb}.cache",
+                path="{IncrementalCacheDb_path}/cache",
+            ),
+        )
+        DbHandle.from_tc("IncrementalCacheDb").create()
+        Spark.get().sql(
+            """
+            CREATE TABLE {IncrementalCache_name}
+            (
+                a STRING,
+                b INTEGER,
+                rowHash INTEGER,
+                loadedTime TIMESTAMP,
+                deletedTime TIMESTAMP,
+                myId INTEGER
+            )
+            USING DELTA
+            LOCATION "{IncrementalCache_path}"
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+
+        cls.sut = IncrementalCacher(
+            CachedLoaderParameters(
+                cache_table_name=tc.table_name("IncrementalCache"),
+                key_cols=["a"],
+                cache_id_cols=["myId"],
+                incremental_input=True,
+                tombstone_col="isDeleted",
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("IncrementalCacheDb").drop_cascade()
+
+    def _load(self, values: str):
+        self.sut.save(
+            Spark.get().sql(f"SELECT * FROM VALUES {values} AS t(a, b, isDeleted)")
+        )
+
+    def _ids(self, df: DataFrame):
+        return sorted(row.a for row in df.collect())
+
+    def test_incremental_loads(self):
+        self._load("('1', 1, false), ('2', 2, false), ('3', 3, false)")
+        self.assertEqual(self._ids(self.sut.to_be_written), ["1", "2", "3"])
+        self.assertNotIn("isDeleted", self.sut.to_be_written.columns)
+
+        # the missing rows 1 and 3 are not deleted, row 2 is unchanged
+        self._load(
+            "('2', 2, false), ('4', 4, false), ('3', NULL, true), ('5', 5, true)"
+        )
+        self.assertEqual(self._ids(self.sut.to_be_written), ["4"])
+        # the tombstone of row 5 has no cached row to delete
+        self.assertEqual(self._ids(self.sut.to_be_deleted), ["3"])
+
+        cache = DeltaHandle.from_tc("IncrementalCache").read()
+        self.assertEqual(self._ids(cache.where("deletedTime IS NULL")), ["1", "2", "4"])
+        self.assertEqual(self._ids(cache.where("deletedTime IS NOT NULL")), ["3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+from pyspark.sql import functions as f
+from pyspark.sql.dataframe import DataFrame
+
+from spetlr import Configurator
+from spetlr.cache import CachedLoader, CachedLoaderParameters
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.spark import Spark
+
+
+class SingleMergeCacher(CachedLoader):
+    fail_delete = False
+
+    def write_operation(self, df: DataFrame):
+        return df.withColumn("myId", f.lit(1))
+
+    def delete_operation(self, df: DataFrame) -> DataFrame:
+        if self.fail_delete:
+            raise ValueError("delete failed")
+        return df
+
+
+class SingleMergeCachedLoaderTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register(
+            "SingleMergeDb",
+            dict(name="singlemerge{ID}", path="/tmp/singlemerge{ID}.db"),
+        )
+        tc.register(
+            "SingleMergeCache",
+            dict(name="{SingleMergeDb}.cache", path="{SingleMergeDb_path}/cache"),
+        )
+        DbHandle.from_tc("SingleMergeDb").create()
+        Spark.get().sql(
+            """
+            CREATE TABLE {SingleMergeCache_name}
+            (
+                a STRING,
+                b INTEGER,
+                rowHash INTEGER,
+                loadedTime TIMESTAMP,
+                deletedTime TIMESTAMP,
+                myId INTEGER
+            )
+            USING DELTA
+            LOCATION "{SingleMergeCache_path}"
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+
+        cls.sut = SingleMergeCacher(
+            CachedLoaderParameters(
+                cache_table_name=tc.table_name("SingleMergeCache"),
+                key_cols=["a"],
+                cache_id_cols=["myId"],
+                single_merge=True,
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("SingleMergeDb").drop_cascade()
+
+    def _load(self, values: str):
+        self.sut.save(Spark.get().sql(f"SELECT * FROM VALUES {values} AS t(a, b)"))
+
+    def _cached(self, deleted: bool):
+        condition = "deletedTime IS NOT NULL" if deleted else "deletedTime IS NULL"
+        cache = DeltaHandle.from_tc("SingleMergeCache").read().where(condition)
+        return sorted(row.a for row in cache.collect())
+
+    def test_01_one_merge(self):
+        self._load("('1', 1), ('2', 2)")
+
+        dh = DeltaHandle.from_tc("SingleMergeCache")
+        version = dh.get_latest_version()
+        # row 1 is deleted, row 3 is new
+        self._load("('2', 2), ('3', 3)")
+        self.assertEqual(dh.get_latest_version(), version + 1)
+
+        self.assertEqual(self._cached(deleted=False), ["2", "3"])
+        self.assertEqual(self._cached(deleted=True), ["1"])
+
+    def test_02_failed_delete_keeps_written(self):
+        self.sut.fail_delete = True
+        try:
+            with self.assertRaises(ValueError):
+                # row 2 would be deleted, row 4 is new
+                self._load("('3', 3), ('4', 4)")
+        finally:
+            self.sut.fail_delete = False
+
+        self.assertEqual(self._cached(deleted=False), ["2", "3", "4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+
+from pyspark.sql import functions as f
+from pyspark.sql.dataframe import DataFrame
+
+from spetlr import Configurator
+from spetlr.cache import CachedLoader, CachedLoaderParameters, MigrateCacheToV2
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.spark import Spark
+from spetlr.utils import RowFingerprint
+
+
+class FormatCacher(CachedLoader):
+    to_be_written: DataFrame
+    to_be_deleted: DataFrame
+
+    def write_operation(self, df: DataFrame):
+        self.to_be_written = df
+        return df.withColumn("myId", f.lit(1))
+
+    def delete_operation(self, df: DataFrame) -> DataFrame:
+        self.to_be_deleted = df
+        return df
+
+
+class CacheFormatV2Tests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register("CacheV2Db", dict(name="cachev2{ID}", path="/tmp/cachev2{ID}.db"))
+        tc.register(
+            "CacheV1",
+            dict(name="{CacheV2Db}.cache_v1", path="{CacheV2Db_path}/cache_v1"),
+        )
+        tc.register(
+            "CacheV2",
+            dict(name="{CacheV2Db}.cache_v2", path="{CacheV2Db_path}/cache_v2"),
+        )
+        DbHandle.from_tc("CacheV2Db").create()
+        Spark.get().sql(
+            """
+            CREATE TABLE {CacheV1_name}
+            (
+                a STRING,
+                b INTEGER,
+                rowHash INTEGER,
+                loadedTime TIMESTAMP,
+                deletedTime TIMESTAMP,
+                myId INTEGER
+            )
+            USING DELTA
+            LOCATION "{CacheV1_path}"
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+
+        cls.params_v1 = CachedLoaderParameters(
+            cache_table_name=tc.table_name("CacheV1"),
+            key_cols=["a"],
+            cache_id_cols=["myId"],
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("CacheV2Db").drop_cascade()
+
+    def _data(self, values: str) -> DataFrame:
+        return Spark.get().sql(f"SELECT * FROM VALUES {values} AS t(a, b)")
+
+    def _ids(self, df: DataFrame):
+        return sorted(row.a for row in df.collect())
+
+    def test_migrate_and_load(self):
+        FormatCacher(self.params_v1).save(self._data("('1', 1), ('2', 2), ('3', 3)"))
+
+        # row 2 has changed since the last load
+        df = self._data("('1', 1), ('2', 20), ('3', 3)")
+        tc = Configurator()
+        params_v2 = MigrateCacheToV2(
+            self.params_v1,
+            tc.table_name("CacheV2"),
+            df=df,
+            location=tc.get("CacheV2", "path"),
+        )
+        self.assertEqual(params_v2.cache_format, 2)
+
+        cache = DeltaHandle.from_tc("CacheV2").read()
+        self.assertEqual(cache.schema["rowHash"].dataType.simpleString(), "bigint")
+        fingerprints = df.select("a", RowFingerprint(df, ["a", "b"]).alias("fp"))
+        matching = cache.join(fingerprints, "a").where("rowHash = fp")
+        self.assertEqual(self._ids(matching), ["1", "3"])
+
+        sut = FormatCacher(params_v2)
+        sut.save(df)
+        self.assertEqual(self._ids(sut.to_be_written), ["2"])
+        self.assertEqual(self._ids(sut.to_be_deleted), [])
+
+        # a second load of the same data writes nothing
+        sut.save(df)
+        self.assertEqual(self._ids(sut.to_be_written), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from datetime import datetime
+
+from spetlr import Configurator
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.delta.maintenance import TableMaintenance
+from spetlr.spark import Spark
+
+
+class TableMaintenanceTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register(
+            "MaintenanceDb",
+            dict(name="maintenance{ID}", path="/tmp/maintenance{ID}.db"),
+        )
+        tc.register(
+            "MaintenanceTable",
+            dict(
+                name="{MaintenanceDb}.events",
+                path="{MaintenanceDb_path}/events",
+            ),
+        )
+        tc.register(
+            "MaintenanceHistory",
+            dict(
+                name="{MaintenanceDb}.history",
+                path="{MaintenanceDb_path}/history",
+            ),
+        )
+        DbHandle.from_tc("MaintenanceDb").create()
+        Spark.get().sql(
+            """
+            CREATE TABLE {MaintenanceTable_name} (id INTEGER, part STRING)
+            USING DELTA LOCATION "{MaintenanceTable_path}"
+            PARTITIONED BY (part)
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        cls.dh = DeltaHandle.from_tc("MaintenanceTable")
+
+        # every insert writes a small file
+        for i in range(4):
+            Spark.get().sql(f"INSERT INTO {cls.dh.get_tablename()} VALUES ({i}, 'a')")
+        Spark.get().sql(f"INSERT INTO {cls.dh.get_tablename()} VALUES (9, 'b')")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("MaintenanceDb").drop_cascade()
+
+    def _maintenance(self):
+        return TableMaintenance(
+            DeltaHandle.from_tc("MaintenanceHistory"), min_small_files=4
+        ).add("MaintenanceTable")
+
+    def test_01_layout(self):
+        layout = self._maintenance().file_layout(self.dh)
+        self.assertEqual(layout.num_files, 5)
+        self.assertEqual(layout.num_partitions, 2)
+        # the single file of partition b cannot be compacted
+        self.assertEqual(layout.small_files, 4)
+
+    def test_02_run(self):
+        maintenance = self._maintenance()
+        actions = {action.operation: action for action in maintenance.plan()}
+        self.assertEqual(set(actions), {"OPTIMIZE", "VACUUM"})
+        self.assertIn("part = 'a'", actions["OPTIMIZE"].statement)
+
+        results = maintenance.run()
+        self.assertEqual(len(results), 2)
+        self.assertEqual(self._maintenance().file_layout(self.dh).num_files, 2)
+        self.assertEqual(DeltaHandle.from_tc("MaintenanceHistory").read().count(), 2)
+
+        # the table is maintained until it changes
+        self.assertEqual(self._maintenance().plan(), [])
+
+    def test_03_zorder(self):
+        Spark.get().sql(f"INSERT INTO {self.dh.get_tablename()} VALUES (5, 'b')")
+        maintenance = TableMaintenance(DeltaHandle.from_tc("MaintenanceHistory")).add(
+            self.dh, zorder_by=["id"]
+        )
+
+        (action,) = maintenance.plan()
+        self.assertEqual(action.operation, "ZORDER")
+        # the table was never Z-ordered, so all of it is new
+        self.assertIn("ZORDER BY (id)", action.statement)
+
+    def test_04_vacuum_does_not_skip_optimize(self):
+        for i in range(4):
+            Spark.get().sql(f"INSERT INTO {self.dh.get_tablename()} VALUES ({i}, 'c')")
+
+        # only a vacuum was recorded at the latest version, e.g. because the
+        # optimize did not fit in the time budget
+        history = DeltaHandle.from_tc("MaintenanceHistory")
+        now = datetime.utcnow()
+        history.append(
+            Spark.get().createDataFrame(
+                [
+                    (
+                        self.dh.get_tablename(),
+                        "VACUUM",
+                        self.dh.get_latest_version(),
+                        now,
+                        now,
+                        0.0,
+                        "test",
+                        {},
+                    )
+                ],
+                schema=TableMaintenance.history_schema,
+            )
+        )
+
+        operations = [action.operation for action in self._maintenance().plan()]
+        self.assertEqual(operations, ["OPTIMIZE"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+
+from pyspark.sql import Row
+
+from spetlr import Configurator
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.delta.merge_engine import MergeMetricsCollector, _record
+from spetlr.spark import Spark
+
+
+class MergeEngineTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register(
+            "MergeEngineDb",
+            dict(name="mergeengine{ID}", path="/tmp/mergeengine{ID}.db"),
+        )
+        tc.register(
+            "MergeEngineTarget",
+            dict(
+                name="{MergeEngineDb}.target",
+                path="{MergeEngineDb_path}/target",
+            ),
+        )
+        DbHandle.from_tc("MergeEngineDb").create()
+        Spark.get().sql(
+            """
+            CREATE TABLE {MergeEngineTarget_name}
+                (id INTEGER, part STRING, value STRING)
+            USING DELTA LOCATION "{MergeEngineTarget_path}"
+            PARTITIONED BY (part)
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        cls.dh = DeltaHandle.from_tc("MergeEngineTarget")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("MergeEngineDb").drop_cascade()
+
+    def _rows(self):
+        return sorted(tuple(row) for row in self.dh.read().collect())
+
+    def test_01_strategies(self):
+        spark = Spark.get()
+        with MergeMetricsCollector() as collector:
+            result = self.dh.merge(
+                spark.sql("SELECT 1 AS id, 'a' AS part, 'x' AS value"), ["id"]
+            )
+            self.assertEqual(result.strategy, "overwrite")
+
+            # only new rows
+            result = self.dh.merge(
+                spark.sql("SELECT 2 AS id, 'b' AS part, 'y' AS value"), ["id"]
+            )
+            self.assertEqual(result.strategy, "append")
+            self.assertEqual(result.metrics["numOutputRows"], 1)
+
+            # nothing changed
+            result = self.dh.merge(
+                spark.sql("SELECT 2 AS id, 'b' AS part, 'y' AS value"), ["id"]
+            )
+            self.assertEqual(result.strategy, "skip")
+            self.assertIsNone(result.version)
+
+            # a changed row
+            result = self.dh.merge(
+                spark.sql("SELECT 2 AS id, 'b' AS part, 'z' AS value"), ["id"]
+            )
+            self.assertEqual(result.strategy, "merge")
+            self.assertEqual(result.metrics["numTargetRowsUpdated"], 1)
+            self.assertEqual(result.metrics["numTargetRowsInserted"], 0)
+
+            # the partition 'a' is replaced, the row with id 1 is gone
+            result = self.dh.merge(
+                spark.sql("SELECT 3 AS id, 'a' AS part, 'w' AS value"),
+                ["id"],
+                complete_partitions=True,
+            )
+            self.assertEqual(result.strategy, "replace_where")
+
+        self.assertEqual(self._rows(), [(2, "b", "z"), (3, "a", "w")])
+        self.assertEqual(
+            [r.strategy for r in collector.results],
+            ["overwrite", "append", "skip", "merge", "replace_where"],
+        )
+        self.assertEqual(collector.to_dataframe().count(), 5)
+
+    def test_02_upsert_returns_result(self):
+        result = self.dh.upsert(
+            Spark.get().sql("SELECT 4 AS id, 'b' AS part, 'v' AS value"), ["id"]
+        )
+        self.assertEqual(result.strategy, "append")
+        self.assertEqual(result.version, self.dh.get_latest_version())
+
+    def test_03_ambiguous_commit(self):
+        # another job merges into the table while the load runs
+        start_version = self.dh.get_latest_version()
+        for value in ["s", "t"]:
+            Spark.get().sql(
+                f"""
+                MERGE INTO {self.dh.get_tablename()} AS target
+                USING (SELECT 2 AS id, 'b' AS part, '{value}' AS value) AS source
+                ON source.id = target.id
+                WHEN MATCHED THEN UPDATE SET *
+                """
+            )
+
+        result = _record(
+            self.dh,
+            "merge",
+            start_version,
+            [Row(num_affected_rows=1, num_updated_rows=1, num_inserted_rows=0)],
+        )
+        self.assertIsNone(result.version)
+        self.assertEqual(
+            result.metrics, {"numTargetRowsUpdated": 1, "numTargetRowsInserted": 0}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+from spetlr import Configurator
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.delta.metadata_cache import TableMetadataCache
+from spetlr.deltaspec import DeltaTableSpec
+from spetlr.spark import Spark
+
+
+class MetadataCacheTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register(
+            "MetadataCacheDb",
+            dict(name="metadatacache{ID}", path="/tmp/metadatacache{ID}.db"),
+        )
+        tc.register(
+            "MetadataCacheTable",
+            dict(
+                name="{MetadataCacheDb}.tbl",
+                path="{MetadataCacheDb_path}/tbl",
+            ),
+        )
+        DbHandle.from_tc("MetadataCacheDb").create()
+        Spark.get().sql(
+            """
+            CREATE TABLE {MetadataCacheTable_name} (id INTEGER, part STRING)
+            USING DELTA LOCATION "{MetadataCacheTable_path}"
+            PARTITIONED BY (part)
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        cls.dh = DeltaHandle.from_tc("MetadataCacheTable")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("MetadataCacheDb").drop_cascade()
+
+    def test_01_cached_until_the_version_changes(self):
+        name = self.dh.get_tablename()
+        metadata = TableMetadataCache.get(name)
+        self.assertEqual(metadata.partitioning, ["part"])
+        self.assertEqual(metadata.version, 0)
+
+        # the same version is served from the cache
+        self.assertIs(TableMetadataCache.get(name.upper()), metadata)
+        self.assertEqual(self.dh.get_partitioning(), ["part"])
+
+        # a commit outside of spetlr is detected in the transaction log
+        Spark.get().sql(f"INSERT INTO {name} VALUES (1, 'a')")
+        self.assertEqual(self.dh.get_latest_version(), 1)
+        self.assertIsNot(TableMetadataCache.get(name), metadata)
+
+    def test_02_invalidated_by_writes(self):
+        name = self.dh.get_tablename()
+        metadata = TableMetadataCache.get(name)
+
+        self.dh.append(Spark.get().sql("SELECT 2 AS id, 'b' AS part"))
+        self.assertIsNot(TableMetadataCache.get(name), metadata)
+        self.assertEqual(
+            self.dh.get_latest_version(), TableMetadataCache.get(name).version
+        )
+
+    def test_03_table_spec(self):
+        spec = DeltaTableSpec.from_name(self.dh.get_tablename())
+        self.assertEqual(spec.partitioned_by, ["part"])
+
+        # the cached properties are not changed by the spec
+        properties = TableMetadataCache.get(self.dh.get_tablename()).properties
+        self.assertNotIn("delta.minReaderVersion", properties)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+from datetime import datetime
+
+from spetlr import Configurator
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.delta.delta_handle import DeltaHandleException
+from spetlr.etl.loaders import SimpleLoader
+from spetlr.spark import Spark
+
+
+class PartitionOverwriteTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register(
+            "PartitionOverwriteDb",
+            dict(name="partitionoverwrite{ID}", path="/tmp/partitionoverwrite{ID}.db"),
+        )
+        tc.register(
+            "PartitionOverwriteTable",
+            dict(
+                name="{PartitionOverwriteDb}.events",
+                path="{PartitionOverwriteDb_path}/events",
+            ),
+        )
+        tc.register(
+            "PartitionOverwriteFlat",
+            dict(
+                name="{PartitionOverwriteDb}.flat",
+                path="{PartitionOverwriteDb_path}/flat",
+            ),
+        )
+        DbHandle.from_tc("PartitionOverwriteDb").create()
+        Spark.get().sql(
+            """
+            CREATE TABLE {PartitionOverwriteTable_name}
+                (id INTEGER, time TIMESTAMP, day DATE)
+            USING DELTA LOCATION "{PartitionOverwriteTable_path}"
+            PARTITIONED BY (day)
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        cls.dh = DeltaHandle.from_tc("PartitionOverwriteTable")
+        Spark.get().sql(
+            f"""
+            INSERT INTO {cls.dh.get_tablename()} VALUES
+                (1, TIMESTAMP'2023-04-11 10:00:00', DATE'2023-04-11'),
+                (2, TIMESTAMP'2023-04-12 10:00:00', DATE'2023-04-12'),
+                (3, TIMESTAMP'2023-04-12 12:00:00', DATE'2023-04-12'),
+                (4, TIMESTAMP'2023-04-13 10:00:00', DATE'2023-04-13')
+            """
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("PartitionOverwriteDb").drop_cascade()
+
+    def _ids(self):
+        return sorted(row.id for row in self.dh.read().collect())
+
+    def _history(self, limit: int):
+        return (
+            Spark.get()
+            .sql(f"DESCRIBE HISTORY {self.dh.get_tablename()} LIMIT {limit}")
+            .collect()
+        )
+
+    def test_01_overwrite_partitions(self):
+        df = Spark.get().sql(
+            """
+            SELECT 5 AS id,
+                TIMESTAMP'2023-04-12 11:00:00' AS time,
+                DATE'2023-04-12' AS day
+            """
+        )
+        SimpleLoader(handle=self.dh, mode="overwrite_partitions").save(df)
+
+        # only the partition of 2023-04-12 was replaced
+        self.assertEqual(self._ids(), [1, 4, 5])
+        (commit,) = self._history(1)
+        self.assertIn("2023-04-12", commit["operationParameters"]["predicate"])
+
+    def test_02_delete_whole_partitions(self):
+        self.dh.delete_data("time", datetime(2023, 4, 13, 0, 0), "<")
+        self.assertEqual(self._ids(), [4])
+
+        # the partitions before the limit are deleted by their values
+        predicates = [
+            commit["operationParameters"]["predicate"]
+            for commit in self._history(2)
+            if commit["operation"] == "DELETE"
+        ]
+        self.assertTrue(
+            any("day" in p and "time" not in p for p in predicates), predicates
+        )
+
+    def test_03_delete_in_mixed_partition(self):
+        # two files in one partition, with rows below and above the limit
+        for row in [
+            "(6, TIMESTAMP'2023-04-14 08:00:00', DATE'2023-04-14')",
+            "(7, TIMESTAMP'2023-04-14 20:00:00', DATE'2023-04-14')",
+        ]:
+            Spark.get().sql(f"INSERT INTO {self.dh.get_tablename()} VALUES {row}")
+
+        self.dh.delete_data("time", datetime(2023, 4, 14, 12, 0), "<")
+        # the partition is not covered, so only the row below the limit is deleted
+        self.assertEqual(self._ids(), [7])
+        (commit,) = self._history(1)
+        self.assertIn("time", commit["operationParameters"]["predicate"])
+
+    def test_04_unpartitioned(self):
+        dh = DeltaHandle.from_tc("PartitionOverwriteFlat")
+        dh.overwrite(Spark.get().sql("SELECT 1 AS id"))
+        with self.assertRaises(DeltaHandleException):
+            dh.overwrite_partitions(Spark.get().sql("SELECT 2 AS id"))
+
+
+if __name__ == "__main__":
+    unittest.main()
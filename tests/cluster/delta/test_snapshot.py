@@ -0,0 +1,108 @@
+import unittest
+
+from spetlr import Configurator
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.delta.snapshot import TableSnapshot
+from spetlr.etl import Loader, Orchestrator
+from spetlr.etl.extractors import SimpleExtractor
+from spetlr.spark import Spark
+
+
+class CountingLoader(Loader):
+    def __init__(self):
+        super().__init__()
+        self.counts = []
+
+    def save(self, df) -> None:
+        self.counts.append(df.count())
+
+
+class TableSnapshotTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register(
+            "SnapshotDb",
+            dict(name="snapshot{ID}", path="/tmp/snapshot{ID}.db"),
+        )
+        tc.register(
+            "SnapshotTable",
+            dict(name="{SnapshotDb}.tbl", path="{SnapshotDb_path}/tbl"),
+        )
+        tc.register(
+            "SnapshotState",
+            dict(name="{SnapshotDb}.state", path="{SnapshotDb_path}/state"),
+        )
+        DbHandle.from_tc("SnapshotDb").create()
+        Spark.get().sql(
+            """
+            CREATE TABLE {SnapshotTable_name} (id INTEGER)
+            USING DELTA LOCATION "{SnapshotTable_path}"
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        cls.dh = DeltaHandle.from_tc("SnapshotTable")
+        cls.name = cls.dh.get_tablename()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("SnapshotDb").drop_cascade()
+
+    def test_01_time_travel(self):
+        Spark.get().sql(f"INSERT INTO {self.name} VALUES (1)")
+        self.assertEqual(self.dh.read(version=0).count(), 0)
+        self.assertEqual(self.dh.read(version=1).count(), 1)
+
+        timestamp = (
+            Spark.get()
+            .sql(f"DESCRIBE HISTORY {self.name}")
+            .where("version = 1")
+            .first()["timestamp"]
+        )
+        self.assertEqual(self.dh.read(timestamp=timestamp).count(), 1)
+
+        # a handle by path
+        by_path = DeltaHandle(name=None, location=self.dh.get_location())
+        self.assertEqual(by_path.read(version=0).count(), 0)
+
+    def test_02_snapshot(self):
+        with TableSnapshot() as snapshot:
+            self.assertEqual(self.dh.read().count(), 1)
+
+            # a commit by another job is not seen in the snapshot
+            Spark.get().sql(f"INSERT INTO {self.name} VALUES (2)")
+            self.assertEqual(DeltaHandle.from_tc("SnapshotTable").read().count(), 1)
+
+            # but writes through the handle are
+            self.dh.append(Spark.get().sql("SELECT 3 AS id"))
+            self.assertEqual(self.dh.read().count(), 3)
+
+        self.assertEqual(snapshot.versions, {self.name: 1})
+        self.assertEqual(self.dh.read().count(), 3)
+
+    def test_03_rerun(self):
+        state = DeltaHandle.from_tc("SnapshotState")
+        TableSnapshot(versions={self.name: 1}).save(state, "run1")
+
+        with TableSnapshot.load(state, "run1"):
+            self.assertEqual(self.dh.read().count(), 1)
+
+    def test_04_repeated_execution(self):
+        loader = CountingLoader()
+        orchestrator = Orchestrator(snapshot=TableSnapshot())
+        orchestrator.extract_from(SimpleExtractor(self.dh, "tbl")).load_into(loader)
+
+        orchestrator.execute()
+        Spark.get().sql(f"INSERT INTO {self.name} VALUES (4)")
+        orchestrator.execute()
+
+        # the second execution reads the table as of its own start
+        self.assertEqual(loader.counts[1], loader.counts[0] + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+import unittest
+from datetime import date, datetime
+from typing import Callable
+
+from spetlr import Configurator
+from spetlr.delta import DbHandle, DeltaHandle, table_statistics
+from spetlr.spark import Spark
+
+
+class TableStatisticsTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register(
+            "StatisticsDb",
+            dict(name="statistics{ID}", path="/tmp/statistics{ID}.db"),
+        )
+        tc.register(
+            "StatisticsTable",
+            dict(
+                name="{StatisticsDb}.stats",
+                path="{StatisticsDb_path}/stats",
+            ),
+        )
+        DbHandle.from_tc("StatisticsDb").create()
+        Spark.get().sql(
+            """
+            CREATE TABLE {StatisticsTable_name}
+                (id INTEGER, name STRING, time TIMESTAMP, y INTEGER, m INTEGER)
+            USING DELTA LOCATION "{StatisticsTable_path}"
+            PARTITIONED BY (y, m)
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        cls.dh = DeltaHandle.from_tc("StatisticsTable")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("StatisticsDb").drop_cascade()
+
+    def test_01_empty(self):
+        self.assertTrue(self.dh.is_empty())
+        self.assertIsNone(self.dh.get_latest_partition())
+
+        stats = self.dh.get_statistics(["id"])
+        self.assertEqual(stats.num_records, 0)
+        self.assertIsNone(stats.columns["id"].max)
+
+    def test_02_statistics(self):
+        Spark.get().sql(
+            f"""
+            INSERT INTO {self.dh.get_tablename()} VALUES
+                (1, 'a', TIMESTAMP'2021-01-01 10:00:00.123456', 2021, 12),
+                (2, NULL, TIMESTAMP'2022-03-01 10:00:00.654321', 2022, 3),
+                (NULL, 'c', TIMESTAMP'2022-01-01 10:00:00', 2022, 1)
+            """
+        )
+        self.assertFalse(self.dh.is_empty())
+        self.assertEqual(self.dh.get_latest_partition(), {"y": 2022, "m": 3})
+
+        stats = self.dh.get_statistics(["id", "name", "time", "y"])
+        self.assertEqual(stats.num_records, 3)
+        self.assertFalse(stats.num_records_scanned)
+
+        self.assertEqual(stats.columns["id"].min, 1)
+        self.assertEqual(stats.columns["id"].max, 2)
+        self.assertEqual(stats.columns["id"].null_count, 1)
+        self.assertEqual(stats.columns["name"].null_count, 1)
+        self.assertEqual(stats.columns["y"].max, 2022)
+
+        # the timestamps are exact, also below the milliseconds of the log
+        self.assertEqual(
+            stats.columns["time"].max, datetime(2022, 3, 1, 10, 0, 0, 654321)
+        )
+        self.assertEqual(
+            stats.columns["time"].min, datetime(2021, 1, 1, 10, 0, 0, 123456)
+        )
+
+        # strings are not exact in the log
+        self.assertEqual(stats.scanned_columns, ["name"])
+        self.assertEqual(stats.columns["name"].max, "c")
+
+    def test_03_removed_files(self):
+        Spark.get().sql(f"DELETE FROM {self.dh.get_tablename()} WHERE y = 2022")
+        self.assertEqual(self.dh.get_latest_partition(), {"y": 2021, "m": 12})
+
+        stats = self.dh.get_statistics(["time"])
+        self.assertEqual(stats.num_records, 1)
+        self.assertEqual(stats.columns["time"].max.date(), date(2021, 1, 1))
+
+    def test_04_column_mapping(self):
+        # the log holds the physical names of the columns
+        name = f"{Configurator().get('StatisticsDb')}.mapped"
+        Spark.get().sql(
+            f"""
+            CREATE TABLE {name} (id INTEGER, y INTEGER)
+            USING DELTA
+            PARTITIONED BY (y)
+            TBLPROPERTIES (
+                'delta.columnMapping.mode' = 'name',
+                'delta.minReaderVersion' = '2',
+                'delta.minWriterVersion' = '5'
+            )
+            """
+        )
+        Spark.get().sql(f"INSERT INTO {name} VALUES (1, 2021), (5, 2022)")
+        Spark.get().sql(f"ALTER TABLE {name} RENAME COLUMN id TO key")
+        dh = DeltaHandle(name)
+
+        self.assertEqual(dh.get_latest_partition(), {"y": 2022})
+        stats = dh.get_statistics(["key", "y"])
+        self.assertEqual(stats.num_records, 2)
+        self.assertEqual(stats.scanned_columns, [])
+        self.assertEqual(stats.columns["key"].max, 5)
+        self.assertEqual(stats.columns["y"].min, 2021)
+
+
+class TransactionLogReplayTests(unittest.TestCase):
+    """The statistics are only taken from the log if its replay is complete."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register("ReplayDb", dict(name="replay{ID}", path="/tmp/replay{ID}.db"))
+        for table in ["Classic", "V2"]:
+            tc.register(
+                f"Replay{table}",
+                dict(
+                    name=f"{{ReplayDb}}.{table.lower()}",
+                    path=f"{{ReplayDb_path}}/{table.lower()}",
+                ),
+            )
+        DbHandle.from_tc("ReplayDb").create()
+        spark = Spark.get()
+        spark.sql(
+            """
+            CREATE TABLE {ReplayClassic_name} (id INTEGER)
+            USING DELTA LOCATION "{ReplayClassic_path}"
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        spark.sql(
+            """
+            CREATE TABLE {ReplayV2_name} (id INTEGER)
+            USING DELTA LOCATION "{ReplayV2_path}"
+            TBLPROPERTIES (
+                delta.checkpointPolicy = 'v2',
+                delta.checkpointInterval = 2
+            )
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        for table in ["ReplayClassic", "ReplayV2"]:
+            for i in range(4):
+                spark.sql(f"INSERT INTO {tc.table_name(table)} VALUES ({i})")
+
+        cls.log_copy = tc.get("ReplayDb", "path") + "/log_copy"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("ReplayDb").drop_cascade()
+
+    def _copy_log(self, dh: DeltaHandle, keep: Callable[[str], bool]) -> DeltaHandle:
+        """A handle of a copy of the transaction log with only the kept files."""
+        spark = Spark.get()
+        jvm = spark.sparkContext._jvm
+        conf = spark.sparkContext._jsc.hadoopConfiguration()
+        source = jvm.org.apache.hadoop.fs.Path(dh.get_location() + "/_delta_log")
+        target = jvm.org.apache.hadoop.fs.Path(self.log_copy + "/_delta_log")
+        fs = source.getFileSystem(conf)
+        fs.delete(target, True)
+        fs.mkdirs(target)
+        for status in fs.listStatus(source):
+            if keep(status.getPath().getName()):
+                jvm.org.apache.hadoop.fs.FileUtil.copy(
+                    fs, status.getPath(), fs, target, False, conf
+                )
+        return DeltaHandle(name=None, location=self.log_copy)
+
+    def test_01_complete_logs(self):
+        for table in ["ReplayClassic", "ReplayV2"]:
+            dh = DeltaHandle.from_tc(table)
+            self.assertEqual(table_statistics.active_files(dh).count(), 4)
+            self.assertEqual(dh.get_statistics(["id"]).columns["id"].max, 3)
+
+    def test_02_missing_commit(self):
+        dh = DeltaHandle.from_tc("ReplayClassic")
+        copy = self._copy_log(dh, lambda name: not name.startswith("0" * 19 + "2."))
+        self.assertIsNone(table_statistics.active_files(copy))
+
+    def test_03_cleaned_up_v2_checkpoint(self):
+        dh = DeltaHandle.from_tc("ReplayV2")
+        # as after the log cleanup, the commits before the checkpoint are gone
+        copy = self._copy_log(
+            dh, lambda name: not (name.endswith(".json") and name < "0" * 19 + "2")
+        )
+        self.assertIsNone(table_statistics.active_files(copy))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+
+from spetlr import Configurator
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.etl import Orchestrator
+from spetlr.etl.extractors import ChangeFeedExtractor, ChangeFeedVersionStore
+from spetlr.etl.loaders import SimpleLoader
+from spetlr.spark import Spark
+
+
+class ChangeFeedExtractorTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register("ChangeFeedDb", dict(name="cdf{ID}", path="/tmp/cdf{ID}.db"))
+        for table in ["Source", "Target", "State"]:
+            tc.register(
+                f"ChangeFeed{table}",
+                dict(
+                    name=f"{{ChangeFeedDb}}.{table.lower()}",
+                    path=f"{{ChangeFeedDb_path}}/{table.lower()}",
+                ),
+            )
+        DbHandle.from_tc("ChangeFeedDb").create()
+        spark = Spark.get()
+        spark.sql(
+            """
+            CREATE TABLE {ChangeFeedSource_name} (id INTEGER, value STRING)
+            USING DELTA LOCATION "{ChangeFeedSource_path}"
+            TBLPROPERTIES (delta.enableChangeDataFeed = true)
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        spark.sql(
+            """
+            CREATE TABLE {ChangeFeedTarget_name} (id INTEGER, value STRING)
+            USING DELTA LOCATION "{ChangeFeedTarget_path}"
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        spark.sql(
+            """
+            CREATE TABLE {ChangeFeedState_name}
+            (
+                ConsumerId STRING,
+                TableName STRING,
+                Version BIGINT,
+                UpdatedTime TIMESTAMP
+            )
+            USING DELTA LOCATION "{ChangeFeedState_path}"
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+
+        cls.source = tc.table_name("ChangeFeedSource")
+        cls.extractor = ChangeFeedExtractor(
+            DeltaHandle.from_tc("ChangeFeedSource"),
+            key_cols=["id"],
+            version_store=ChangeFeedVersionStore(
+                DeltaHandle.from_tc("ChangeFeedState")
+            ),
+            consumer_id="ChangeFeedTests",
+            dataset_key="changes",
+        )
+        cls.orchestrator = (
+            Orchestrator()
+            .extract_from(cls.extractor)
+            .load_into(
+                SimpleLoader(
+                    DeltaHandle.from_tc("ChangeFeedTarget"),
+                    mode="upsert",
+                    join_cols=["id"],
+                    tombstone_col="isDeleted",
+                )
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("ChangeFeedDb").drop_cascade()
+
+    def _target(self):
+        target = DeltaHandle.from_tc("ChangeFeedTarget").read()
+        return sorted((row.id, row.value) for row in target.collect())
+
+    def test_01_first_run_extracts_all_rows(self):
+        Spark.get().sql(
+            f"INSERT INTO {self.source} VALUES (1, 'a'), (2, 'b'), (3, 'c')"
+        )
+        self.orchestrator.execute()
+        self.assertEqual(self._target(), [(1, "a"), (2, "b"), (3, "c")])
+
+    def test_02_changes_are_upserted_and_deleted(self):
+        spark = Spark.get()
+        spark.sql(f"UPDATE {self.source} SET value = 'x' WHERE id = 2")
+        spark.sql(f"UPDATE {self.source} SET value = 'y' WHERE id = 2")
+        spark.sql(f"DELETE FROM {self.source} WHERE id = 3")
+        spark.sql(f"INSERT INTO {self.source} VALUES (4, 'd')")
+
+        changes = self.extractor.read()
+        self.assertEqual(
+            sorted((row.id, row.value, row.isDeleted) for row in changes.collect()),
+            [(2, "y", False), (3, "c", True), (4, "d", False)],
+        )
+
+        self.orchestrator.execute()
+        self.assertEqual(self._target(), [(1, "a"), (2, "y"), (4, "d")])
+
+    def test_03_no_changes(self):
+        self.assertEqual(self.extractor.read().count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from pyspark.sql import DataFrame
+from spetlrtools.testing import TestHandle
+
+from spetlr.etl.loaders import MultiSinkLoader
+from spetlr.spark import Spark
+
+
+class CollectingHandle(TestHandle):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writes = []
+
+    def overwrite(self, df: DataFrame, mergeSchema=None, overwriteSchema=None):
+        super().overwrite(df)
+        self.writes.append(sorted(row.id for row in df.collect()))
+
+
+class MultiSinkLoaderStagingTests(unittest.TestCase):
+    staging_path = "/tmp/multisink_staging"
+
+    def _staged(self):
+        spark = Spark.get()
+        jvm = spark.sparkContext._jvm
+        path = jvm.org.apache.hadoop.fs.Path(self.staging_path)
+        fs = path.getFileSystem(spark.sparkContext._jsc.hadoopConfiguration())
+        return list(fs.listStatus(path)) if fs.exists(path) else []
+
+    def test_datasets_are_staged_separately(self):
+        handles = [CollectingHandle(), CollectingHandle()]
+        loader = MultiSinkLoader(
+            handles,
+            staging_path=self.staging_path,
+            parallel=True,
+            dataset_input_keys=["small", "large"],
+        )
+
+        loader.save_many(
+            {
+                "small": Spark.get().range(3),
+                "large": Spark.get().range(100, 110),
+            }
+        )
+
+        # every sink is written once per dataset, with only the rows of that dataset
+        for handle in handles:
+            self.assertEqual(
+                sorted(handle.writes), [list(range(3)), list(range(100, 110))]
+            )
+        # the snapshots are removed
+        self.assertEqual(self._staged(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import uuid
+
+from pyspark.sql import DataFrame
+
+from spetlr.etl import Extractor, Loader, Orchestrator, Transformer
+from spetlr.etl.checkpoint import OrchestratorCheckpointException, StepCheckpoint
+from spetlr.spark import Spark
+
+
+class CountingExtractor(Extractor):
+    def __init__(self):
+        super().__init__(dataset_key="numbers")
+        self.runs = 0
+
+    def read(self) -> DataFrame:
+        self.runs += 1
+        return Spark.get().range(10)
+
+
+class DoublingTransformer(Transformer):
+    def __init__(self):
+        super().__init__()
+        self.runs = 0
+
+    def process(self, df: DataFrame) -> DataFrame:
+        self.runs += 1
+        return df.selectExpr("id * 2 as id")
+
+
+class FlakyLoader(Loader):
+    def __init__(self):
+        super().__init__()
+        self.fail = True
+        self.total = None
+
+    def save(self, df: DataFrame) -> None:
+        if self.fail:
+            raise ValueError("expected failure")
+        self.total = df.groupBy().sum("id").collect()[0][0]
+
+
+class OrchestratorCheckpointTests(unittest.TestCase):
+    location = f"/tmp/spetlr_checkpoints_{uuid.uuid4().hex}"
+
+    def _orchestrator(self, extractor, transformer, loader, run_id: str):
+        return (
+            Orchestrator(checkpoint=StepCheckpoint(self.location, run_id))
+            .extract_from(extractor)
+            .transform_with(transformer)
+            .load_into(loader)
+        )
+
+    def test_01_resume_after_failure(self):
+        extractor = CountingExtractor()
+        transformer = DoublingTransformer()
+        loader = FlakyLoader()
+        orchestrator = self._orchestrator(extractor, transformer, loader, "run1")
+
+        with self.assertRaises(ValueError):
+            orchestrator.execute()
+        self.assertEqual((extractor.runs, transformer.runs), (1, 1))
+
+        # the re-run starts at the loader
+        loader.fail = False
+        orchestrator.execute()
+        self.assertEqual((extractor.runs, transformer.runs), (1, 1))
+        self.assertEqual(loader.total, 90)
+
+        # the checkpoints were cleared after the successful run
+        orchestrator.execute()
+        self.assertEqual((extractor.runs, transformer.runs), (2, 2))
+
+    def test_02_mismatching_steps(self):
+        loader = FlakyLoader()
+        with self.assertRaises(ValueError):
+            self._orchestrator(
+                CountingExtractor(), DoublingTransformer(), loader, "run2"
+            ).execute()
+
+        # a different orchestrator cannot resume from the checkpoint
+        with self.assertRaises(OrchestratorCheckpointException):
+            (
+                Orchestrator(checkpoint=StepCheckpoint(self.location, "run2"))
+                .extract_from(CountingExtractor())
+                .load_into(loader)
+                .load_into(loader)
+            ).execute()
+
+    def test_03_no_parallel_checkpoints(self):
+        with self.assertRaises(OrchestratorCheckpointException):
+            (
+                Orchestrator(
+                    parallel=True, checkpoint=StepCheckpoint(self.location, "run3")
+                )
+                .extract_from(CountingExtractor())
+                .load_into(FlakyLoader())
+            ).execute()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+from datetime import timedelta
+
+from pyspark.sql import DataFrame
+
+from spetlr import Configurator
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.etl import Loader, Orchestrator
+from spetlr.etl.extractors import IncrementalExtractor, SimpleExtractor
+from spetlr.etl.fingerprint import RunFingerprint, describe_configuration
+from spetlr.spark import Spark
+
+
+class CountingLoader(Loader):
+    def __init__(self):
+        super().__init__()
+        # private attributes are not part of the configuration hash
+        self._runs = 0
+        self._fail = False
+
+    def save(self, df: DataFrame) -> None:
+        if self._fail:
+            raise ValueError("expected failure")
+        self._runs += 1
+
+
+class RunFingerprintTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register(
+            "FingerprintDb",
+            dict(name="fingerprint{ID}", path="/tmp/fingerprint{ID}.db"),
+        )
+        tc.register(
+            "FingerprintSource",
+            dict(
+                name="{FingerprintDb}.source",
+                path="{FingerprintDb_path}/source",
+            ),
+        )
+        tc.register(
+            "FingerprintState",
+            dict(
+                name="{FingerprintDb}.state",
+                path="{FingerprintDb_path}/state",
+            ),
+        )
+        DbHandle.from_tc("FingerprintDb").create()
+        spark = Spark.get()
+        spark.sql(
+            """
+            CREATE TABLE {FingerprintSource_name} (id INTEGER)
+            USING DELTA LOCATION "{FingerprintSource_path}"
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        spark.sql(
+            """
+            CREATE TABLE {FingerprintState_name}
+            (
+                OrchestratorId STRING,
+                ConfigHash STRING,
+                InputVersions MAP<STRING, BIGINT>,
+                RunTime TIMESTAMP
+            )
+            USING DELTA LOCATION "{FingerprintState_path}"
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+
+        cls.source = DeltaHandle.from_tc("FingerprintSource")
+        cls.state = DeltaHandle.from_tc("FingerprintState")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("FingerprintDb").drop_cascade()
+
+    def _orchestrator(self, loader: Loader) -> Orchestrator:
+        return (
+            Orchestrator(fingerprint=RunFingerprint(self.state, "test_orchestrator"))
+            .extract_from(SimpleExtractor(self.source, dataset_key="source"))
+            .load_into(loader)
+        )
+
+    def test_01_unchanged_sources_are_skipped(self):
+        loader = CountingLoader()
+        orchestrator = self._orchestrator(loader)
+
+        orchestrator.execute()
+        self.assertEqual(loader._runs, 1)
+        self.assertEqual(self.state.read().count(), 1)
+
+        # nothing has changed, the second run is skipped
+        orchestrator.execute()
+        self.assertEqual(loader._runs, 1)
+
+    def test_02_new_source_version_triggers_run(self):
+        loader = CountingLoader()
+        orchestrator = self._orchestrator(loader)
+
+        self.source.append(Spark.get().createDataFrame([(1,)], "id INTEGER"))
+        orchestrator.execute()
+        self.assertEqual(loader._runs, 1)
+
+        orchestrator.execute()
+        self.assertEqual(loader._runs, 1)
+
+    def test_03_failed_run_is_not_recorded(self):
+        loader = CountingLoader()
+        orchestrator = self._orchestrator(loader)
+
+        self.source.append(Spark.get().createDataFrame([(2,)], "id INTEGER"))
+        loader._fail = True
+        with self.assertRaises(ValueError):
+            orchestrator.execute()
+
+        loader._fail = False
+        orchestrator.execute()
+        self.assertEqual(loader._runs, 1)
+
+    def test_04_configuration_values(self):
+        def describe(overlap_period: timedelta) -> str:
+            return describe_configuration(
+                Orchestrator().extract_from(
+                    IncrementalExtractor(
+                        self.source,
+                        self.state,
+                        "id",
+                        "id",
+                        overlap_period=overlap_period,
+                    )
+                )
+            )
+
+        self.assertEqual(describe(timedelta(hours=1)), describe(timedelta(hours=1)))
+        self.assertNotEqual(describe(timedelta(hours=1)), describe(timedelta(hours=2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
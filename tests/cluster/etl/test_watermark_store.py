@@ -0,0 +1,147 @@
+from datetime import timedelta
+from typing import List
+
+from pyspark.sql import DataFrame
+from pyspark.sql.types import (
+    IntegerType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+from spetlrtools.testing import DataframeTestCase, TestHandle
+from spetlrtools.time import dt_utc
+
+from spetlr import Configurator
+from spetlr.delta import DbHandle, DeltaHandle
+from spetlr.etl import Loader, Orchestrator
+from spetlr.etl.extractors import IncrementalExtractor, WatermarkStore
+from spetlr.spark import Spark
+from spetlr.utils import DataframeCreator
+
+
+class FailingLoader(Loader):
+    def save(self, df: DataFrame) -> None:
+        raise ValueError("expected failure")
+
+
+class NoopLoader(Loader):
+    def save(self, df: DataFrame) -> None:
+        df.collect()
+
+
+class WatermarkStoreTests(DataframeTestCase):
+    row1 = (1, "string1", dt_utc(2021, 1, 1, 10, 50))
+    row2 = (2, "string2", dt_utc(2021, 1, 1, 10, 55))
+    row3 = (3, "string3", dt_utc(2021, 1, 1, 11, 00))
+    row4 = (4, "string4", dt_utc(2021, 1, 1, 11, 5))
+
+    dummy_columns: List[str] = ["id", "stringcol", "timecol"]
+
+    dummy_schema = StructType(
+        [
+            StructField("id", IntegerType(), True),
+            StructField("stringcol", StringType(), True),
+            StructField("timecol", TimestampType(), True),
+        ]
+    )
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        tc = Configurator()
+        tc.clear_all_configurations()
+        tc.set_debug()
+
+        tc.register(
+            "WatermarkDb",
+            dict(name="watermark{ID}", path="/tmp/watermark{ID}.db"),
+        )
+        tc.register(
+            "WatermarkState",
+            dict(name="{WatermarkDb}.state", path="{WatermarkDb_path}/state"),
+        )
+        DbHandle.from_tc("WatermarkDb").create()
+        Spark.get().sql(
+            """
+            CREATE TABLE {WatermarkState_name}
+            (
+                ExtractorId STRING,
+                Watermark TIMESTAMP,
+                UpdatedTime TIMESTAMP
+            )
+            USING DELTA LOCATION "{WatermarkState_path}"
+            """.format(
+                **tc.get_all_details()
+            )
+        )
+        cls.store = WatermarkStore(DeltaHandle.from_tc("WatermarkState"))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        DbHandle.from_tc("WatermarkDb").drop_cascade()
+
+    def _handle(self, rows):
+        return TestHandle(
+            provides=DataframeCreator.make_partial(
+                self.dummy_schema, self.dummy_columns, rows
+            )
+        )
+
+    def _extractor(self, source, target, overlap_period=None, extractor_id="source"):
+        return IncrementalExtractor(
+            handle_source=self._handle(source),
+            handle_target=self._handle(target),
+            time_col_source="timecol",
+            time_col_target="timecol",
+            dataset_key="source",
+            overlap_period=overlap_period,
+            watermark_store=self.store,
+            extractor_id=extractor_id,
+        )
+
+    def assertWatermark(self, expected):
+        # spark returns the timestamp as a naive datetime in local time
+        self.assertEqual(self.store.get("source").timestamp(), expected.timestamp())
+
+    def test_01_falls_back_to_target(self):
+        extractor = self._extractor([self.row1, self.row2, self.row3], [self.row1])
+        self.assertDataframeMatches(extractor.read(), None, [self.row2, self.row3])
+        # nothing is stored before the commit
+        self.assertIsNone(self.store.get("source"))
+
+        extractor.commit_watermark()
+        self.assertWatermark(self.row3[2])
+
+    def test_02_reads_stored_watermark(self):
+        # the target is not consulted when the store has a watermark
+        extractor = self._extractor([self.row1, self.row2, self.row3, self.row4], [])
+        self.assertDataframeMatches(extractor.read(), None, [self.row4])
+        extractor.commit_watermark()
+        self.assertWatermark(self.row4[2])
+
+    def test_03_applies_overlap(self):
+        extractor = self._extractor(
+            [self.row1, self.row2, self.row3, self.row4],
+            [],
+            overlap_period=timedelta(minutes=10),
+        )
+        self.assertDataframeMatches(extractor.read(), None, [self.row3, self.row4])
+        extractor.commit_watermark()
+        # the overlap is not part of the stored watermark
+        self.assertWatermark(self.row4[2])
+
+    def test_04_nested_orchestrator_commits_after_outer_load(self):
+        extractor = self._extractor([self.row1, self.row2], [], extractor_id="nested")
+        inner = Orchestrator().extract_from(extractor)
+
+        with self.assertRaises(ValueError):
+            Orchestrator().step(inner).load_into(FailingLoader()).execute()
+        # the rows were not loaded, so the watermark is not stored
+        self.assertIsNone(self.store.get("nested"))
+
+        Orchestrator().step(inner).load_into(NoopLoader()).execute()
+        self.assertEqual(self.store.get("nested").timestamp(), self.row2[2].timestamp())
+
+    def test_05_requires_extractor_id(self):
+        with self.assertRaises(ValueError):
+            self._extractor([self.row1], [], extractor_id=None)
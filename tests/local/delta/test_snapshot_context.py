@@ -0,0 +1,47 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import datetime
+
+from spetlr.delta.snapshot import TableSnapshot
+
+
+class SnapshotContextTests(unittest.TestCase):
+    def test_01_other_threads(self):
+        seen = {}
+        inside = threading.Event()
+        done = threading.Event()
+
+        def other_run():
+            inside.wait()
+            seen["other"] = TableSnapshot.current()
+            done.set()
+
+        thread = threading.Thread(target=other_run)
+        thread.start()
+        with TableSnapshot(timestamp=datetime(2024, 1, 1)) as snapshot:
+            inside.set()
+            done.wait()
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                seen["copied"] = pool.submit(
+                    copy_context().run, TableSnapshot.current
+                ).result()
+            seen["own"] = TableSnapshot.current()
+        thread.join()
+
+        self.assertIsNone(seen["other"])
+        self.assertIs(seen["copied"], snapshot)
+        self.assertIs(seen["own"], snapshot)
+        self.assertIsNone(TableSnapshot.current())
+
+    def test_02_nested(self):
+        with TableSnapshot(timestamp=datetime(2024, 1, 1)) as outer:
+            with TableSnapshot(timestamp=datetime(2024, 1, 2)) as inner:
+                self.assertIs(TableSnapshot.current(), inner)
+            self.assertIs(TableSnapshot.current(), outer)
+        self.assertIsNone(TableSnapshot.current())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,11 @@
 import unittest
 
-from spetlr.entry_points.generalized_task_entry_point import prepare_keyword_arguments
+from spetlr.entry_points.generalized_task_entry_point import (
+    EntryPointsFailed,
+    prepare_keyword_arguments,
+    run_concurrently,
+)
+from spetlr.spark import Spark
 
 
 class TestArgumnetHandler(unittest.TestCase):
@@ -19,3 +24,36 @@ class TestArgumnetHandler(unittest.TestCase):
         kwargs = {"b": 5, "c": 6, "d": 4}
         result = prepare_keyword_arguments(f, kwargs)
         self.assertEqual(set(result.keys()), set("bc"))
+
+
+_calls = {}
+
+
+def record_pool(myarg: str = None):
+    sc = Spark.get().sparkContext
+    _calls["record_pool"] = (sc.getLocalProperty("spark.scheduler.pool"), myarg)
+
+
+def fail():
+    raise ValueError("expected failure")
+
+
+class TestConcurrentEntryPoints(unittest.TestCase):
+    def test_all_succeed(self):
+        results = run_concurrently(
+            [f"{__name__}:record_pool"], {"myarg": "val", "other": "x"}
+        )
+
+        self.assertTrue(results[0].succeeded)
+        pool, myarg = _calls["record_pool"]
+        self.assertEqual(pool, results[0].pool)
+        self.assertEqual(myarg, "val")
+
+    def test_failures_are_reported(self):
+        with self.assertRaises(EntryPointsFailed) as cm:
+            run_concurrently([f"{__name__}:fail", f"{__name__}:record_pool"])
+
+        self.assertEqual(
+            [result.succeeded for result in cm.exception.results], [False, True]
+        )
+        self.assertIn("expected failure", cm.exception.results[0].error)
@@ -0,0 +1,70 @@
+import threading
+import unittest
+
+from pyspark.sql import DataFrame
+from spetlrtools.testing import TestHandle
+
+from spetlr.etl import Extractor, Orchestrator
+from spetlr.etl.loaders import (
+    ConcurrentLoader,
+    ConcurrentLoadException,
+    MultiTableLoader,
+)
+from spetlr.spark import Spark
+
+
+class RangeExtractor(Extractor):
+    def read(self) -> DataFrame:
+        return Spark.get().range(10)
+
+
+class FailingHandle(TestHandle):
+    def overwrite(self, df: DataFrame) -> None:
+        raise ValueError("expected failure")
+
+
+class ThreadRecordingLoader(ConcurrentLoader):
+    def __init__(self):
+        super().__init__(max_workers=4)
+        self.threads = {}
+
+    def save_dataset(self, key: str, df: DataFrame) -> None:
+        self.threads[key] = threading.current_thread().name
+
+
+class ConcurrentLoaderTests(unittest.TestCase):
+    def test_01_writes_all_datasets(self):
+        handles = {key: TestHandle() for key in ["A", "B", "C"]}
+        orchestrator = Orchestrator()
+        for key in handles:
+            orchestrator.extract_from(RangeExtractor(dataset_key=key))
+        orchestrator.load_into(MultiTableLoader(handles, max_workers=2)).execute()
+
+        for handle in handles.values():
+            self.assertEqual(handle.overwritten.count(), 10)
+
+    def test_02_errors_are_collected(self):
+        handles = {"A": TestHandle(), "B": FailingHandle(), "C": FailingHandle()}
+        orchestrator = Orchestrator()
+        for key in handles:
+            orchestrator.extract_from(RangeExtractor(dataset_key=key))
+
+        with self.assertRaises(ConcurrentLoadException) as cm:
+            orchestrator.load_into(MultiTableLoader(handles)).execute()
+
+        # the other writes are still completed
+        self.assertEqual(set(cm.exception.errors), {"B", "C"})
+        self.assertEqual(handles["A"].overwritten.count(), 10)
+
+    def test_03_single_dataset_uses_save_many(self):
+        loader = ThreadRecordingLoader()
+        Orchestrator().extract_from(RangeExtractor(dataset_key="A")).load_into(
+            loader
+        ).execute()
+
+        self.assertEqual(list(loader.threads), ["A"])
+        self.assertTrue(loader.threads["A"].startswith("spetlr-load"))
+
+
+if __name__ == "__main__":
+    unittest.main()
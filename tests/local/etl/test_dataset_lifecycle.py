@@ -0,0 +1,87 @@
+import unittest
+
+from pyspark.sql import DataFrame
+
+from spetlr.etl import Extractor, Loader, Orchestrator, Transformer
+from spetlr.etl.lifecycle import DatasetLifecycle
+from spetlr.spark import Spark
+
+
+class RangeExtractor(Extractor):
+    def read(self) -> DataFrame:
+        return Spark.get().range(10)
+
+
+class IdentityTransformer(Transformer):
+    def process(self, df: DataFrame) -> DataFrame:
+        return df
+
+
+class CacheStateLoader(Loader):
+    """Records whether the dataset was cached when it was loaded."""
+
+    def __init__(self, dataset_input_keys):
+        super().__init__(dataset_input_keys=dataset_input_keys)
+        self.df = None
+        self.was_cached = None
+
+    def save(self, df: DataFrame) -> None:
+        self.df = df
+        self.was_cached = df.is_cached
+
+
+class DatasetLifecycleTests(unittest.TestCase):
+    def test_01_consumer_counting(self):
+        steps = [
+            RangeExtractor(dataset_key="A"),
+            RangeExtractor(dataset_key="B"),
+            CacheStateLoader("A"),
+            IdentityTransformer(
+                dataset_input_keys=["A"], dataset_output_key="C", consume_inputs=False
+            ),
+            CacheStateLoader("B"),
+            IdentityTransformer(dataset_input_keys=["A"], dataset_output_key="A"),
+        ]
+        lifecycle = DatasetLifecycle(steps, [])
+
+        # A is read three times, B only once, C never
+        self.assertEqual(lifecycle.shared_datasets(), {(0, "A"): 3})
+
+    def test_02_persist_until_last_consumer(self):
+        first = CacheStateLoader("A")
+        second = CacheStateLoader("A")
+        single = CacheStateLoader("B")
+
+        (
+            Orchestrator(persist_shared_datasets=True)
+            .extract_from(RangeExtractor(dataset_key="A"))
+            .extract_from(RangeExtractor(dataset_key="B"))
+            .load_into(first)
+            .load_into(second)
+            .load_into(single)
+            .execute()
+        )
+
+        self.assertTrue(first.was_cached)
+        self.assertTrue(second.was_cached)
+        self.assertFalse(single.was_cached)
+        # after the last consumer, the dataset is released again
+        self.assertFalse(first.df.is_cached)
+
+    def test_03_nothing_persisted_by_default(self):
+        first = CacheStateLoader("A")
+        second = CacheStateLoader("A")
+
+        (
+            Orchestrator()
+            .extract_from(RangeExtractor(dataset_key="A"))
+            .load_into(first)
+            .load_into(second)
+            .execute()
+        )
+
+        self.assertFalse(first.was_cached)
+
+
+if __name__ == "__main__":
+    unittest.main()
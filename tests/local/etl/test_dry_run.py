@@ -0,0 +1,118 @@
+import unittest
+
+import pyspark.sql.functions as F
+from pyspark.sql import DataFrame
+from spetlrtools.testing import TestHandle
+
+from spetlr.etl import Extractor, Orchestrator, Transformer
+from spetlr.etl.loaders import SimpleLoader
+from spetlr.spark import Spark
+
+
+class RangeExtractor(Extractor):
+    def read(self) -> DataFrame:
+        return Spark.get().range(1000)
+
+
+class ColumnTransformer(Transformer):
+    def process(self, df: DataFrame) -> DataFrame:
+        return df.withColumn("name", F.concat(F.lit("row "), df.id.cast("string")))
+
+
+class CollectingTransformer(Transformer):
+    """Triggers a spark job on its input."""
+
+    def process(self, df: DataFrame) -> DataFrame:
+        self.rows = df.collect()
+        return df
+
+
+class ConfTransformer(Transformer):
+    """Records the optimizer settings of the session during the dry run."""
+
+    def process(self, df: DataFrame) -> DataFrame:
+        self.excluded_rules = Spark.get().conf.get(
+            "spark.sql.optimizer.excludedRules", None
+        )
+        return df
+
+
+def make_target(schema: str) -> TestHandle:
+    return TestHandle(provides=Spark.get().createDataFrame([], schema))
+
+
+class DryRunTests(unittest.TestCase):
+    def test_01_matching_schema(self):
+        target = make_target("id BIGINT, name STRING")
+        report = (
+            Orchestrator()
+            .extract_from(RangeExtractor())
+            .transform_with(ColumnTransformer())
+            .load_into(SimpleLoader(target))
+            .dry_run()
+        )
+
+        self.assertTrue(report.succeeded, report.report())
+        # the loader was not executed
+        self.assertIsNone(target.overwritten)
+
+        extract, transform, load = report.steps
+        self.assertEqual(transform.output_keys, ["ColumnTransformer"])
+        self.assertGreater(transform.analyzed_plan_nodes, 0)
+        # the plan of the empty extracted dataset is not optimized away
+        self.assertGreater(transform.optimized_plan_nodes, 1)
+        self.assertEqual(load.analyzed_plan_nodes, 0)
+
+    def test_02_mismatching_schema(self):
+        target = make_target("id INTEGER, other STRING")
+        report = (
+            Orchestrator()
+            .extract_from(RangeExtractor())
+            .transform_with(ColumnTransformer())
+            .load_into(SimpleLoader(target, mode="upsert", join_cols=["key"]))
+            .dry_run()
+        )
+
+        self.assertFalse(report.succeeded)
+        issues = "\n".join(report.issues)
+        self.assertIn("The column id has the type bigint", issues)
+        self.assertIn("The column name is not in the target", issues)
+        self.assertIn("The join column key is not in the dataset", issues)
+
+    def test_03_extracted_datasets_are_empty(self):
+        collecting = CollectingTransformer()
+        report = (
+            Orchestrator()
+            .extract_from(RangeExtractor())
+            .transform_with(collecting)
+            .dry_run()
+        )
+
+        self.assertTrue(report.succeeded)
+        self.assertEqual(collecting.rows, [])
+
+    def test_04_failing_step(self):
+        report = (
+            Orchestrator()
+            .extract_from(RangeExtractor())
+            .transform_with(ColumnTransformer(dataset_input_keys=["missing"]))
+            .load_into(SimpleLoader(make_target("id BIGINT")))
+            .dry_run()
+        )
+
+        self.assertFalse(report.succeeded)
+        # the analysis stops at the failing step
+        self.assertEqual(len(report.steps), 2)
+
+    def test_05_session_is_not_changed(self):
+        transformer = ConfTransformer()
+        Orchestrator().extract_from(RangeExtractor()).transform_with(
+            transformer
+        ).dry_run()
+
+        # other jobs in the session are optimized as usual
+        self.assertIsNone(transformer.excluded_rules)
+
+
+if __name__ == "__main__":
+    unittest.main()
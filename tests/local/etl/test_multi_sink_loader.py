@@ -0,0 +1,82 @@
+import unittest
+
+import pyspark.sql.functions as F
+from pyspark.sql import DataFrame
+from pyspark.sql.types import LongType
+from spetlrtools.testing import TestHandle
+
+from spetlr.etl.loaders import ConcurrentLoadException, MultiSinkLoader
+from spetlr.spark import Spark
+
+
+class CollectingHandle(TestHandle):
+    """Computes the dataset on every write, like a real sink."""
+
+    def overwrite(self, df: DataFrame, mergeSchema=None, overwriteSchema=None):
+        super().overwrite(df)
+        self.rows = df.collect()
+
+
+class FailingHandle(TestHandle):
+    def overwrite(self, df: DataFrame, mergeSchema=None, overwriteSchema=None):
+        raise ValueError("expected failure")
+
+
+class MultiSinkLoaderTests(unittest.TestCase):
+    def _counted_df(self):
+        """A dataframe that counts how many of its rows have been computed."""
+        counter = Spark.get().sparkContext.accumulator(0)
+
+        def count(value):
+            counter.add(1)
+            return value
+
+        df = Spark.get().range(10).select(F.udf(count, LongType())("id").alias("id"))
+        return df, counter
+
+    def test_01_computed_once(self):
+        df, counter = self._counted_df()
+        handles = [CollectingHandle() for _ in range(3)]
+
+        MultiSinkLoader(handles, parallel=True).save(df)
+
+        self.assertEqual(counter.value, 10)
+        for handle in handles:
+            self.assertEqual(len(handle.rows), 10)
+        # the dataset is released after the writes
+        self.assertFalse(df.is_cached)
+
+    def test_02_without_materialization(self):
+        df, counter = self._counted_df()
+        handles = [CollectingHandle() for _ in range(3)]
+
+        MultiSinkLoader(handles, storage_level=None).save(df)
+
+        self.assertEqual(counter.value, 30)
+
+    def test_03_all_sinks_are_written(self):
+        handles = [FailingHandle(), CollectingHandle()]
+
+        with self.assertRaises(ConcurrentLoadException) as cm:
+            MultiSinkLoader(handles).save(Spark.get().range(10))
+
+        self.assertEqual(list(cm.exception.errors), ["0: FailingHandle"])
+        self.assertEqual(len(handles[1].rows), 10)
+
+    def test_04_single_dataset(self):
+        with self.assertRaises(ValueError):
+            MultiSinkLoader([CollectingHandle()], dataset_input_keys=["a", "b"])
+
+        df = Spark.get().range(10)
+        handle = CollectingHandle()
+        loader = MultiSinkLoader([handle])
+        with self.assertRaises(ValueError):
+            loader.etl({"a": df, "b": df})
+
+        loader = MultiSinkLoader([handle], dataset_input_keys="b")
+        loader.etl({"a": df.limit(1), "b": df})
+        self.assertEqual(len(handle.rows), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import threading
+import unittest
+from typing import List
+
+from spetlr.etl import Extractor, Loader, Orchestrator, Transformer, dataset_group
+from spetlr.etl.dag import OrchestratorStepFailed
+
+
+class ValueExtractor(Extractor):
+    def __init__(self, value: str, dataset_key: str, barrier: threading.Barrier = None):
+        super().__init__(dataset_key=dataset_key)
+        self.value = value
+        self.barrier = barrier
+
+    def read(self):
+        if self.barrier:
+            # only passes if the other extractor is executed at the same time
+            self.barrier.wait()
+        return self.value
+
+
+class ConcatTransformer(Transformer):
+    def process(self, df):
+        return df + "!"
+
+    def process_many(self, datasets: dataset_group):
+        return "+".join(datasets.values())
+
+
+class RecordingLoader(Loader):
+    def __init__(self, dataset_input_keys=None):
+        super().__init__(dataset_input_keys=dataset_input_keys)
+        self.saved: List = []
+
+    def save(self, df) -> None:
+        self.saved.append(df)
+
+    def save_many(self, datasets: dataset_group) -> None:
+        self.saved.append(dict(datasets))
+
+
+class FailingTransformer(Transformer):
+    def process(self, df):
+        raise ValueError(f"failed on {df}")
+
+
+def build(orchestrator: Orchestrator, loaders: List[RecordingLoader]):
+    return (
+        orchestrator.extract_from(ValueExtractor("a", "A"))
+        .extract_from(ValueExtractor("b", "B"))
+        .extract_from(ValueExtractor("c", "C"))
+        .transform_with(
+            ConcatTransformer(
+                dataset_input_keys=["A", "B"],
+                dataset_output_key="AB",
+                consume_inputs=False,
+            )
+        )
+        .load_into(loaders[0])
+        .transform_with(
+            ConcatTransformer(dataset_input_keys=["C"], dataset_output_key="C")
+        )
+        .transform_with(
+            ConcatTransformer(dataset_input_keys=["A", "AB"], dataset_output_key="X")
+        )
+        .load_into(loaders[1])
+    )
+
+
+class ParallelOrchestratorTests(unittest.TestCase):
+    def test_01_same_result_as_sequential(self):
+        seq_loaders = [RecordingLoader(), RecordingLoader()]
+        par_loaders = [RecordingLoader(), RecordingLoader()]
+
+        seq_result = build(Orchestrator(), seq_loaders).execute()
+        par_result = build(Orchestrator(parallel=True), par_loaders).execute()
+
+        self.assertEqual(list(seq_result.items()), list(par_result.items()))
+        self.assertEqual(
+            [loader.saved for loader in seq_loaders],
+            [loader.saved for loader in par_loaders],
+        )
+        self.assertEqual(
+            list(par_result.items()), [("B", "b"), ("C", "c!"), ("X", "a+a+b")]
+        )
+
+    def test_02_independent_steps_run_concurrently(self):
+        barrier = threading.Barrier(2, timeout=30)
+        result = (
+            Orchestrator(parallel=True, max_workers=2)
+            .extract_from(ValueExtractor("a", "A", barrier))
+            .extract_from(ValueExtractor("b", "B", barrier))
+            .execute()
+        )
+        self.assertEqual(result, {"A": "a", "B": "b"})
+
+    def test_03_nested_orchestrator_is_a_barrier(self):
+        inner = Orchestrator().transform_with(
+            ConcatTransformer(dataset_input_keys=["A"], dataset_output_key="A")
+        )
+        result = (
+            Orchestrator(parallel=True)
+            .extract_from(ValueExtractor("a", "A"))
+            .step(inner)
+            .extract_from(ValueExtractor("b", "B"))
+            .execute()
+        )
+        self.assertEqual(list(result.items()), [("A", "a!"), ("B", "b")])
+
+    def test_04_first_failure_is_reported(self):
+        loader = RecordingLoader(dataset_input_keys=["Z", "FailingTransformer"])
+        orchestrator = (
+            Orchestrator(parallel=True)
+            .extract_from(ValueExtractor("a", "A"))
+            .extract_from(ValueExtractor("b", "B"))
+            .transform_with(FailingTransformer(dataset_input_keys=["B"]))
+            .transform_with(
+                FailingTransformer(dataset_input_keys=["A"], dataset_output_key="F")
+            )
+            .extract_from(ValueExtractor("z", "Z"))
+            .load_into(loader)
+        )
+
+        with self.assertRaises(OrchestratorStepFailed) as cm:
+            orchestrator.execute()
+
+        self.assertEqual(cm.exception.index, 2)
+        self.assertIsInstance(cm.exception.__cause__, ValueError)
+        self.assertIn("failed on b", str(cm.exception))
+        # the loader depends on the failed step and is never started
+        self.assertEqual(loader.saved, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import threading
+import unittest
+
+from pyspark.sql import DataFrame
+from spetlrtools.testing import TestHandle
+
+from spetlr import Configurator
+from spetlr.etl import Loader, Orchestrator
+from spetlr.etl.extractors import SimpleExtractor
+from spetlr.etl.sampling import Sampling, sample
+from spetlr.spark import Spark
+
+
+class CollectingLoader(Loader):
+    def save_many(self, datasets) -> None:
+        self.ids = {
+            key: sorted(int(row.id) for row in df.collect())
+            for key, df in datasets.items()
+        }
+
+
+def make_handle(id_type: str) -> TestHandle:
+    df: DataFrame = (
+        Spark.get()
+        .range(1000)
+        .selectExpr(f"cast(id as {id_type}) as id", "'payload' as value")
+    )
+    return TestHandle(provides=df)
+
+
+class SamplingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        Configurator().clear_all_configurations()
+
+    def tearDown(self) -> None:
+        Configurator().clear_all_configurations()
+
+    def test_01_no_sampling_by_default(self):
+        self.assertIsNone(Sampling.get_fraction())
+        df = Spark.get().range(1000)
+        self.assertIs(sample(df, ["id"]), df)
+
+    def test_02_orchestrator_option(self):
+        loader = CollectingLoader()
+        (
+            Orchestrator(sample_fraction=0.1)
+            .extract_from(SimpleExtractor(make_handle("int"), "A", ["id"]))
+            .extract_from(SimpleExtractor(make_handle("bigint"), "B", ["id"]))
+            .extract_from(SimpleExtractor(make_handle("string"), "C", ["id"]))
+            .load_into(loader)
+            .execute()
+        )
+
+        # the same keys are sampled from all sources
+        self.assertEqual(loader.ids["A"], loader.ids["B"])
+        self.assertEqual(loader.ids["A"], loader.ids["C"])
+        self.assertGreater(len(loader.ids["A"]), 50)
+        self.assertLess(len(loader.ids["A"]), 150)
+
+        # the sampling is only active during the run
+        self.assertIsNone(Sampling.get_fraction())
+
+    def test_03_configurator_debug_flag(self):
+        tc = Configurator()
+        tc.register(Sampling.configurator_key, {"release": "", "debug": "0.5"})
+        try:
+            tc.set_debug()
+            self.assertEqual(Sampling.get_fraction(), 0.5)
+            tc.set_prod()
+            self.assertIsNone(Sampling.get_fraction())
+        finally:
+            tc.set_prod()
+
+    def test_04_fraction_of_other_threads(self):
+        fractions = {}
+        inside = threading.Event()
+        done = threading.Event()
+
+        def other_run():
+            inside.wait()
+            fractions["other"] = Sampling.get_fraction()
+            done.set()
+
+        thread = threading.Thread(target=other_run)
+        thread.start()
+        with Sampling.fraction(0.1):
+            inside.set()
+            done.wait()
+            fractions["own"] = Sampling.get_fraction()
+        thread.join()
+
+        self.assertEqual(fractions, {"own": 0.1, "other": None})
+
+    def test_05_parallel_steps(self):
+        loader = CollectingLoader()
+        (
+            Orchestrator(sample_fraction=0.1, parallel=True)
+            .extract_from(SimpleExtractor(make_handle("int"), "A", ["id"]))
+            .extract_from(SimpleExtractor(make_handle("bigint"), "B", ["id"]))
+            .load_into(loader)
+            .execute()
+        )
+
+        # the extractors run on worker threads, and are sampled all the same
+        self.assertEqual(loader.ids["A"], loader.ids["B"])
+        self.assertLess(len(loader.ids["A"]), 150)
+
+
+if __name__ == "__main__":
+    unittest.main()
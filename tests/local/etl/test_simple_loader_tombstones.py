@@ -0,0 +1,50 @@
+import unittest
+
+import pyspark.sql.functions as F
+from pyspark.sql import DataFrame
+from pyspark.sql.types import LongType
+
+from spetlr.etl.loaders import SimpleLoader
+from spetlr.spark import Spark
+
+
+class KeyDeletingHandle:
+    """Computes the rows of every write, like a real table."""
+
+    def delete_keys(self, df: DataFrame, join_cols):
+        self.deleted = sorted(row.id for row in df.collect())
+
+    def upsert(self, df: DataFrame, join_cols):
+        self.upserted = df.collect()
+
+
+class SimpleLoaderTombstoneTests(unittest.TestCase):
+    def test_01_input_computed_once(self):
+        counter = Spark.get().sparkContext.accumulator(0)
+
+        def count(value):
+            counter.add(1)
+            return value
+
+        df = (
+            Spark.get()
+            .range(10)
+            .select(F.udf(count, LongType())("id").alias("id"))
+            .withColumn("isDeleted", F.col("id") % 3 == 0)
+        )
+        handle = KeyDeletingHandle()
+
+        SimpleLoader(
+            handle, mode="upsert", join_cols=["id"], tombstone_col="isDeleted"
+        ).save(df)
+
+        self.assertEqual(counter.value, 10)
+        self.assertEqual(handle.deleted, [0, 3, 6, 9])
+        self.assertEqual(sorted(row.id for row in handle.upserted), [1, 2, 4, 5, 7, 8])
+        self.assertNotIn("isDeleted", handle.upserted[0].asDict())
+        # the input is released after the writes
+        self.assertFalse(df.is_cached)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+from pyspark.sql import DataFrame
+from spetlrtools.testing import TestHandle
+
+from spetlr.etl import Extractor, Loader, Orchestrator, Transformer
+from spetlr.etl.instrumentation import SparkStepMetrics, StepHook
+from spetlr.etl.log import LogOrchestrator
+from spetlr.spark import Spark
+
+
+class RangeExtractor(Extractor):
+    def read(self) -> DataFrame:
+        return Spark.get().range(100)
+
+
+class GroupingTransformer(Transformer):
+    def process(self, df: DataFrame) -> DataFrame:
+        return df.groupBy((df.id % 3).alias("mod")).count()
+
+
+class FailingTransformer(Transformer):
+    def process(self, df: DataFrame) -> DataFrame:
+        raise ValueError("expected failure")
+
+
+class CountingLoader(Loader):
+    def save(self, df: DataFrame) -> None:
+        self.count = df.count()
+
+
+class RecordingHook(StepHook):
+    def __init__(self):
+        self.calls = []
+
+    def before_step(self, index, step):
+        self.calls.append(("before", index))
+
+    def after_step(self, index, step, error):
+        self.calls.append(("after", index, type(error).__name__ if error else None))
+
+
+class StepMetricsTests(unittest.TestCase):
+    def test_01_hooks_are_called_around_steps(self):
+        hook = RecordingHook()
+        orchestrator = (
+            Orchestrator(hooks=[hook])
+            .extract_from(RangeExtractor())
+            .transform_with(FailingTransformer())
+        )
+
+        with self.assertRaises(ValueError):
+            orchestrator.execute()
+
+        self.assertEqual(
+            hook.calls,
+            [
+                ("before", 0),
+                ("after", 0, None),
+                ("before", 1),
+                ("after", 1, "ValueError"),
+            ],
+        )
+
+    def test_02_spark_metrics_per_step(self):
+        metrics = SparkStepMetrics()
+        (
+            Orchestrator(hooks=[metrics])
+            .extract_from(RangeExtractor())
+            .transform_with(GroupingTransformer())
+            .load_into(CountingLoader())
+            .execute()
+        )
+
+        self.assertEqual([m.step_index for m in metrics.metrics], [0, 1, 2])
+        self.assertTrue(all(m.succeeded for m in metrics.metrics))
+        self.assertTrue(all(m.duration_seconds >= 0 for m in metrics.metrics))
+
+        # only the loader triggers spark jobs
+        extract, transform, load = metrics.metrics
+        self.assertEqual(extract.job_ids, [])
+        self.assertEqual(transform.job_ids, [])
+        self.assertGreater(len(load.job_ids), 0)
+        self.assertGreater(len(load.stage_ids), 0)
+
+        self.assertEqual(metrics.to_dataframe().count(), 3)
+        self.assertIn("CountingLoader", metrics.report())
+
+    def test_03_log_orchestrator_writes_step_metrics(self):
+        sink = TestHandle()
+        (
+            LogOrchestrator(handles=[sink], step_metrics_log_name="my_run")
+            .extract_from(RangeExtractor())
+            .load_into(CountingLoader())
+            .execute()
+        )
+
+        rows = sink.appended.orderBy("StepIndex").collect()
+        self.assertEqual(
+            [row.StepName for row in rows], ["RangeExtractor", "CountingLoader"]
+        )
+        self.assertEqual({row.LogName for row in rows}, {"my_run"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,13 @@
 import unittest
 
+from pyspark.sql.types import (
+    IntegerType,
+    MapType,
+    StringType,
+    StructField,
+    StructType,
+)
+
 from spetlr.utils.GetMergeStatement import GetMergeStatement
 
 
@@ -105,6 +113,145 @@ class GetMergeStatementTest(unittest.TestCase):
 
         self.assertEqual(output, expected)
 
+    def test_get_merge_statement_with_target_filter(self):
+        output = GetMergeStatement(
+            merge_statement_type="delta",
+            target_table_name="targetname",
+            source_table_name="sourcename",
+            join_cols=["col1"],
+            update_cols=["col2"],
+            target_filter="target.col1 BETWEEN 1 AND 5",
+        )
+
+        expected = (
+            "MERGE INTO targetname AS target USING sourcename AS source "
+            "ON (source.col1 = target.col1) AND (target.col1 BETWEEN 1 AND 5) "
+            "WHEN MATCHED THEN UPDATE "
+            "SET target.col2 = source.col2;"
+        )
+
+        self.assertEqual(output, expected)
+
+    def test_get_delta_merge_statement_only_changed(self):
+        output = GetMergeStatement(
+            merge_statement_type="delta",
+            target_table_name="targetname",
+            source_table_name="sourcename",
+            join_cols=["col1"],
+            insert_cols=["col1", "col2", "col3"],
+            update_cols=["col2", "col3"],
+            merge_mode="upsert_changed",
+            target_schema=StructType(
+                [
+                    StructField("col1", IntegerType()),
+                    StructField("col2", StringType()),
+                    StructField("col3", StringType()),
+                ]
+            ),
+        )
+
+        expected = (
+            "MERGE INTO targetname AS target USING sourcename AS source "
+            "ON (source.col1 = target.col1) "
+            "WHEN MATCHED AND NOT (source.col2 <=> target.col2 "
+            "AND source.col3 <=> target.col3) THEN UPDATE "
+            "SET target.col2 = source.col2, target.col3 = source.col3 "
+            "WHEN NOT MATCHED THEN "
+            "INSERT (col1, col2, col3) "
+            "VALUES (source.col1, source.col2, source.col3);"
+        )
+
+        self.assertEqual(output, expected)
+
+    def test_get_sql_merge_statement_only_changed(self):
+        output = GetMergeStatement(
+            merge_statement_type="sql",
+            target_table_name="targetname",
+            source_table_name="sourcename",
+            join_cols=["col1"],
+            update_cols=["col2", "col3"],
+            merge_mode="upsert_changed",
+        )
+
+        expected = (
+            "MERGE targetname AS target USING sourcename AS source "
+            "ON (source.col1 = target.col1) "
+            "WHEN MATCHED AND EXISTS (SELECT source.col2, source.col3 "
+            "EXCEPT SELECT target.col2, target.col3) THEN UPDATE "
+            "SET target.col2 = source.col2, target.col3 = source.col3;"
+        )
+
+        self.assertEqual(output, expected)
+
+    def test_get_merge_statement_only_changed_fingerprint(self):
+        output = GetMergeStatement(
+            merge_statement_type="delta",
+            target_table_name="targetname",
+            source_table_name="sourcename",
+            join_cols=["col1"],
+            update_cols=["col2", "_spetlr_fingerprint"],
+            merge_mode="upsert_changed",
+        )
+
+        expected = (
+            "MERGE INTO targetname AS target USING sourcename AS source "
+            "ON (source.col1 = target.col1) "
+            "WHEN MATCHED AND NOT "
+            "(source._spetlr_fingerprint <=> target._spetlr_fingerprint) "
+            "THEN UPDATE SET target.col2 = source.col2, "
+            "target._spetlr_fingerprint = source._spetlr_fingerprint;"
+        )
+
+        self.assertEqual(output, expected)
+
+    def test_get_merge_statement_only_changed_maps(self):
+        output = GetMergeStatement(
+            merge_statement_type="delta",
+            target_table_name="targetname",
+            source_table_name="sourcename",
+            join_cols=["col1"],
+            update_cols=["col2", "m"],
+            merge_mode="upsert_changed",
+            target_schema=StructType(
+                [
+                    StructField("col1", IntegerType()),
+                    StructField("col2", StringType()),
+                    StructField("m", MapType(StringType(), StringType())),
+                ]
+            ),
+        )
+
+        expected = (
+            "MERGE INTO targetname AS target USING sourcename AS source "
+            "ON (source.col1 = target.col1) "
+            "WHEN MATCHED AND NOT (source.col2 <=> target.col2 "
+            "AND to_json(source.m) <=> to_json(target.m)) THEN UPDATE "
+            "SET target.col2 = source.col2, target.m = source.m;"
+        )
+
+        self.assertEqual(output, expected)
+
+    def test_get_merge_statement_insert_only(self):
+        output = GetMergeStatement(
+            merge_statement_type="sql",
+            target_table_name="targetname",
+            source_table_name="sourcename",
+            join_cols=["col1"],
+            insert_cols=["col1", "col2"],
+            update_cols=["col2"],
+            merge_mode="insert",
+        )
+
+        expected = (
+            "MERGE targetname AS target USING sourcename AS source "
+            "ON (source.col1 = target.col1) "
+            "WHEN NOT MATCHED THEN "
+            "INSERT (col1, col2) "
+            "VALUES (source.col1, source.col2);"
+        )
+
+        self.assertEqual(output, expected)
+
 
 if __name__ == "__main__":
     unittest.main()
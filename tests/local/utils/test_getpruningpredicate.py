@@ -0,0 +1,48 @@
+import unittest
+
+from spetlr.spark import Spark
+from spetlr.utils import GetPruningPredicate
+
+
+class GetPruningPredicateTest(unittest.TestCase):
+    def test_key_ranges_and_partitions(self):
+        df = Spark.get().sql(
+            """
+            SELECT * FROM VALUES
+                (1, 'it\\'s', DATE'2021-01-01', 'x'),
+                (5, 'b', DATE'2021-01-03', 'y')
+            AS t(id, name, day, payload)
+            """
+        )
+
+        predicate = GetPruningPredicate(
+            df=df,
+            join_cols=["id", "day"],
+            partition_cols=["day", "payload"],
+            alias="target",
+        )
+
+        self.assertEqual(
+            predicate,
+            "(target.id BETWEEN CAST('1' AS int) AND CAST('5' AS int)) "
+            "AND (target.day BETWEEN CAST('2021-01-01' AS date) "
+            "AND CAST('2021-01-03' AS date)) "
+            "AND (target.day IN "
+            "(CAST('2021-01-01' AS date), CAST('2021-01-03' AS date)))",
+        )
+
+        # every incoming row fulfills the predicate
+        self.assertEqual(df.alias("target").where(predicate).count(), 2)
+
+    def test_escaped_strings(self):
+        df = Spark.get().sql("SELECT 'it\\'s' AS name")
+        predicate = GetPruningPredicate(df=df, join_cols=["name"])
+        self.assertEqual(df.where(predicate).count(), 1)
+
+    def test_empty_input(self):
+        df = Spark.get().sql("SELECT 1 AS id").where("false")
+        self.assertIsNone(GetPruningPredicate(df=df, join_cols=["id"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
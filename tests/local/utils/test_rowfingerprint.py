@@ -0,0 +1,117 @@
+import unittest
+
+from spetlr.spark import Spark
+from spetlr.utils import AddRowFingerprint, RowFingerprint
+from spetlr.utils.CheckDfMerge import CheckDfMerge
+
+
+class RowFingerprintTest(unittest.TestCase):
+    def test_map_order_and_null_position(self):
+        df = Spark.get().sql(
+            """
+            SELECT id, a, b, m FROM VALUES
+                (1, 'x', CAST(NULL AS string), map('k1', 1, 'k2', 2)),
+                (2, CAST(NULL AS string), 'x', map('k2', 2, 'k1', 1)),
+                (3, 'x', CAST(NULL AS string), map('k2', 2, 'k1', 1))
+            AS t(id, a, b, m)
+            """
+        )
+        rows = {
+            row.id: row
+            for row in df.select(
+                "id",
+                RowFingerprint(df, ["a", "b"]).alias("nulls"),
+                RowFingerprint(df, ["m"]).alias("maps"),
+            ).collect()
+        }
+
+        # the order of the map entries does not matter
+        self.assertEqual(rows[1].maps, rows[2].maps)
+        # a null in a different column gives a different fingerprint
+        self.assertNotEqual(rows[1].nulls, rows[2].nulls)
+        self.assertEqual(rows[1].nulls, rows[3].nulls)
+
+    def test_nested_nulls(self):
+        df = Spark.get().sql(
+            """
+            SELECT * FROM VALUES
+                (1, named_struct('a', CAST(NULL AS int), 'b', 1), array(NULL, 1)),
+                (2, named_struct('a', 1, 'b', CAST(NULL AS int)), array(1)),
+                (3, named_struct('a', CAST(NULL AS int), 'b', 1), array(1, NULL)),
+                (4, named_struct('a', CAST(NULL AS int), 'b', 1), array(NULL, 1))
+            AS t(id, s, arr)
+            """
+        )
+        rows = {
+            row.id: row
+            for row in df.select(
+                "id",
+                RowFingerprint(df, ["s"]).alias("structs"),
+                RowFingerprint(df, ["arr"]).alias("arrays"),
+            ).collect()
+        }
+
+        # swapped nulls in struct fields are different
+        self.assertNotEqual(rows[1].structs, rows[2].structs)
+        self.assertEqual(rows[1].structs, rows[3].structs)
+        # null elements are neither skipped nor interchangeable
+        self.assertEqual(len({rows[i].arrays for i in [1, 2, 3]}), 3)
+        self.assertEqual(rows[1].arrays, rows[4].arrays)
+
+    def test_cast_to_types(self):
+        df_int = Spark.get().sql("SELECT 1 AS id, 5 AS value")
+        df_long = Spark.get().sql("SELECT 1 AS id, CAST(5 AS bigint) AS value")
+
+        (fp_int,) = df_int.select(RowFingerprint(df_int, ["value"])).first()
+        (fp_long,) = df_long.select(
+            RowFingerprint(df_long, ["value"], [df_int.schema["value"].dataType])
+        ).first()
+        self.assertEqual(fp_int, fp_long)
+
+    def test_check_df_merge(self):
+        df_target = Spark.get().sql(
+            """
+            SELECT * FROM VALUES
+                (1, 'a', map('k', 1)),
+                (2, 'b', map('k', 2)),
+                (3, CAST(NULL AS string), map('k', 3))
+            AS t(id, name, m)
+            """
+        )
+        df = Spark.get().sql(
+            """
+            SELECT * FROM VALUES
+                (1, 'a', map('k', 1)),
+                (2, 'b', map('k', 20)),
+                (3, 'c', map('k', 3)),
+                (4, 'd', map('k', 4))
+            AS t(id, name, m)
+            """
+        )
+
+        result, merge_required = CheckDfMerge(
+            df=df, df_target=df_target, join_cols=["id"], avoid_cols=[]
+        )
+        self.assertTrue(merge_required)
+        self.assertEqual(sorted(row.id for row in result.collect()), [2, 3, 4])
+
+        # with a stored fingerprint, the incoming rows get theirs
+        result, merge_required = CheckDfMerge(
+            df=df,
+            df_target=AddRowFingerprint(df_target, ["id"]),
+            join_cols=["id"],
+            avoid_cols=[],
+        )
+        self.assertTrue(merge_required)
+        self.assertIn("_spetlr_fingerprint", result.columns)
+        self.assertEqual(sorted(row.id for row in result.collect()), [2, 3, 4])
+
+        # only inserts do not need a merge
+        result, merge_required = CheckDfMerge(
+            df=df.where("id = 4"), df_target=df_target, join_cols=["id"], avoid_cols=[]
+        )
+        self.assertFalse(merge_required)
+
+
+if __name__ == "__main__":
+    unittest.main()
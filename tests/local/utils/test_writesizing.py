@@ -0,0 +1,58 @@
+import unittest
+
+import pyspark.sql.functions as f
+
+from spetlr.spark import Spark
+from spetlr.utils import EstimateSizeInBytes, WriteSizing
+
+
+class WriteSizingTest(unittest.TestCase):
+    def test_partition_count(self):
+        # a range of longs is estimated at 8 bytes per row
+        df = Spark.get().range(1000)
+        self.assertEqual(EstimateSizeInBytes(df), 8000)
+
+        self.assertEqual(WriteSizing(target_bytes=800).partition_count(df), 10)
+        self.assertEqual(
+            WriteSizing(target_bytes=800, max_partitions=4).partition_count(df), 4
+        )
+        self.assertEqual(WriteSizing(min_partitions=2).partition_count(df), 2)
+
+    def test_apply(self):
+        df = Spark.get().range(1000).repartition(20)
+
+        # without shuffle, partitions are only merged
+        self.assertEqual(
+            WriteSizing(target_bytes=800).apply(df).rdd.getNumPartitions(), 10
+        )
+        self.assertEqual(
+            WriteSizing(target_bytes=80).apply(df).rdd.getNumPartitions(), 20
+        )
+        self.assertEqual(
+            WriteSizing(target_bytes=80, shuffle=True).apply(df).rdd.getNumPartitions(),
+            100,
+        )
+
+        # a large table partition is split over several tasks
+        df = df.selectExpr("id", "0 AS part")
+        tasks = (
+            WriteSizing(target_bytes=800)
+            .apply(df, ["part"])
+            .select(f.spark_partition_id().alias("task"))
+            .distinct()
+        )
+        self.assertGreater(tasks.count(), 5)
+
+        # with one bucket, all rows of a table partition are in one task
+        df = df.selectExpr("id", "id % 3 AS part")
+        tasks = (
+            WriteSizing(target_bytes=800, partition_buckets=1)
+            .apply(df, ["part"])
+            .select("part", f.spark_partition_id().alias("task"))
+            .distinct()
+        )
+        self.assertEqual(tasks.count(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()